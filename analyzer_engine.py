@@ -1,101 +1,459 @@
 import os
-from typing import Dict, List, Tuple, Optional
-from pathlib import Path
-from .parsers.init import get_parser_for_file
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple, Optional
+from .parser_registry import PARSER_REGISTRY, get_parser_for_file
+from .archive_parser import member_address
 from .risk_analyzer import RiskAnalyzer
+from .tree_walker import ParallelTreeWalker
+from .scan_filter import ScanFilter
+from .type_detector import TypeDetector, mime_for_extension, mismatch_metadata
+from .parse_supervisor import ParseSupervisor
+from .scan_metrics import ScanMetrics
+from .scan_profiler import ScanProfiler
+from .read_ahead import ReadAhead
+from .result_cache import ResultCache
+from .scan_aggregate import ScanAggregate
+from .scan_checkpoint import ScanCheckpoint
+from .scan_logging import collect_errors, file_context, get_logger
+
+logger = get_logger('analyzer_engine')
 
 class AnalyzerEngine:
-    def __init__(self):
-        self.risk_analyzer = RiskAnalyzer()
+    # Минимальный интервал между вызовами progress_callback, секунды
+    PROGRESS_INTERVAL = 0.25
+    
+    def __init__(self, walker_workers: int = 8, max_depth: Optional[int] = None,
+                 follow_symlinks: bool = False, exclude: Optional[List[str]] = None,
+                 scan_filter: Optional[ScanFilter] = None, parse_timeout: Optional[float] = 120.0,
+                 memory_limit_mb: Optional[int] = 2048, parse_workers: Optional[int] = None,
+                 metrics: Optional[ScanMetrics] = None, metrics_output: Optional[str] = None,
+                 profile_dir: Optional[str] = None, profile_interval: float = 0.005,
+                 async_pipeline: bool = False, prefetch_concurrency: int = 32, queue_size: int = 256,
+                 read_ahead: int = 8, result_cache: Optional[ResultCache] = None,
+                 checkpoint_path: Optional[str] = None, rule_packs: Optional[List[str]] = None):
+        # Контрольная точка сканирования папки (JSONL), позволяет продолжить прерванное сканирование
+        self.checkpoint_path = checkpoint_path
+        self._checkpoint: Optional[ScanCheckpoint] = None
+        # Общий кэш результатов: неизмененные файлы не разбираются повторно
+        self.result_cache = result_cache
+        # Упреждающее чтение нужных парсерам участков следующих read_ahead файлов (0 - выключено)
+        self.read_ahead = read_ahead
+        # Конвейер asyncio: обход, чтение заголовков, разбор и анализ рисков идут параллельно
+        self.async_pipeline = async_pipeline
+        self.prefetch_concurrency = prefetch_concurrency
+        self.queue_size = queue_size
+        # Профилирование сканирования папки: каталог для scan.pstats / scan.folded
+        self.profile_dir = profile_dir
+        self.profile_interval = profile_interval
+        self.last_profiler: Optional[ScanProfiler] = None
+        # Предупреждения и ошибки по файлам последнего сканирования папки
+        self.last_scan_errors: List[Dict] = []
+        # Сводная статистика рисков текущего (последнего) сканирования папки,
+        # обновляется по мере готовности файлов
+        self.aggregate = ScanAggregate()
+        # Метрики стадий сканирования (по умолчанию выключены)
+        self.metrics = metrics or ScanMetrics(enabled=False)
+        # Правила рисков из наборов rule_packs (по умолчанию встроенный),
+        # перечитываются при изменении файлов перед каждым анализом
+        self.risk_analyzer = RiskAnalyzer(metrics=self.metrics, rule_packs=rule_packs)
+        # JSON файл, в который метрики сохраняются после каждого сканирования папки
+        self.metrics_output = metrics_output
+        # Ограничения на разбор одного файла при сканировании папки
+        # (None в обоих - разбор в текущем процессе без ограничений)
+        self.parse_timeout = parse_timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.parse_workers = parse_workers
+        # Фильтр файлов по умолчанию для analyze_folder
+        self.scan_filter = scan_filter or ScanFilter.default()
+        # Определение типа по содержимому, кэш сбрасывается на каждое сканирование
+        self.type_detector = TypeDetector()
+        # Параллельный обход дерева каталогов
+        self.walker = ParallelTreeWalker(max_workers=walker_workers, max_depth=max_depth,
+                                         follow_symlinks=follow_symlinks, exclude=exclude)
+        
+    @property
+    def ruleset_hash(self) -> Optional[str]:
+        """Хэш текущего набора правил рисков"""
+        return self.risk_analyzer.ruleset_hash
+        
+    def reload_rules(self) -> bool:
+        """Перечитывает измененные наборы правил (True - правила сменились)"""
+        return self.risk_analyzer.reload_if_changed()
         
     def analyze_file(self, file_path: str) -> Tuple[List[Dict], List[Dict]]:
         """Анализ одного файла"""
         if not os.path.isfile(file_path):
             raise FileNotFoundError(f"File not found: {file_path}")
+        self.reload_rules()
             
-        # Определение типа файла по расширению
-        mime_type = self._get_mime_type(file_path)
+        # Определение типа файла по содержимому (с быстрым путем по расширению)
+        with self.metrics.timer('sniff'):
+            detected = self.type_detector.detect(file_path)
         
-        # Получение подходящего парсера
-        parser = get_parser_for_file(file_path, mime_type)
-        if not parser:
-            return [], []
-            
-        # Извлечение метаданных
-        metadata = parser.extract_metadata(file_path)
+        # Извлечение метаданных подходящим парсером
+        metadata = self._parse_file(file_path, detected)
         
         # Анализ рисков
-        risks = self.risk_analyzer.analyze_risks(metadata)
-        
-        return metadata, risks
+        return self._finish_file(file_path, detected, metadata)
         
-    def analyze_folder(self, folder_path: str) -> Dict[str, Dict]:
+    def analyze_folder(self, folder_path: str, scan_filter: Optional[ScanFilter] = None,
+                       progress_callback: Optional[Callable[[int], None]] = None,
+                       result_callback: Optional[Callable[[str, Dict], None]] = None,
+                       resume: bool = False) -> Dict[str, Dict]:
         """Рекурсивный анализ папки
         
+        Если заданы parse_timeout или memory_limit_mb, файлы разбираются в
+        отдельных процессах под надзором ParseSupervisor. При включенном
+        профилировании (profile_dir) разбор всегда идет в текущем процессе,
+        иначе cProfile не увидит парсеры.
+        
+        При async_pipeline=True сканирование выполняется analyze_folder_async
+        в собственном цикле событий (кроме режима профилирования).
+        
+        Args:
+            folder_path: корневая папка
+            scan_filter: фильтр файлов и каталогов; по умолчанию self.scan_filter
+            progress_callback: вызывается не чаще раза в PROGRESS_INTERVAL секунд
+                с количеством обработанных файлов
+            result_callback: вызывается для каждого файла с рисками сразу после
+                его анализа (путь, результат)
+            resume: продолжить сканирование по контрольной точке checkpoint_path,
+                не разбирая уже готовые файлы
+        
         Returns:
-            Dict[str, Dict]: Словарь, где ключ - путь к файлу, значение - словарь с 'metadata' и 'risks'
+            Dict[str, Dict]: Словарь, где ключ - путь к файлу, значение - словарь с 'metadata',
+                'risks' и 'errors'. Ошибки по всем файлам сохраняются в last_scan_errors
+        """
+        if self.async_pipeline and not self.profile_dir:
+            import asyncio
+            return asyncio.run(self.analyze_folder_async(folder_path, scan_filter, progress_callback,
+                                                         result_callback, resume))
+        
+        results = {}
+        scan_filter = scan_filter or self.scan_filter
+        self.type_detector.clear()
+        self.reload_rules()
+        self.aggregate = ScanAggregate()
+        self.metrics.start_scan()
+        
+        profiler = None
+        if self.profile_dir:
+            profiler = ScanProfiler(self.profile_dir, self.profile_interval)
+            profiler.start()
+        self.last_profiler = profiler
+        
+        self._open_checkpoint(folder_path, resume)
+        completed = False
+        with collect_errors() as collector:
+            try:
+                tasks = self._iter_tasks(folder_path, scan_filter, results, result_callback)
+                if self.read_ahead:
+                    tasks = ReadAhead(self.read_ahead, metrics=self.metrics).wrap(tasks)
+                isolate = self.parse_timeout is not None or self.memory_limit_mb is not None
+                if isolate and profiler is None:
+                    with ParseSupervisor(workers=self.parse_workers, timeout=self.parse_timeout,
+                                         memory_limit_mb=self.memory_limit_mb,
+                                         metrics=self.metrics) as supervisor:
+                        self._collect_results(supervisor.map(tasks), results, progress_callback,
+                                              result_callback)
+                else:
+                    self._collect_results(self._parse_inline(tasks), results, progress_callback,
+                                          result_callback)
+                completed = True
+            except PermissionError:
+                logger.warning("Permission denied accessing folder: %s", folder_path)
+            except Exception as e:
+                logger.error("Error walking folder %s: %s", folder_path, e)
+            finally:
+                self._close_checkpoint(completed)
+        
+        if profiler:
+            profiler.stop()
+            profiler.write()
+        
+        self._finish_scan(collector, results)
+        return results
+        
+    async def analyze_folder_async(self, folder_path: str, scan_filter: Optional[ScanFilter] = None,
+                                   progress_callback: Optional[Callable[[int], None]] = None,
+                                   result_callback: Optional[Callable[[str, Dict], None]] = None,
+                                   resume: bool = False) -> Dict[str, Dict]:
+        """Рекурсивный анализ папки конвейером asyncio
+        
+        Обход каталогов и чтение заголовков выполняются в пуле потоков с
+        prefetch_concurrency одновременными чтениями, разбор - в рабочих
+        процессах ParseSupervisor (или в потоках, если ограничения выключены),
+        анализ рисков - в цикле событий. Стадии связаны очередями размером
+        queue_size, поэтому медленная стадия притормаживает предыдущие.
+        
+        Аргументы и результат - как у analyze_folder.
         """
+        # Импорт по требованию: asyncio не нужен в обычном режиме
+        from .async_pipeline import AsyncScanPipeline
+        
         results = {}
-        supported_extensions = {'.pdf', '.docx', '.xlsx', '.jpg', '.jpeg', '.png', '.tiff', '.tif', '.heic', '.heif'}
-        MAX_FILE_SIZE = 100 * 1024 * 1024  # 100 MB
+        scan_filter = scan_filter or self.scan_filter
+        self.type_detector.clear()
+        self.reload_rules()
+        self.aggregate = ScanAggregate()
+        self.metrics.start_scan()
+        self.last_profiler = None
+        
+        self._open_checkpoint(folder_path, resume)
+        completed = False
+        with collect_errors() as collector:
+            try:
+                pipeline = AsyncScanPipeline(self, prefetch_concurrency=self.prefetch_concurrency,
+                                             queue_size=self.queue_size)
+                await pipeline.run(folder_path, scan_filter, results, progress_callback, result_callback)
+                completed = True
+            except PermissionError:
+                logger.warning("Permission denied accessing folder: %s", folder_path)
+            except Exception as e:
+                logger.error("Error walking folder %s: %s", folder_path, e)
+            finally:
+                self._close_checkpoint(completed)
+        
+        self._finish_scan(collector, results)
+        return results
+        
+    def _open_checkpoint(self, folder_path: str, resume: bool):
+        self._checkpoint = None
+        if self.checkpoint_path:
+            self._checkpoint = ScanCheckpoint(self.checkpoint_path, folder_path, resume=resume,
+                                              ruleset=self.ruleset_hash,
+                                              metrics=self.metrics)
+            
+    def _close_checkpoint(self, completed: bool):
+        if self._checkpoint is not None:
+            self._checkpoint.close(complete=completed)
+            self._checkpoint = None
         
+    def _finish_scan(self, collector, results: Dict[str, Dict]):
+        """Ошибки по файлам и метрики по окончании сканирования папки"""
+        self.last_scan_errors = collector.records
+        for file_path, errors in collector.by_file().items():
+            if file_path in results:
+                results[file_path]['errors'] = errors
+        
+        self.metrics.finish_scan()
+        if self.metrics_output and self.metrics.enabled:
+            self.metrics.dump(self.metrics_output)
+        
+    def _iter_tasks(self, folder_path: str, scan_filter: ScanFilter, results: Dict[str, Dict],
+                    result_callback: Optional[Callable[[str, Dict], None]] = None) -> Iterator[Tuple[str, Dict]]:
+        """Обход папки и определение типа найденных файлов, не найденных в кэше"""
+        metrics = self.metrics
+        # Фильтр применяется во время обхода, отсеченные каталоги не читаются
+        entries = self.walker.walk(folder_path, scan_filter)
+        while True:
+            with metrics.timer('enumerate'):
+                entry = next(entries, None)
+            if entry is None:
+                break
+            metrics.incr('files_enumerated')
+            file_path = entry.path
+            if self._from_cache(file_path, results, result_callback):
+                continue
+            detected = self._sniff(file_path)
+            if detected is not None:
+                yield file_path, detected
+                
+    def _from_cache(self, file_path: str, results: Dict[str, Dict],
+                    result_callback: Optional[Callable[[str, Dict], None]] = None) -> bool:
+        """Берет результат из контрольной точки или общего кэша (True - файл разбирать не нужно)"""
+        found, entry = self._cached_entry(file_path)
+        if found:
+            self._store_result(file_path, entry, results, result_callback)
+        return found
+        
+    def _cached_entry(self, file_path: str) -> Tuple[bool, Optional[Dict]]:
+        """Поиск результата в контрольной точке и общем кэше: (найден, результат).
+
+        Результат не сохраняется: это делает вызывающий код в своем потоке.
+        """
+        checkpoint = self._checkpoint
+        if self.result_cache is None and checkpoint is None:
+            return False, None
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return False, None
+        
+        found = False
+        if checkpoint is not None:
+            found, entry = checkpoint.get(file_path, stat.st_size, stat.st_mtime_ns)
+            if found:
+                self.metrics.incr('checkpoint_hits')
+        if not found and self.result_cache is not None:
+            found, entry = self.result_cache.get(file_path, stat.st_size, stat.st_mtime_ns, self.ruleset_hash)
+            if found:
+                self.metrics.incr('cache_hits')
+                if checkpoint is not None:
+                    checkpoint.put(file_path, stat.st_size, stat.st_mtime_ns, entry)
+        return found, entry
+        
+    def _sniff(self, file_path: str) -> Optional[Dict]:
+        """Проверка доступности и определение типа файла (None - файл пропускается)"""
+        metrics = self.metrics
+        try:
+            # Проверка доступности файла
+            with metrics.timer('stat'):
+                readable = os.access(file_path, os.R_OK)
+            if not readable:
+                logger.warning("Permission denied: %s", file_path, extra={'file_path': file_path})
+                return None
+            
+            with metrics.timer('sniff'):
+                detected = self.type_detector.detect(file_path)
+            if detected['header']:
+                metrics.incr('bytes_read', len(detected['header']))
+            if detected['extension_mime'] is None and detected['mime'] not in PARSER_REGISTRY:
+                # Файл без известного расширения (ScanFilter.sniff_unknown) с неразбираемым содержимым
+                return None
+            return detected
+        except PermissionError:
+            logger.warning("Permission denied: %s", file_path, extra={'file_path': file_path})
+        except FileNotFoundError:
+            logger.warning("File not found (may have been deleted): %s", file_path,
+                           extra={'file_path': file_path})
+        except OSError as e:
+            logger.warning("OS error analyzing %s: %s", file_path, e, extra={'file_path': file_path})
+        return None
+                
+    def _parse_inline(self, tasks: Iterable[Tuple[str, Dict]]) -> Iterator[Tuple[str, Dict, List[Dict]]]:
+        """Разбор файлов в текущем процессе"""
+        profiler = self.last_profiler
+        for file_path, detected in tasks:
+            start = time.perf_counter()
+            metadata = self._parse_guarded(file_path, detected)
+            if metadata is None:
+                continue
+            if profiler:
+                profiler.record_file(file_path, time.perf_counter() - start)
+            yield file_path, detected, metadata
+                
+    def _parse_guarded(self, file_path: str, detected: Dict) -> Optional[List[Dict]]:
+        """Разбор файла в текущем потоке с записью ошибок в журнал (None - файл пропускается)"""
         try:
-            for root, _, files in os.walk(folder_path):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    file_ext = Path(file_path).suffix.lower()
-                    
-                    if file_ext in supported_extensions:
-                        try:
-                            # Проверка размера файла
-                            file_size = os.path.getsize(file_path)
-                            if file_size > MAX_FILE_SIZE:
-                                print(f"Skipping large file {file_path} ({file_size / (1024*1024):.1f} MB)")
-                                continue
-                            
-                            # Проверка доступности файла
-                            if not os.access(file_path, os.R_OK):
-                                print(f"Permission denied: {file_path}")
-                                continue
-                            
-                            metadata, risks = self.analyze_file(file_path)
-                            if risks:  # Сохраняем только файлы с рисками
-                                results[file_path] = {
-                                    'metadata': metadata,
-                                    'risks': risks
-                                }
-                        except PermissionError:
-                            print(f"Permission denied: {file_path}")
-                        except FileNotFoundError:
-                            print(f"File not found (may have been deleted): {file_path}")
-                        except OSError as e:
-                            print(f"OS error analyzing {file_path}: {e}")
-                        except Exception as e:
-                            print(f"Error analyzing {file_path}: {e}")
+            # Записи журнала парсера относятся к этому файлу
+            with file_context(file_path):
+                return self._parse_file(file_path, detected)
         except PermissionError:
-            print(f"Permission denied accessing folder: {folder_path}")
+            logger.warning("Permission denied: %s", file_path, extra={'file_path': file_path})
+        except FileNotFoundError:
+            logger.warning("File not found (may have been deleted): %s", file_path,
+                           extra={'file_path': file_path})
+        except OSError as e:
+            logger.warning("OS error analyzing %s: %s", file_path, e, extra={'file_path': file_path})
         except Exception as e:
-            print(f"Error walking folder {folder_path}: {e}")
-                    
-        return results
+            logger.warning("Error analyzing %s: %s", file_path, e, extra={'file_path': file_path})
+            self.metrics.incr('parse_errors')
+        return None
+                
+    def _collect_results(self, outcomes: Iterable[Tuple[str, Dict, List[Dict]]], results: Dict[str, Dict],
+                         progress_callback: Optional[Callable[[int], None]] = None,
+                         result_callback: Optional[Callable[[str, Dict], None]] = None):
+        """Анализ рисков по мере готовности метаданных"""
+        processed = 0
+        last_progress = time.monotonic()
+        for file_path, detected, metadata in outcomes:
+            processed += 1
+            if progress_callback and time.monotonic() - last_progress >= self.PROGRESS_INTERVAL:
+                last_progress = time.monotonic()
+                progress_callback(processed)
+            self._record_outcome(file_path, detected, metadata, results, result_callback)
+            
+    def _record_outcome(self, file_path: str, detected: Dict, metadata: List[Dict], results: Dict[str, Dict],
+                        result_callback: Optional[Callable[[str, Dict], None]] = None):
+        """Анализ рисков разобранного файла и сохранение результата"""
+        self.metrics.incr('files_parsed')
+        self.metrics.incr('bytes_parsed', detected.get('size', 0))
+        try:
+            start = time.perf_counter()
+            entry = self._build_entry(file_path, detected, metadata)
+            if self.last_profiler:
+                self.last_profiler.record_file(file_path, time.perf_counter() - start)
+            if 'mtime_ns' in detected:
+                if self.result_cache is not None:
+                    self.result_cache.put(file_path, detected['size'], detected['mtime_ns'], entry,
+                                          self.ruleset_hash)
+                if self._checkpoint is not None:
+                    self._checkpoint.put(file_path, detected['size'], detected['mtime_ns'], entry)
+            self._store_result(file_path, entry, results, result_callback)
+        except Exception as e:
+            logger.warning("Error analyzing %s: %s", file_path, e, extra={'file_path': file_path})
+            
+    def _build_entry(self, file_path: str, detected: Dict, metadata: List[Dict]) -> Optional[Dict]:
+        """Результат файла для results и кэшей (None - рисков нет)
+        
+        Элементы членов архива (с ключом 'member') отделяются от элементов
+        самого файла: entry['members'] - {адрес члена: {'metadata', 'risks'}}
+        только для членов с рисками. У файла без собственных рисков, но с
+        рисками в членах, 'risks' пустой.
+        """
+        metadata, risks = self._finish_file(file_path, detected, metadata)
+        if not any('member' in item for item in metadata):
+            # Сохраняем только файлы с рисками
+            return {'metadata': metadata, 'risks': risks} if risks else None
+        
+        entries: Dict[str, Dict] = {}
+        for field, items in (('metadata', metadata), ('risks', risks)):
+            for item in items:
+                item = dict(item)
+                member = item.pop('member', '')
+                entries.setdefault(member, {'metadata': [], 'risks': []})[field].append(item)
+        entry = entries.pop('', {'metadata': [], 'risks': []})
+        members = {member: member_entry for member, member_entry in entries.items() if member_entry['risks']}
+        if members:
+            entry['members'] = members
+        elif not entry['risks']:
+            return None
+        return entry
+        
+    @staticmethod
+    def expand_entry(file_path: str, entry: Optional[Dict]) -> Dict[str, Dict]:
+        """Результаты файла и его членов по адресам (archive.zip!/dir/file.docx)"""
+        if not entry:
+            return {}
+        expanded = {}
+        if entry['risks']:
+            expanded[file_path] = {key: value for key, value in entry.items() if key != 'members'}
+        for member, member_entry in entry.get('members', {}).items():
+            expanded[member_address(file_path, member)] = member_entry
+        return expanded
+        
+    def _store_result(self, file_path: str, entry: Optional[Dict], results: Dict[str, Dict],
+                      result_callback: Optional[Callable[[str, Dict], None]] = None):
+        for address, address_entry in self.expand_entry(file_path, entry).items():
+            results[address] = address_entry
+            self.aggregate.add(address, address_entry)
+            if result_callback:
+                result_callback(address, address_entry)
+        
+    def _parse_file(self, file_path: str, detected: Dict) -> List[Dict]:
+        """Извлечение метаданных парсером, выбранным по типу содержимого"""
+        mime_type = detected['mime']
+        parser = get_parser_for_file(file_path, mime_type) if mime_type else None
+        if not parser:
+            return []
+        # Уже прочитанный заголовок передается парсеру
+        with self.metrics.timer(f'parse:{parser.__class__.__name__}'):
+            return parser.extract_metadata(file_path, detected['header'])
+        
+    def _finish_file(self, file_path: str, detected: Dict, metadata: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """Дополнение метаданных и анализ рисков"""
+        # Несоответствие расширения и содержимого - отдельная находка
+        if detected['mismatch']:
+            metadata.append(mismatch_metadata(file_path, detected))
+        
+        if not metadata:
+            return [], []
+        
+        with self.metrics.timer('risk'):
+            risks = self.risk_analyzer.analyze_risks(metadata)
+        return metadata, risks
         
     def _get_mime_type(self, file_path: str) -> Optional[str]:
         """Получение MIME-типа файла по расширению"""
-        ext = Path(file_path).suffix.lower()
-        mime_map = {
-            '.pdf': 'application/pdf',
-            '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-            '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            '.doc': 'application/msword',
-            '.xls': 'application/vnd.ms-excel',
-            '.jpg': 'image/jpeg',
-            '.jpeg': 'image/jpeg',
-            '.png': 'image/png',
-            '.tiff': 'image/tiff',
-            '.tif': 'image/tiff',
-            '.gif': 'image/gif',
-            '.bmp': 'image/bmp',
-            '.heic': 'image/heic',  
-            '.heif': 'image/heif',  
-        }
-        return mime_map.get(ext)
+        return mime_for_extension(file_path)
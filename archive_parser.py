@@ -0,0 +1,207 @@
+import io
+import re
+import tarfile
+import zipfile
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import PurePosixPath
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from .base_parser import BaseParser
+from .parser_registry import get_parser_for_file
+from .scan_filter import SUPPORTED_EXTENSIONS, file_extension
+from .scan_logging import get_logger
+from .type_detector import HEADER_SIZE, TypeDetector, mismatch_metadata
+
+logger = get_logger('archive_parser')
+
+# Разделитель адреса члена архива: outer.zip!/inner.docx!/word/media/image1.jpeg
+MEMBER_SEPARATOR = '!/'
+
+# Ограничения на разбор вложенных файлов одного файла на диске
+MAX_NESTING_DEPTH = 3
+MAX_TOTAL_BYTES = 512 * 1024 * 1024
+MAX_MEMBER_SIZE = 100 * 1024 * 1024
+MAX_MEMBERS = 10000
+
+# Части пакета OOXML с вложенными изображениями и документами
+PACKAGE_MEDIA = re.compile(r'(word|xl|ppt)/(media|embeddings)/[^/]+')
+
+# Член архива: (имя, размер, время изменения, открытие потока)
+Member = Tuple[str, int, Optional[datetime], Callable[[], BinaryIO]]
+
+
+class MemberFile(io.BytesIO):
+    """Содержимое члена архива в памяти, передается парсеру вместо пути"""
+
+    def __init__(self, data: bytes, name: str, mtime: Optional[datetime] = None):
+        super().__init__(data)
+        self.name = name
+        self.size = len(data)
+        self.mtime = mtime
+
+
+class _Nesting:
+    """Глубина вложенности и общий бюджет байт и членов для одного файла на диске"""
+
+    def __init__(self):
+        self.depth = 0
+        self.remaining_bytes = MAX_TOTAL_BYTES
+        self.members = 0
+
+
+# Текущий уровень вложенности: парсер члена архива (например, DocxParser для
+# inner.docx) сам вызывает scan_members для своих вложений
+_nesting: ContextVar[Optional[_Nesting]] = ContextVar('archive_nesting', default=None)
+
+
+def member_address(file_path: str, member: str) -> str:
+    return f'{file_path}{MEMBER_SEPARATOR}{member}'
+
+
+def scan_members(members: Iterable[Member]) -> List[Dict]:
+    """Разбирает члены архива подходящими парсерами без распаковки на диск.
+
+    Каждый член читается в память и передается парсеру как MemberFile.
+    У возвращаемых элементов метаданных есть ключ 'member' - адрес члена
+    относительно текущего файла (для вложенных архивов через MEMBER_SEPARATOR).
+    Читаются только члены с поддерживаемыми расширениями и в пределах
+    MAX_NESTING_DEPTH, MAX_TOTAL_BYTES, MAX_MEMBER_SIZE и MAX_MEMBERS.
+    """
+    parent = _nesting.get()
+    nesting = _Nesting()
+    if parent is not None:
+        nesting.depth = parent.depth
+        nesting.remaining_bytes = parent.remaining_bytes
+        nesting.members = parent.members
+    nesting.depth += 1
+    if nesting.depth > MAX_NESTING_DEPTH:
+        logger.warning("Archive nesting depth %d reached, members are not scanned", MAX_NESTING_DEPTH)
+        return []
+
+    detector = TypeDetector()
+    metadata = []
+    try:
+        for name, size, mtime, open_member in members:
+            if file_extension(PurePosixPath(name).name) not in SUPPORTED_EXTENSIONS:
+                continue
+            if nesting.members >= MAX_MEMBERS:
+                logger.warning("Archive member limit %d reached, remaining members skipped", MAX_MEMBERS)
+                break
+            if size > MAX_MEMBER_SIZE or size > nesting.remaining_bytes:
+                logger.warning("Archive member skipped, size limit exceeded: %s (%d bytes)", name, size)
+                continue
+
+            with open_member() as stream:
+                # Размер из заголовка архива может не совпадать с данными
+                data = stream.read(min(MAX_MEMBER_SIZE, nesting.remaining_bytes) + 1)
+            if len(data) > MAX_MEMBER_SIZE or len(data) > nesting.remaining_bytes:
+                logger.warning("Archive member skipped, size limit exceeded: %s", name)
+                continue
+            nesting.remaining_bytes -= len(data)
+            nesting.members += 1
+
+            items = _parse_member(detector, MemberFile(data, name, mtime), nesting)
+            for item in items:
+                nested = item.get('member')
+                item['member'] = name if nested is None else member_address(name, nested)
+            metadata.extend(items)
+    finally:
+        # Бюджет общий для всего файла на диске
+        if parent is not None:
+            parent.remaining_bytes = nesting.remaining_bytes
+            parent.members = nesting.members
+    return metadata
+
+
+def _parse_member(detector: TypeDetector, source: MemberFile, nesting: _Nesting) -> List[Dict]:
+    header = source.getvalue()[:HEADER_SIZE]
+    detected = detector.detect_header(source.name, header)
+    items = []
+    parser = get_parser_for_file(source.name, detected['mime']) if detected['mime'] else None
+    if parser:
+        token = _nesting.set(nesting)
+        try:
+            items = parser.extract_metadata(source, header)
+        except Exception as e:
+            logger.warning("Error analyzing archive member %s: %s", source.name, e)
+        finally:
+            _nesting.reset(token)
+    if detected['mismatch']:
+        items.append(mismatch_metadata(source.name, detected))
+    return items
+
+
+def _zip_members(archive: zipfile.ZipFile, pattern: Optional['re.Pattern'] = None) -> Iterator[Member]:
+    for info in archive.infolist():
+        if info.is_dir() or (pattern is not None and not pattern.fullmatch(info.filename)):
+            continue
+        if info.flag_bits & 0x1:
+            logger.warning("Encrypted archive member skipped: %s", info.filename)
+            continue
+        try:
+            mtime = datetime(*info.date_time)
+        except ValueError:
+            mtime = None
+        yield info.filename, info.file_size, mtime, lambda info=info: archive.open(info)
+
+
+def _tar_members(archive: tarfile.TarFile) -> Iterator[Member]:
+    for info in archive:
+        if not info.isfile():
+            continue
+        try:
+            mtime = datetime.fromtimestamp(info.mtime)
+        except (ValueError, OverflowError, OSError):
+            # Время вне диапазона платформы не должно отбрасывать весь архив
+            mtime = None
+        yield info.name, info.size, mtime, lambda info=info: archive.extractfile(info)
+
+
+def scan_package_media(source: Union[str, BinaryIO]) -> List[Dict]:
+    """Разбирает изображения и вложенные документы пакета OOXML (word/media, xl/embeddings, ...)"""
+    with zipfile.ZipFile(source) as package:
+        return scan_members(_zip_members(package, PACKAGE_MEDIA))
+
+
+class ArchiveParser(BaseParser):
+    """Архивы ZIP и TAR (в том числе .tar.gz): метаданные вложенных файлов.
+
+    Члены архива не распаковываются на диск, а передаются парсерам из
+    памяти; результаты адресуются как archive.zip!/dir/file.docx.
+    """
+
+    @staticmethod
+    def supported_formats() -> List[str]:
+        return [
+            'application/zip',
+            'application/x-tar',
+            'application/gzip'
+        ]
+
+    def extract_metadata(self, file_path: Union[str, BinaryIO], header: Optional[bytes] = None) -> List[Dict]:
+        metadata = []
+
+        try:
+            with self._open(file_path, header) as f:
+                if zipfile.is_zipfile(f):
+                    with zipfile.ZipFile(f) as archive:
+                        metadata.append(self._format_metadata('Archive Members', len(archive.infolist())))
+                        if archive.comment:
+                            metadata.append(self._format_metadata(
+                                'Archive Comment', archive.comment.decode('utf-8', errors='replace')))
+                        metadata.extend(scan_members(_zip_members(archive)))
+                else:
+                    f.seek(0)
+                    try:
+                        archive = tarfile.open(fileobj=f, mode='r:*')
+                    except tarfile.ReadError as e:
+                        # Сжатый gzip файл, внутри которого не tar, - не архив
+                        logger.debug("Not a ZIP or TAR archive: %s", e)
+                        return metadata
+                    with archive:
+                        metadata.extend(scan_members(_tar_members(archive)))
+
+        except (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError) as e:
+            logger.warning("Error reading archive: %s", e)
+
+        return metadata
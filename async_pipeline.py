@@ -0,0 +1,195 @@
+import asyncio
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .parse_supervisor import ParseSupervisor
+from .read_ahead import ReadAhead
+from .scan_filter import ScanFilter
+
+# Маркер окончания потока задач в очереди стадии
+_DONE = object()
+
+
+def _next_batch(entries, size: int) -> List:
+    """Следующие size записей обхода (пустой список - обход закончен)"""
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= size:
+            break
+    return batch
+
+
+def _run_in_executor(executor: ThreadPoolExecutor, func, *args) -> asyncio.Future:
+    """run_in_executor в копии текущего контекста
+
+    Сам run_in_executor не переносит contextvars, а записи журнала из потока
+    должны попасть в ошибки того сканирования, которое его запустило.
+    """
+    context = contextvars.copy_context()
+    return asyncio.get_running_loop().run_in_executor(executor, context.run, func, *args)
+
+
+class AsyncScanPipeline:
+    """Конвейер сканирования папки на asyncio.
+
+    Стадии работают одновременно и связаны ограниченными очередями:
+        обход каталогов -> чтение заголовков -> разбор -> анализ рисков
+    Обход и чтение заголовков - блокирующий ввод-вывод в пуле потоков
+    (prefetch_concurrency одновременных чтений, вместе с заголовком ядру
+    подсказываются остальные нужные парсеру участки файла), разбор - в рабочих процессах
+    ParseSupervisor через отдельный пул потоков, анализ рисков - в цикле
+    событий. Заполненная очередь останавливает предыдущую стадию, поэтому
+    память не растет, если диск быстрее процессора или наоборот.
+    """
+
+    def __init__(self, engine, prefetch_concurrency: int = 32, parse_concurrency: Optional[int] = None,
+                 queue_size: int = 256, enumerate_batch: int = 64):
+        self.engine = engine
+        self.prefetch_concurrency = max(1, prefetch_concurrency)
+        self.parse_concurrency = parse_concurrency
+        self.queue_size = queue_size
+        self.enumerate_batch = enumerate_batch
+        # Результаты текущего запуска run()
+        self._results: Dict[str, Dict] = {}
+        self._result_callback: Optional[Callable[[str, Dict], None]] = None
+
+    async def run(self, folder_path: str, scan_filter: ScanFilter, results: Dict[str, Dict],
+                  progress_callback: Optional[Callable[[int], None]] = None,
+                  result_callback: Optional[Callable[[str, Dict], None]] = None):
+        """Сканирует папку, дополняя results файлами с рисками"""
+        engine = self.engine
+        self._results = results
+        self._result_callback = result_callback
+        supervisor = None
+        if engine.parse_timeout is not None or engine.memory_limit_mb is not None:
+            supervisor = ParseSupervisor(workers=engine.parse_workers, timeout=engine.parse_timeout,
+                                         memory_limit_mb=engine.memory_limit_mb, metrics=engine.metrics)
+            parse_concurrency = supervisor.workers
+        else:
+            parse_concurrency = self.parse_concurrency or os.cpu_count() or 1
+
+        read_ahead = ReadAhead(metrics=engine.metrics) if engine.read_ahead else None
+        io_executor = ThreadPoolExecutor(self.prefetch_concurrency, thread_name_prefix='scan-io')
+        parse_executor = ThreadPoolExecutor(parse_concurrency, thread_name_prefix='scan-parse')
+        paths = asyncio.Queue(self.queue_size)
+        sniffed = asyncio.Queue(self.queue_size)
+        parsed = asyncio.Queue(self.queue_size)
+
+        stages = [
+            asyncio.ensure_future(self._enumerate(folder_path, scan_filter, paths)),
+            asyncio.ensure_future(self._stage(self.prefetch_concurrency,
+                                              lambda: self._prefetch(io_executor, read_ahead, paths, sniffed,
+                                                                     parsed),
+                                              sniffed, parse_concurrency)),
+            asyncio.ensure_future(self._stage(parse_concurrency,
+                                              lambda: self._parse(parse_executor, supervisor, sniffed, parsed),
+                                              parsed, 1)),
+            asyncio.ensure_future(self._score(parsed, progress_callback)),
+        ]
+        try:
+            await asyncio.gather(*stages)
+        finally:
+            for stage in stages:
+                stage.cancel()
+            await asyncio.gather(*stages, return_exceptions=True)
+            # Потоки дорабатывают текущие файлы, новых задач они уже не получат
+            io_executor.shutdown(wait=True)
+            parse_executor.shutdown(wait=True)
+            if supervisor is not None:
+                supervisor.close()
+
+    @staticmethod
+    async def _stage(count: int, worker, output: asyncio.Queue, consumers: int):
+        """Запускает count копий стадии и по их окончании закрывает выходную очередь"""
+        await asyncio.gather(*(worker() for _ in range(count)))
+        for _ in range(consumers):
+            await output.put(_DONE)
+
+    async def _enumerate(self, folder_path: str, scan_filter: ScanFilter, output: asyncio.Queue):
+        """Обход каталогов пачками в потоке ParallelTreeWalker"""
+        loop = asyncio.get_running_loop()
+        metrics = self.engine.metrics
+        entries = self.engine.walker.walk(folder_path, scan_filter)
+        # Один поток: генератор обхода нельзя продолжать и закрывать одновременно
+        executor = ThreadPoolExecutor(1, thread_name_prefix='scan-walk')
+        try:
+            while True:
+                start = time.perf_counter()
+                batch = await loop.run_in_executor(executor, _next_batch, entries, self.enumerate_batch)
+                metrics.observe('enumerate', time.perf_counter() - start)
+                if not batch:
+                    break
+                metrics.incr('files_enumerated', len(batch))
+                for entry in batch:
+                    await output.put(entry.path)
+        finally:
+            # Останавливает потоки обхода, если сканирование прервано
+            await loop.run_in_executor(executor, entries.close)
+            executor.shutdown(wait=False)
+        for _ in range(self.prefetch_concurrency):
+            await output.put(_DONE)
+
+    async def _prefetch(self, executor: ThreadPoolExecutor, read_ahead: Optional[ReadAhead],
+                        source: asyncio.Queue, output: asyncio.Queue, cached: asyncio.Queue):
+        """Проверка доступа, чтение заголовка и упреждающее чтение файла.
+
+        Результат из кэша минует разбор и сразу уходит в очередь анализа
+        (cached), где сохраняется в цикле событий, как и остальные результаты.
+        """
+        while True:
+            file_path = await source.get()
+            if file_path is _DONE:
+                return
+            found, detected = await _run_in_executor(executor, self._sniff, read_ahead, file_path)
+            if found:
+                await cached.put((file_path, None, detected))
+            elif detected is not None:
+                await output.put((file_path, detected))
+
+    def _sniff(self, read_ahead: Optional[ReadAhead], file_path: str) -> Tuple[bool, Optional[Dict]]:
+        """(True, результат из кэша) или (False, тип файла; None - файл пропускается)"""
+        found, entry = self.engine._cached_entry(file_path)
+        if found:
+            return True, entry
+        detected = self.engine._sniff(file_path)
+        # Файл ждет разбора в очереди, пока ядро подгружает его участки
+        if detected is not None and read_ahead is not None:
+            read_ahead.advise(file_path, detected)
+        return False, detected
+
+    async def _parse(self, executor: ThreadPoolExecutor, supervisor: Optional[ParseSupervisor],
+                     source: asyncio.Queue, output: asyncio.Queue):
+        """Извлечение метаданных в рабочем процессе или потоке"""
+        parse = supervisor.parse if supervisor is not None else self.engine._parse_guarded
+        while True:
+            item = await source.get()
+            if item is _DONE:
+                return
+            file_path, detected = item
+            metadata = await _run_in_executor(executor, parse, file_path, detected)
+            if metadata is not None:
+                await output.put((file_path, detected, metadata))
+
+    async def _score(self, source: asyncio.Queue, progress_callback: Optional[Callable[[int], None]] = None):
+        """Анализ рисков по мере готовности метаданных"""
+        engine = self.engine
+        processed = 0
+        last_progress = time.monotonic()
+        while True:
+            item = await source.get()
+            if item is _DONE:
+                return
+            file_path, detected, payload = item
+            if detected is None:
+                # Результат из кэша: файл не разбирался
+                engine._store_result(file_path, payload, self._results, self._result_callback)
+                continue
+            processed += 1
+            if progress_callback and time.monotonic() - last_progress >= engine.PROGRESS_INTERVAL:
+                last_progress = time.monotonic()
+                progress_callback(processed)
+            engine._record_outcome(file_path, detected, payload, self._results, self._result_callback)
@@ -1,5 +1,65 @@
+import io
+import os
 from abc import ABC, abstractmethod
-from typing import Dict, List
+from contextlib import contextmanager
+from typing import BinaryIO, Dict, Iterator, List, Optional, Union
+from .metadata_value import metadata_value
+
+
+class PrefixedFile(io.RawIOBase):
+    """Файл, начало которого уже прочитано (заголовок из TypeDetector).
+
+    Чтение внутри заголовка обслуживается из памяти, с диска читается
+    только остальная часть файла.
+    """
+
+    def __init__(self, raw: io.FileIO, prefix: bytes):
+        self._raw = raw
+        self._prefix = prefix
+        self._pos = 0
+        self._raw_pos = 0
+        self.name = raw.name
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer).cast('B')
+        if self._pos < len(self._prefix):
+            data = self._prefix[self._pos:self._pos + len(view)]
+            view[:len(data)] = data
+            self._pos += len(data)
+            return len(data)
+        if self._raw_pos != self._pos:
+            self._raw.seek(self._pos)
+        n = self._raw.readinto(view) or 0
+        self._pos += n
+        self._raw_pos = self._pos
+        return n
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += os.fstat(self._raw.fileno()).st_size
+        elif whence != io.SEEK_SET:
+            raise ValueError(f'invalid whence ({whence})')
+        if offset < 0:
+            raise ValueError(f'negative seek position {offset}')
+        self._pos = offset
+        return offset
+
+    def tell(self) -> int:
+        return self._pos
+
+    def close(self):
+        if not self.closed:
+            self._raw.close()
+        super().close()
+
 
 class BaseParser(ABC):
     """Абстрактный базовый класс для всех парсеров"""
@@ -11,14 +71,58 @@ class BaseParser(ABC):
         pass
         
     @abstractmethod
-    def extract_metadata(self, file_path: str) -> List[Dict]:
-        """Извлекает метаданные из файла"""
+    def extract_metadata(self, file_path: Union[str, BinaryIO], header: Optional[bytes] = None) -> List[Dict]:
+        """Извлекает метаданные из файла
+        
+        Args:
+            file_path: путь к файлу или поток с содержимым члена архива
+                (MemberFile с атрибутами name, size, mtime)
+            header: первые байты файла, если они уже прочитаны при определении типа
+        """
         pass
         
+    @staticmethod
+    @contextmanager
+    def _open(source: Union[str, BinaryIO], header: Optional[bytes] = None) -> Iterator[BinaryIO]:
+        """Открывает файл по пути; поток члена архива перематывается в начало.
+
+        Если передан header (начало файла, уже прочитанное при определении
+        типа), эти байты отдаются из памяти, а не читаются с диска повторно.
+        """
+        if isinstance(source, (str, os.PathLike)):
+            if header:
+                with io.BufferedReader(PrefixedFile(open(source, 'rb', buffering=0), header)) as f:
+                    yield f
+            else:
+                with open(source, 'rb') as f:
+                    yield f
+        else:
+            source.seek(0)
+            yield source
+            
+    @staticmethod
+    def _member_info(source: BinaryIO) -> Dict[str, str]:
+        """Базовая информация о члене архива (вместо os.stat для файла на диске)"""
+        name = getattr(source, 'name', '')
+        size = getattr(source, 'size', 0)
+        info = {
+            'File Name': os.path.basename(name),
+            'File Size': f"{size} bytes ({size / 1024:.1f} KB)",
+            'File Extension': os.path.splitext(name)[1],
+            'File Path': name,
+        }
+        mtime = getattr(source, 'mtime', None)
+        if mtime:
+            info['File Modified'] = mtime.strftime('%Y-%m-%d %H:%M:%S')
+        return info
+        
     def _format_metadata(self, key: str, value: str, source: str = None) -> Dict:
-        """Форматирует метаданные в стандартный вид"""
+        """Форматирует метаданные в стандартный вид.
+
+        Двоичное значение не переводится в строку, а хранится как BinaryValue.
+        """
         return {
             'key': key,
-            'value': str(value) if value else '',
+            'value': metadata_value(value),
             'source': source or self.__class__.__name__
         }
\ No newline at end of file
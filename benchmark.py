@@ -0,0 +1,314 @@
+"""Бенчмарк анализатора на синтетическом корпусе.
+
+Примеры:
+    python -m core.benchmark --corpus /tmp/corpus --generate --files-per-type 50
+    python -m core.benchmark --corpus /tmp/corpus --output baseline.json
+    python -m core.benchmark --corpus /tmp/corpus --baseline baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from .analyzer_engine import AnalyzerEngine
+from .export_manager import ExportManager
+from .import_budget import measure_import
+from .scan_logging import setup_logging
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Значения, которые гарантированно срабатывают на правилах RiskAnalyzer
+_AUTHORS = ['Ivan Petrov', 'Anna Smirnova', 'j.doe@example.com', 'admin']
+_COMPANIES = ['ACME Corp', 'Contoso Ltd', 'Initech']
+_PATHS = [r'C:\Users\ivan\Documents\report.docx', '/home/anna/work/plan.xlsx',
+          r'\\fileserver\share\budget.xls']
+
+
+def _gps_tuple(value: float):
+    degrees = int(value)
+    minutes = int((value - degrees) * 60)
+    seconds = round(((value - degrees) * 60 - minutes) * 60, 2)
+    return (float(degrees), float(minutes), float(seconds))
+
+
+def _make_exif(rng: random.Random):
+    from PIL import Image
+    exif = Image.Exif()
+    exif[271] = rng.choice(['Canon', 'Nikon', 'Apple'])   # Make
+    exif[272] = rng.choice(['EOS 5D', 'D750', 'iPhone 14'])  # Model
+    exif[305] = 'Adobe Photoshop 25.0'                     # Software
+    exif[306] = '2024:05:17 10:21:33'                      # DateTime
+    exif[315] = rng.choice(_AUTHORS)                       # Artist
+    gps = exif.get_ifd(0x8825)
+    gps[1] = 'N'
+    gps[2] = _gps_tuple(rng.uniform(40, 60))
+    gps[3] = 'E'
+    gps[4] = _gps_tuple(rng.uniform(20, 40))
+    return exif
+
+
+def _make_image(path: str, fmt: str, size, rng: random.Random):
+    from PIL import Image
+    image = Image.new('RGB', size, (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    image.save(path, fmt, exif=_make_exif(rng))
+
+
+def _make_pdf(path: str, pages: int, rng: random.Random):
+    from PyPDF2 import PdfWriter
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=595, height=842)
+    writer.add_metadata({
+        '/Author': rng.choice(_AUTHORS),
+        '/Creator': 'Microsoft Word 2016',
+        '/Producer': 'Acrobat Distiller 21.0',
+        '/Title': rng.choice(_PATHS),
+    })
+    with open(path, 'wb') as f:
+        writer.write(f)
+
+
+def _make_docx(path: str, paragraphs: int, rng: random.Random):
+    from docx import Document
+    document = Document()
+    for i in range(paragraphs):
+        document.add_paragraph(f'Paragraph {i} ' + 'lorem ipsum ' * 20)
+    props = document.core_properties
+    props.author = rng.choice(_AUTHORS)
+    props.last_modified_by = rng.choice(_AUTHORS)
+    props.comments = rng.choice(_PATHS)
+    props.category = rng.choice(_COMPANIES)
+    document.save(path)
+
+
+def _make_xlsx(path: str, rows: int, rng: random.Random):
+    from openpyxl import Workbook
+    workbook = Workbook()
+    sheet = workbook.active
+    for r in range(1, rows + 1):
+        sheet.append([r, rng.random(), f'row {r}'])
+    workbook.properties.creator = rng.choice(_AUTHORS)
+    workbook.properties.lastModifiedBy = rng.choice(_AUTHORS)
+    workbook.properties.description = rng.choice(_PATHS)
+    workbook.save(path)
+
+
+def _make_heic(path: str, size, rng: random.Random) -> bool:
+    try:
+        import pillow_heif
+    except ImportError:
+        return False
+    from PIL import Image
+    pillow_heif.register_heif_opener()
+    image = Image.new('RGB', size, (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    image.save(path, 'HEIF', exif=_make_exif(rng).tobytes())
+    return True
+
+
+def generate_corpus(output_dir: str, files_per_type: int = 20, image_size=(1024, 768),
+                    pdf_pages: int = 5, docx_paragraphs: int = 50, xlsx_rows: int = 200,
+                    duplication_ratio: float = 0.1, seed: int = 42) -> Dict:
+    """Создает воспроизводимый синтетический корпус без обращения к сети
+
+    Args:
+        output_dir: каталог корпуса (будет создан)
+        files_per_type: количество уникальных файлов каждого типа
+        image_size: размер изображений JPEG/TIFF/HEIC
+        pdf_pages, docx_paragraphs, xlsx_rows: размер документов
+        duplication_ratio: доля дополнительных копий уже созданных файлов
+        seed: зерно генератора случайных чисел
+
+    Returns:
+        Dict: описание корпуса (количество файлов по типам, общий размер)
+    """
+    rng = random.Random(seed)
+    os.makedirs(output_dir, exist_ok=True)
+
+    generators = {
+        'pdf': lambda p: _make_pdf(p, pdf_pages, rng),
+        'docx': lambda p: _make_docx(p, docx_paragraphs, rng),
+        'xlsx': lambda p: _make_xlsx(p, xlsx_rows, rng),
+        'jpg': lambda p: _make_image(p, 'JPEG', image_size, rng),
+        'tiff': lambda p: _make_image(p, 'TIFF', image_size, rng),
+        'heic': lambda p: _make_heic(p, image_size, rng),
+    }
+
+    created: List[str] = []
+    counts: Dict[str, int] = {}
+    for ext, generate in generators.items():
+        type_dir = os.path.join(output_dir, ext)
+        os.makedirs(type_dir, exist_ok=True)
+        for i in range(files_per_type):
+            path = os.path.join(type_dir, f'{ext}_{i:05d}.{ext}')
+            if generate(path) is False:
+                # Необязательный формат (HEIC без pillow-heif)
+                shutil.rmtree(type_dir, ignore_errors=True)
+                break
+            created.append(path)
+            counts[ext] = counts.get(ext, 0) + 1
+
+    duplicates = int(len(created) * duplication_ratio)
+    dup_dir = os.path.join(output_dir, 'duplicates')
+    if duplicates:
+        os.makedirs(dup_dir, exist_ok=True)
+    for i in range(duplicates):
+        source = rng.choice(created)
+        shutil.copyfile(source, os.path.join(dup_dir, f'dup_{i:05d}_{os.path.basename(source)}'))
+
+    total_bytes = sum(os.path.getsize(os.path.join(root, name))
+                      for root, _, names in os.walk(output_dir) for name in names)
+    return {'files_per_type': counts, 'duplicates': duplicates, 'total_bytes': total_bytes,
+            'seed': seed}
+
+
+def _peak_rss_mb() -> Dict[str, Optional[float]]:
+    """Пиковый RSS текущего процесса и дочерних процессов"""
+    if resource is None:
+        return {'self': None, 'children': None}
+    # ru_maxrss: килобайты в Linux, байты в macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return {
+        'self': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+        'children': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale,
+    }
+
+
+def _time(func: Callable, repeat: int) -> Dict:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {'best_s': min(timings), 'mean_s': sum(timings) / len(timings), 'runs': len(timings)}
+
+
+def run_benchmark(corpus_dir: str, repeat: int = 3, parse_workers: Optional[int] = None) -> Dict:
+    """Измеряет основные операции анализатора на корпусе"""
+    files = sorted(os.path.join(root, name) for root, _, names in os.walk(corpus_dir) for name in names)
+    total_bytes = sum(os.path.getsize(f) for f in files)
+    results: Dict = {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'corpus': {'path': corpus_dir, 'files': len(files), 'bytes': total_bytes},
+        'import': measure_import(),
+        'operations': {},
+    }
+    operations = results['operations']
+
+    inline_engine = AnalyzerEngine(parse_timeout=None, memory_limit_mb=None)
+
+    # analyze_file по каждому файлу корпуса
+    collected = {}
+
+    def analyze_each():
+        for path in files:
+            collected[path] = inline_engine.analyze_file(path)
+
+    operations['analyze_file'] = _time(analyze_each, repeat)
+
+    # analyze_folder в текущем процессе и в рабочих процессах
+    folder_results = {}
+
+    def analyze_inline():
+        folder_results.update(inline_engine.analyze_folder(corpus_dir))
+
+    operations['analyze_folder_inline'] = _time(analyze_inline, repeat)
+
+    supervised_engine = AnalyzerEngine(parse_workers=parse_workers)
+    operations['analyze_folder_supervised'] = _time(
+        lambda: supervised_engine.analyze_folder(corpus_dir), repeat)
+
+    # analyze_risks на уже извлеченных метаданных
+    all_metadata = [metadata for metadata, _ in collected.values()]
+    operations['analyze_risks'] = _time(
+        lambda: [inline_engine.risk_analyzer.analyze_risks(m) for m in all_metadata], repeat)
+
+    # Экспорт
+    flat_metadata = [item for metadata, _ in collected.values() for item in metadata]
+    flat_risks = [risk for _, risks in collected.values() for risk in risks]
+    folder_risks = {path: data['risks'] for path, data in folder_results.items()}
+    with tempfile.TemporaryDirectory() as tmp:
+        operations['export_to_html'] = _time(lambda: ExportManager.export_to_html(
+            os.path.join(tmp, 'report.html'), flat_metadata, flat_risks), repeat)
+        operations['export_to_csv'] = _time(lambda: ExportManager.export_to_csv(
+            os.path.join(tmp, 'report.csv'), flat_metadata, flat_risks), repeat)
+        operations['export_folder_to_html'] = _time(lambda: ExportManager.export_folder_to_html(
+            os.path.join(tmp, 'folder.html'), folder_risks, corpus_dir), repeat)
+        operations['export_folder_to_csv'] = _time(lambda: ExportManager.export_folder_to_csv(
+            os.path.join(tmp, 'folder.csv'), folder_risks, corpus_dir), repeat)
+
+    # Пропускная способность по файлам и байтам
+    for name in ('analyze_file', 'analyze_folder_inline', 'analyze_folder_supervised'):
+        best = operations[name]['best_s']
+        operations[name]['files_per_s'] = round(len(files) / best, 2) if best else None
+        operations[name]['mb_per_s'] = round(total_bytes / (1024 * 1024) / best, 2) if best else None
+
+    results['peak_rss_mb'] = _peak_rss_mb()
+    return results
+
+
+def compare_to_baseline(results: Dict, baseline: Dict, tolerance: float = 0.2) -> List[str]:
+    """Возвращает список операций, замедлившихся больше чем на tolerance относительно базовой линии"""
+    regressions = []
+    for name, current in results['operations'].items():
+        previous = baseline.get('operations', {}).get(name)
+        if not previous or not previous.get('best_s'):
+            continue
+        ratio = current['best_s'] / previous['best_s']
+        if ratio > 1 + tolerance:
+            regressions.append(f"{name}: {previous['best_s'] * 1000:.1f} ms -> "
+                               f"{current['best_s'] * 1000:.1f} ms ({(ratio - 1) * 100:+.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Metadata analyzer benchmark')
+    parser.add_argument('--corpus', required=True, help='corpus directory')
+    parser.add_argument('--generate', action='store_true', help='generate the corpus first')
+    parser.add_argument('--files-per-type', type=int, default=20)
+    parser.add_argument('--image-size', type=int, nargs=2, default=[1024, 768])
+    parser.add_argument('--duplication-ratio', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--baseline', help='compare against this JSON baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+    setup_logging()
+
+    if args.generate:
+        corpus = generate_corpus(args.corpus, files_per_type=args.files_per_type,
+                                 image_size=tuple(args.image_size),
+                                 duplication_ratio=args.duplication_ratio, seed=args.seed)
+        print(f"Corpus generated: {json.dumps(corpus)}")
+
+    results = run_benchmark(args.corpus, repeat=args.repeat, parse_workers=args.workers)
+    print(json.dumps(results, indent=2))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,23 @@
+"""Тесты импортируют модули как пакет core, так же как main.py"""
+import atexit
+import os
+import sys
+import tempfile
+
+_root = os.path.dirname(os.path.abspath(__file__))
+
+if os.path.basename(_root) == 'core':
+    _parent = os.path.dirname(_root)
+else:
+    # Каталог репозитория называется иначе: пакет core - ссылка на него
+    _parent = tempfile.mkdtemp(prefix='metadate-tests-')
+    os.symlink(_root, os.path.join(_parent, 'core'))
+
+    @atexit.register
+    def _remove_link():
+        os.unlink(os.path.join(_parent, 'core'))
+        os.rmdir(_parent)
+
+sys.path.insert(0, _parent)
+# Дочерние процессы (рабочие процессы разбора, проверка импорта) ищут пакет там же
+os.environ['PYTHONPATH'] = os.pathsep.join(filter(None, [_parent, os.environ.get('PYTHONPATH')]))
@@ -1,43 +1,72 @@
-from docx import Document
-from typing import List, Dict
+from docx.opc.coreprops import CoreProperties
+from docx.oxml.parser import parse_xml
+from typing import BinaryIO, List, Dict, Optional
 from .base_parser import BaseParser
+from .archive_parser import scan_package_media
+from .ooxml_scanner import read_core_part, scan_ooxml_parts
+from .scan_logging import get_logger
+
+logger = get_logger('docx_parser')
 
 class DocxParser(BaseParser):
     
     @staticmethod
     def supported_formats() -> List[str]:
         return [
-            'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-            'application/msword'
+            'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
         ]
         
-    def extract_metadata(self, file_path: str) -> List[Dict]:
+    def extract_metadata(self, file_path: str, header: Optional[bytes] = None) -> List[Dict]:
+        try:
+            # Пакет открывается один раз, все части читаются из одного потока
+            with self._open(file_path, header) as package:
+                return self._extract_from_package(package)
+        except OSError as e:
+            logger.warning("Error opening DOCX file: %s", e)
+            return []
+
+    def _extract_from_package(self, package: BinaryIO) -> List[Dict]:
         metadata = []
         
         try:
-            doc = Document(file_path)
-            core_props = doc.core_properties
+            # Только docProps/core.xml: Document() разобрал бы в DOM весь текст документа
+            core_part = read_core_part(package)
+            if core_part is not None:
+                core_props = CoreProperties(parse_xml(core_part))
+                
+                # Основные свойства документа
+                properties = {
+                    'title': core_props.title,
+                    'subject': core_props.subject,
+                    'author': core_props.author,
+                    'last_modified_by': core_props.last_modified_by,
+                    'created': core_props.created,
+                    'modified': core_props.modified,
+                    'keywords': core_props.keywords,
+                    'category': core_props.category,
+                    'comments': core_props.comments,
+                    'revision': core_props.revision,
+                    'version': core_props.version,
+                }
+                
+                for key, value in properties.items():
+                    if value:
+                        metadata.append(self._format_metadata(key, value))
+                    
+        except Exception as e:
+            logger.warning("Error reading DOCX metadata: %s", e)
             
-            # Основные свойства документа
-            properties = {
-                'title': core_props.title,
-                'subject': core_props.subject,
-                'author': core_props.author,
-                'last_modified_by': core_props.last_modified_by,
-                'created': core_props.created,
-                'modified': core_props.modified,
-                'keywords': core_props.keywords,
-                'category': core_props.category,
-                'comments': core_props.comments,
-                'revision': core_props.revision,
-                'version': core_props.version,
-            }
+        try:
+            # Рецензенты, авторы исправлений, шаблон и внешние ссылки из частей пакета
+            for key, value in scan_ooxml_parts(package):
+                metadata.append(self._format_metadata(key, value))
+        except Exception as e:
+            logger.warning("Error scanning DOCX parts: %s", e)
             
-            for key, value in properties.items():
-                if value:
-                    metadata.append(self._format_metadata(key, value))
-                    
+        try:
+            # Изображения и вложенные документы (word/media, word/embeddings) как члены пакета
+            metadata.extend(scan_package_media(package))
         except Exception as e:
-            print(f"Error reading DOCX metadata: {e}")
+            logger.warning("Error scanning DOCX media: %s", e)
             
         return metadata
@@ -1,46 +1,77 @@
-from openpyxl import load_workbook
-from typing import List, Dict
+from openpyxl.packaging.core import DocumentProperties
+from openpyxl.xml.functions import fromstring
+from typing import BinaryIO, List, Dict, Optional
 from .base_parser import BaseParser
+from .archive_parser import scan_package_media
+from .ooxml_scanner import read_core_part, scan_ooxml_parts, workbook_sheet_names
+from .scan_logging import get_logger
+
+logger = get_logger('excel_parser')
 
 class ExcelParser(BaseParser):
     
     @staticmethod
     def supported_formats() -> List[str]:
         return [
-            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            'application/vnd.ms-excel'
+            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
         ]
         
-    def extract_metadata(self, file_path: str) -> List[Dict]:
+    def extract_metadata(self, file_path: str, header: Optional[bytes] = None) -> List[Dict]:
+        try:
+            # Пакет открывается один раз, все части читаются из одного потока
+            with self._open(file_path, header) as package:
+                return self._extract_from_package(package)
+        except OSError as e:
+            logger.warning("Error opening Excel file: %s", e)
+            return []
+
+    def _extract_from_package(self, package: BinaryIO) -> List[Dict]:
         metadata = []
         
         try:
-            workbook = load_workbook(file_path)
-            props = workbook.properties
-            
-            properties = {
-                'title': props.title,
-                'subject': props.subject,
-                'author': props.creator,
-                'last_modified_by': props.lastModifiedBy,
-                'created': props.created,
-                'modified': props.modified,
-                'keywords': props.keywords,
-                'category': props.category,
-                'description': props.description,
-                'revision': props.revision,
-                'version': props.version,
-            }
-            
-            for key, value in properties.items():
-                if value:
-                    metadata.append(self._format_metadata(key, value))
+            # Свойства и имена листов читаются из своих частей: load_workbook
+            # разобрал бы все листы и общие строки
+            core_part = read_core_part(package)
+            if core_part is not None:
+                props = DocumentProperties.from_tree(fromstring(core_part))
+                
+                properties = {
+                    'title': props.title,
+                    'subject': props.subject,
+                    'author': props.creator,
+                    'last_modified_by': props.lastModifiedBy,
+                    'created': props.created,
+                    'modified': props.modified,
+                    'keywords': props.keywords,
+                    'category': props.category,
+                    'description': props.description,
+                    'revision': props.revision,
+                    'version': props.version,
+                }
+                
+                for key, value in properties.items():
+                    if value:
+                        metadata.append(self._format_metadata(key, value))
                     
             # Информация о листах
-            metadata.append(self._format_metadata('Sheets', len(workbook.sheetnames)))
-            metadata.append(self._format_metadata('Sheet Names', ', '.join(workbook.sheetnames)))
+            sheet_names = workbook_sheet_names(package)
+            metadata.append(self._format_metadata('Sheets', len(sheet_names)))
+            metadata.append(self._format_metadata('Sheet Names', ', '.join(sheet_names)))
             
         except Exception as e:
-            print(f"Error reading Excel metadata: {e}")
+            logger.warning("Error reading Excel metadata: %s", e)
+            
+        try:
+            # Авторы примечаний, внешние связи книги и свойства из docProps/app.xml
+            for key, value in scan_ooxml_parts(package):
+                metadata.append(self._format_metadata(key, value))
+        except Exception as e:
+            logger.warning("Error scanning Excel parts: %s", e)
+            
+        try:
+            # Изображения и вложенные документы (xl/media, xl/embeddings) как члены пакета
+            metadata.extend(scan_package_media(package))
+        except Exception as e:
+            logger.warning("Error scanning Excel media: %s", e)
             
         return metadata
@@ -1,8 +1,13 @@
 import csv
 import os
 from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, Optional
 from pathlib import Path
+from .metadata_value import materialize
+from .scan_aggregate import ScanAggregate
+from .scan_logging import get_logger
+
+logger = get_logger('export_manager')
 
 class ExportManager:
     @staticmethod
@@ -60,7 +65,7 @@ class ExportManager:
                     
                     f.write(f'        <tr {risk_class}>\n')
                     f.write(f'            <td>{item["key"]}</td>\n')
-                    f.write(f'            <td>{item["value"]}</td>\n')
+                    f.write(f'            <td>{materialize(item["value"])}</td>\n')
                     f.write(f'            <td>{item["source"]}</td>\n')
                     f.write(f'            <td>{risk_badge}</td>\n')
                     f.write('        </tr>\n')
@@ -82,7 +87,7 @@ class ExportManager:
                     for risk in risks:
                         f.write(f'        <tr class="{risk["level"]}-risk">\n')
                         f.write(f'            <td>{risk["key"]}</td>\n')
-                        f.write(f'            <td>{risk["value"]}</td>\n')
+                        f.write(f'            <td>{materialize(risk["value"])}</td>\n')
                         f.write(f'            <td>{risk["level"].upper()}</td>\n')
                         f.write(f'            <td>{risk["rule"]}</td>\n')
                         f.write(f'            <td>{risk["source"]}</td>\n')
@@ -95,11 +100,14 @@ class ExportManager:
             
             return True
         except Exception as e:
-            print(f"Error exporting to HTML: {e}")
+            logger.error("Error exporting to HTML: %s", e)
             return False
     @staticmethod
-    def export_folder_to_html(file_path: str, results: Dict[str, List[Dict]], folder_path: str):
-        """Экспорт отчета по папке в HTML"""
+    def export_folder_to_html(file_path: str, results: Dict[str, List[Dict]], folder_path: str,
+                              errors: Optional[List[Dict]] = None,
+                              aggregate: Optional[ScanAggregate] = None):
+        """Экспорт отчета по папке в HTML (errors - ошибки обработки файлов при сканировании,
+        aggregate - статистика сканирования; без нее считается по results)"""
         try:
             with open(file_path, 'w', encoding='utf-8') as f:
                 f.write('<!DOCTYPE html>\n')
@@ -129,13 +137,10 @@ class ExportManager:
                 f.write(f'    <p>Total files with risks: {len(results)}</p>\n')
                 
                 # Общая статистика
-                total_risks = 0
-                risk_stats = {'high': 0, 'medium': 0, 'low': 0}
-                
-                for file_risks in results.values():
-                    total_risks += len(file_risks)
-                    for risk in file_risks:
-                        risk_stats[risk['level']] += 1
+                if aggregate is None:
+                    aggregate = ScanAggregate.from_risks(results)
+                total_risks = aggregate.total_risks
+                risk_stats = aggregate.by_level
                 
                 f.write(f'    <p>Total risks found: {total_risks}</p>\n')
                 f.write(f'    <p>Risk statistics: High ({risk_stats["high"]}), Medium ({risk_stats["medium"]}), Low ({risk_stats["low"]})</p>\n')
@@ -160,7 +165,7 @@ class ExportManager:
                     for risk in risks:
                         f.write(f'            <tr class="{risk["level"]}-risk">\n')
                         f.write(f'                <td>{risk["key"]}</td>\n')
-                        f.write(f'                <td>{risk["value"]}</td>\n')
+                        f.write(f'                <td>{materialize(risk["value"])}</td>\n')
                         f.write(f'                <td><span class="risk-badge {risk["level"]}-risk">{risk["level"].upper()}</span></td>\n')
                         f.write(f'                <td>{risk["rule"]}</td>\n')
                         f.write(f'                <td>{risk["source"]}</td>\n')
@@ -169,17 +174,41 @@ class ExportManager:
                     f.write('        </table>\n')
                     f.write('    </div>\n')
                 
+                # Файлы, которые не удалось обработать полностью
+                if errors:
+                    f.write(f'    <h2>Scan Errors ({len(errors)})</h2>\n')
+                    f.write('    <table>\n')
+                    f.write('        <tr>\n')
+                    f.write('            <th>File</th>\n')
+                    f.write('            <th>Level</th>\n')
+                    f.write('            <th>Source</th>\n')
+                    f.write('            <th>Message</th>\n')
+                    f.write('        </tr>\n')
+                    
+                    for error in errors:
+                        f.write('        <tr>\n')
+                        f.write(f'            <td>{error["file_path"]}</td>\n')
+                        f.write(f'            <td>{error["level"]}</td>\n')
+                        f.write(f'            <td>{error["source"]}</td>\n')
+                        f.write(f'            <td>{error["message"]}</td>\n')
+                        f.write('        </tr>\n')
+                    
+                    f.write('    </table>\n')
+                
                 f.write('</body>\n')
                 f.write('</html>\n')
             
             return True
         except Exception as e:
-            print(f"Error exporting folder to HTML: {e}")
+            logger.error("Error exporting folder to HTML: %s", e)
             return False
 
     @staticmethod
-    def export_folder_to_csv(file_path: str, results: Dict[str, List[Dict]], folder_path: str):
-        """Экспорт отчета по папке в CSV"""
+    def export_folder_to_csv(file_path: str, results: Dict[str, List[Dict]], folder_path: str,
+                             errors: Optional[List[Dict]] = None,
+                             aggregate: Optional[ScanAggregate] = None):
+        """Экспорт отчета по папке в CSV (errors - ошибки обработки файлов при сканировании,
+        aggregate - статистика сканирования; без нее считается по results)"""
         try:
             with open(file_path, 'w', newline='', encoding='utf-8') as f:
                 writer = csv.writer(f)
@@ -192,13 +221,10 @@ class ExportManager:
                 writer.writerow([])
                 
                 # Общая статистика
-                total_risks = 0
-                risk_stats = {'high': 0, 'medium': 0, 'low': 0}
-                
-                for file_risks in results.values():
-                    total_risks += len(file_risks)
-                    for risk in file_risks:
-                        risk_stats[risk['level']] += 1
+                if aggregate is None:
+                    aggregate = ScanAggregate.from_risks(results)
+                total_risks = aggregate.total_risks
+                risk_stats = aggregate.by_level
                 
                 writer.writerow([f'Total risks found: {total_risks}'])
                 writer.writerow(['Risk statistics:', f'High: {risk_stats["high"]}', f'Medium: {risk_stats["medium"]}', f'Low: {risk_stats["low"]}'])
@@ -216,7 +242,7 @@ class ExportManager:
                     for risk in risks:
                         writer.writerow([
                             risk['key'],
-                            risk['value'],
+                            materialize(risk['value']),
                             risk['level'].upper(),
                             risk['rule'],
                             risk['source']
@@ -225,9 +251,21 @@ class ExportManager:
                     writer.writerow([])
                     writer.writerow([])
                 
+                # Файлы, которые не удалось обработать полностью
+                if errors:
+                    writer.writerow([f'SCAN ERRORS: {len(errors)}'])
+                    writer.writerow(['File path', 'Level', 'Source', 'Message'])
+                    for error in errors:
+                        writer.writerow([
+                            error['file_path'],
+                            error['level'],
+                            error['source'],
+                            error['message']
+                        ])
+                
             return True
         except Exception as e:
-            print(f"Error exporting folder to CSV: {e}")
+            logger.error("Error exporting folder to CSV: %s", e)
             return False
         
     @staticmethod
@@ -263,7 +301,7 @@ class ExportManager:
                     
                     writer.writerow([
                         item['key'],
-                        item['value'],
+                        materialize(item['value']),
                         item['source'],
                         risk_level
                     ])
@@ -278,7 +316,7 @@ class ExportManager:
                     for risk in risks:
                         writer.writerow([
                             risk['key'],
-                            risk['value'],
+                            materialize(risk['value']),
                             risk['level'].upper(),
                             risk['rule'],
                             risk['source']
@@ -286,5 +324,5 @@ class ExportManager:
             
             return True
         except Exception as e:
-            print(f"Error exporting to CSV: {e}")
+            logger.error("Error exporting to CSV: %s", e)
             return False
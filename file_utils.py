@@ -1,24 +1,23 @@
 import os
 from pathlib import Path
-from typing import List
+from typing import List, Optional
+from .tree_walker import walk_files
+from .scan_filter import ScanFilter, SUPPORTED_EXTENSIONS, file_extension
 
-def get_supported_files(folder_path: str) -> List[str]:
+def get_supported_files(folder_path: str, max_workers: int = 8, max_depth: Optional[int] = None,
+                        follow_symlinks: bool = False, exclude: Optional[List[str]] = None,
+                        scan_filter: Optional[ScanFilter] = None) -> List[str]:
     """Возвращает список поддерживаемых файлов в папке"""
-    supported_extensions = {'.pdf', '.docx', '.xlsx', '.jpg', '.jpeg', '.png', '.tiff', '.tif'}
-    supported_files = []
+    if scan_filter is None:
+        scan_filter = ScanFilter.default()
     
-    for root, _, files in os.walk(folder_path):
-        for file in files:
-            file_path = os.path.join(root, file)
-            if Path(file_path).suffix.lower() in supported_extensions:
-                supported_files.append(file_path)
-                
-    return supported_files
+    return list(walk_files(folder_path, max_workers=max_workers, max_depth=max_depth,
+                           follow_symlinks=follow_symlinks, exclude=exclude,
+                           scan_filter=scan_filter))
 
 def is_supported_file(file_path: str) -> bool:
     """Проверяет, поддерживается ли файл для анализа"""
-    supported_extensions = {'.pdf', '.docx', '.xlsx', '.jpg', '.jpeg', '.png', '.tiff', '.tif'}
-    return Path(file_path).suffix.lower() in supported_extensions
+    return file_extension(Path(file_path).name) in SUPPORTED_EXTENSIONS
 
 def get_file_size_mb(file_path: str) -> float:
     """Возвращает размер файла в мегабайтах"""
@@ -0,0 +1,445 @@
+"""Наблюдение за папкой: повторный анализ только измененных файлов.
+
+Запуск без GUI: python -m core.folder_watcher FOLDER --events events.jsonl
+"""
+import argparse
+import ctypes
+import ctypes.util
+import errno
+import json
+import os
+import select
+import struct
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .archive_parser import member_address
+from .parse_supervisor import ParseSupervisor
+from .scan_aggregate import ScanAggregate
+from .scan_filter import ScanFilter
+from .scan_logging import get_logger
+
+logger = get_logger('folder_watcher')
+
+# Флаги inotify (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MODIFY | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE |
+              IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+# Виды изменений, которые возвращают источники событий
+CHANGED = 'changed'
+REMOVED = 'removed'
+RESCAN = 'rescan'
+
+Change = Tuple[str, str]
+
+
+class InotifyBackend:
+    """Изменения файлов через inotify (Linux), по наблюдателю на каталог"""
+
+    def __init__(self, root_path: str, should_descend: Callable[[str, str], bool]):
+        self.root_path = root_path
+        self.should_descend = should_descend
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._dirs: Dict[int, str] = {}
+        self._add_tree(root_path)
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def _add_watch(self, dir_path: str) -> bool:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(dir_path), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC:
+                logger.warning("inotify watch limit reached (fs.inotify.max_user_watches), "
+                               "not watching %s", dir_path)
+            elif err not in (errno.ENOENT, errno.ENOTDIR):
+                logger.warning("Cannot watch %s: %s", dir_path, os.strerror(err))
+            return False
+        self._dirs[wd] = dir_path
+        return True
+
+    def _add_tree(self, dir_path: str) -> List[str]:
+        """Наблюдение за каталогом и подкаталогами; возвращает найденные в них файлы"""
+        files = []
+        for current, dirnames, filenames in os.walk(dir_path):
+            if not self._add_watch(current):
+                dirnames[:] = []
+                continue
+            dirnames[:] = [d for d in dirnames
+                           if self.should_descend(d, os.path.relpath(os.path.join(current, d), self.root_path))]
+            files.extend(os.path.join(current, name) for name in filenames)
+        return files
+
+    def poll(self, timeout: float) -> List[Change]:
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+
+        changes: List[Change] = []
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                offset += length
+                changes.extend(self._translate(wd, mask, name))
+        return changes
+
+    def _translate(self, wd: int, mask: int, name: str) -> List[Change]:
+        if mask & IN_Q_OVERFLOW:
+            logger.warning("inotify queue overflow, rescanning %s", self.root_path)
+            return [(RESCAN, self.root_path)]
+        if mask & IN_IGNORED:
+            self._dirs.pop(wd, None)
+            return []
+        dir_path = self._dirs.get(wd)
+        if dir_path is None:
+            return []
+        if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+            return [(REMOVED, dir_path)] if dir_path != self.root_path else [(RESCAN, dir_path)]
+
+        path = os.path.join(dir_path, name)
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                rel_path = os.path.relpath(path, self.root_path)
+                if self.should_descend(name, rel_path):
+                    # Файлы, появившиеся до установки наблюдателя, анализируются сразу
+                    return [(CHANGED, file_path) for file_path in self._add_tree(path)]
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                return [(REMOVED, path)]
+            return []
+        if mask & (IN_DELETE | IN_MOVED_FROM):
+            return [(REMOVED, path)]
+        return [(CHANGED, path)]
+
+
+class PollingBackend:
+    """Изменения файлов сравнением снимков (size, mtime) при каждом обходе"""
+
+    def __init__(self, root_path: str, walker, scan_filter: ScanFilter, interval: float = 5.0):
+        self.root_path = root_path
+        self.walker = walker
+        self.scan_filter = scan_filter
+        self.interval = interval
+        self._next_poll = time.monotonic() + interval
+        self._snapshot = self._take_snapshot()
+
+    def close(self):
+        pass
+
+    def _take_snapshot(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        for entry in self.walker.walk(self.root_path, self.scan_filter):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            snapshot[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def poll(self, timeout: float) -> List[Change]:
+        wait = self._next_poll - time.monotonic()
+        if wait > 0:
+            time.sleep(min(wait, timeout))
+            if time.monotonic() < self._next_poll:
+                return []
+        self._next_poll = time.monotonic() + self.interval
+
+        snapshot = self._take_snapshot()
+        changes: List[Change] = [(CHANGED, path) for path, state in snapshot.items()
+                                 if self._snapshot.get(path) != state]
+        changes.extend((REMOVED, path) for path in self._snapshot if path not in snapshot)
+        self._snapshot = snapshot
+        return changes
+
+
+def _risk_key(risk: Dict) -> Tuple:
+    return risk.get('rule'), risk['key'], str(risk['value'])
+
+
+class FolderWatcher:
+    """Живой индекс результатов анализа папки.
+
+    После первого полного сканирования повторно анализируются только
+    созданные и измененные файлы. События одного файла объединяются:
+    анализ начинается, когда файл не менялся debounce секунд (копирование
+    большого документа дает десятки IN_MODIFY). Появление и исчезновение
+    рисков передаются в on_event (из потока наблюдателя) и дописываются в
+    JSONL файл event_log:
+        {"event": "new_risk" | "risk_resolved", "time": ..., "file_path": ...,
+         "rule": ..., "level": ..., "key": ..., "value": ...}
+    """
+
+    def __init__(self, engine, folder_path: str, scan_filter: Optional[ScanFilter] = None,
+                 debounce: float = 1.0, poll_interval: float = 5.0,
+                 on_event: Optional[Callable[[Dict], None]] = None, event_log: Optional[str] = None,
+                 backend: str = 'auto'):
+        self.engine = engine
+        self.folder_path = os.path.abspath(folder_path)
+        self.scan_filter = scan_filter or engine.scan_filter
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.on_event = on_event
+        self.event_log = event_log
+        self.backend_name = backend
+        # Файлы с рисками: путь -> {'metadata', 'risks'}, как в analyze_folder
+        self.index: Dict[str, Dict] = {}
+        # Сводная статистика по индексу, обновляется вместе с ним
+        self.aggregate = ScanAggregate()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._supervisor: Optional[ParseSupervisor] = None
+        self._log_file = None
+
+    def start(self):
+        """Запускает первое сканирование и наблюдение в фоновом потоке"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='folder-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Копия текущего индекса для отображения и экспорта"""
+        with self._lock:
+            return dict(self.index)
+
+    def _create_backend(self):
+        def should_descend(name: str, rel_path: str) -> bool:
+            return (self.scan_filter.should_descend(name, rel_path)
+                    and not self.engine.walker._is_excluded(name, rel_path))
+
+        if self.backend_name in ('auto', 'inotify'):
+            try:
+                return InotifyBackend(self.folder_path, should_descend)
+            except (OSError, AttributeError) as e:
+                if self.backend_name == 'inotify':
+                    raise
+                logger.info("inotify unavailable (%s), polling every %.0f s", e, self.poll_interval)
+        return PollingBackend(self.folder_path, self.engine.walker, self.scan_filter, self.poll_interval)
+
+    def _run(self):
+        engine = self.engine
+        if engine.parse_timeout is not None or engine.memory_limit_mb is not None:
+            self._supervisor = ParseSupervisor(workers=1, timeout=engine.parse_timeout,
+                                               memory_limit_mb=engine.memory_limit_mb)
+        if self.event_log:
+            self._log_file = open(self.event_log, 'a', encoding='utf-8')
+        backend = None
+        try:
+            # Наблюдение ставится до сканирования, чтобы не потерять изменения во время него
+            backend = self._create_backend()
+            self._rescan(initial=True)
+            pending: Dict[str, float] = {}
+            while not self._stop.is_set():
+                timeout = 0.5
+                if pending:
+                    timeout = max(0.0, min(min(pending.values()) + self.debounce - time.monotonic(), timeout))
+                for kind, path in backend.poll(timeout):
+                    if kind == RESCAN:
+                        pending.clear()
+                        self._rescan()
+                    elif kind == REMOVED:
+                        pending.pop(path, None)
+                        self._remove(path)
+                    elif self._accepts(path):
+                        pending[path] = time.monotonic()
+
+                now = time.monotonic()
+                for path in [p for p, changed_at in pending.items() if now - changed_at >= self.debounce]:
+                    del pending[path]
+                    self._analyze(path)
+        except Exception as e:
+            logger.error("Folder watcher stopped on %s: %s", self.folder_path, e)
+        finally:
+            if backend is not None:
+                backend.close()
+            if self._supervisor is not None:
+                self._supervisor.close()
+                self._supervisor = None
+            if self._log_file is not None:
+                self._log_file.close()
+                self._log_file = None
+
+    def _accepts(self, file_path: str) -> bool:
+        rel_path = os.path.relpath(file_path, self.folder_path)
+        name = os.path.basename(file_path)
+        # Те же исключения обходчика, что и при полном сканировании (~$*.docx и т.п.),
+        # иначе следующий _rescan сообщит о ложном исчезновении риска
+        if self.engine.walker._is_excluded(name, rel_path):
+            return False
+        if not self.scan_filter.accepts_name(name, rel_path):
+            return False
+        if self.scan_filter.needs_stat:
+            try:
+                return self.scan_filter.accepts_stat(os.stat(file_path))
+            except OSError:
+                return False
+        return True
+
+    def _rescan(self, initial: bool = False):
+        """Полное сканирование с обновлением индекса (первое - без событий)"""
+        results = self.engine.analyze_folder(self.folder_path, self.scan_filter)
+        if initial:
+            with self._lock:
+                self.index = results
+                self.aggregate = self.engine.aggregate
+            return
+        with self._lock:
+            paths = set(self.index) | set(results)
+        for path in sorted(paths):
+            self._update(path, results.get(path))
+
+    def _analyze(self, file_path: str):
+        """Повторный анализ одного файла"""
+        engine = self.engine
+        if engine.reload_rules():
+            # Сменились правила рисков: риски всех файлов пересчитываются
+            self._rescan()
+            return
+        if not os.path.isfile(file_path):
+            self._update(file_path, None)
+            return
+        detected = engine._sniff(file_path)
+        if detected is None:
+            return
+        if self._supervisor is not None:
+            metadata = self._supervisor.parse(file_path, detected)
+        else:
+            metadata = engine._parse_guarded(file_path, detected)
+        if metadata is None:
+            return
+        try:
+            entries = engine.expand_entry(file_path, engine._build_entry(file_path, detected, metadata))
+        except Exception as e:
+            logger.warning("Error analyzing %s: %s", file_path, e, extra={'file_path': file_path})
+            return
+        # Члены архива, у которых больше нет рисков, тоже сняты
+        prefix = member_address(file_path, '')
+        with self._lock:
+            stale = [p for p in self.index if p.startswith(prefix) and p not in entries]
+        for path in sorted({file_path, *stale, *entries}):
+            self._update(path, entries.get(path))
+
+    def _remove(self, path: str):
+        """Удаленный файл или каталог: все его риски сняты"""
+        prefix = path.rstrip(os.sep) + os.sep
+        members = member_address(path, '')
+        with self._lock:
+            paths = [p for p in self.index if p == path or p.startswith(prefix) or p.startswith(members)]
+        for file_path in paths:
+            self._update(file_path, None)
+
+    def _update(self, file_path: str, entry: Optional[Dict]):
+        with self._lock:
+            old = self.index.get(file_path)
+            if entry is None:
+                self.index.pop(file_path, None)
+            else:
+                self.index[file_path] = entry
+            self.aggregate.remove(file_path, old)
+            self.aggregate.add(file_path, entry)
+
+        old_risks = {_risk_key(r): r for r in (old or {}).get('risks', [])}
+        new_risks = {_risk_key(r): r for r in (entry or {}).get('risks', [])}
+        events = [self._event('new_risk', file_path, risk)
+                  for key, risk in new_risks.items() if key not in old_risks]
+        events.extend(self._event('risk_resolved', file_path, risk)
+                      for key, risk in old_risks.items() if key not in new_risks)
+        self._emit(events)
+
+    @staticmethod
+    def _event(kind: str, file_path: str, risk: Dict) -> Dict:
+        return {
+            'event': kind,
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'file_path': file_path,
+            'rule': risk.get('rule'),
+            'level': risk.get('level'),
+            'key': risk['key'],
+            'value': str(risk['value']),
+        }
+
+    def _emit(self, events: List[Dict]):
+        if not events:
+            return
+        if self._log_file is not None:
+            for event in events:
+                self._log_file.write(json.dumps(event, ensure_ascii=False) + '\n')
+            self._log_file.flush()
+        if self.on_event:
+            for event in events:
+                try:
+                    self.on_event(event)
+                except Exception as e:
+                    logger.error("Watch event handler failed: %s", e)
+
+
+def main():
+    from .analyzer_engine import AnalyzerEngine
+    from .scan_logging import setup_logging
+
+    parser = argparse.ArgumentParser(description='Watch a folder and report risk changes')
+    parser.add_argument('folder')
+    parser.add_argument('--events', help='append change events to this JSONL file')
+    parser.add_argument('--debounce', type=float, default=1.0, help='seconds of quiet before a file is analyzed')
+    parser.add_argument('--poll-interval', type=float, default=5.0, help='polling fallback interval, seconds')
+    parser.add_argument('--backend', choices=['auto', 'inotify', 'poll'], default='auto')
+    parser.add_argument('--rule-pack', action='append', dest='rule_packs',
+                        help='risk rule pack JSON file (repeatable, replaces the built-in pack)')
+    args = parser.parse_args()
+    setup_logging()
+
+    def print_event(event: Dict):
+        print(f"{event['event']}: [{event['level']}] {event['rule']} - {event['file_path']}")
+
+    watcher = FolderWatcher(AnalyzerEngine(rule_packs=args.rule_packs), args.folder, debounce=args.debounce,
+                            poll_interval=args.poll_interval, on_event=print_event,
+                            event_log=args.events, backend=args.backend)
+    watcher.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        watcher.stop()
+
+
+if __name__ == '__main__':
+    main()
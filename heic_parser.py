@@ -1,9 +1,172 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 from .base_parser import BaseParser
 import os
 from pathlib import Path
 from datetime import datetime
+import struct
+import threading
+import xml.etree.ElementTree as ET
 from PIL import Image
+from .isobmff import BoxError, read_heif_meta
+from .scan_logging import get_logger
+
+logger = get_logger('heic_parser')
+
+# Названия значений тега Orientation (274)
+ORIENTATION_NAMES = {
+    1: 'Horizontal (normal)',
+    2: 'Mirrored horizontal',
+    3: 'Rotated 180°',
+    4: 'Mirrored vertical',
+    5: 'Mirrored horizontal then rotated 90° CCW',
+    6: 'Rotated 90° CW',
+    7: 'Mirrored horizontal then rotated 90° CW',
+    8: 'Rotated 90° CCW'
+}
+
+# Имена EXIF-тегов по их идентификаторам
+EXIF_TAGS = {
+    # Основные теги
+    271: 'Make',
+    272: 'Model',
+    274: 'Orientation',
+    282: 'XResolution',
+    283: 'YResolution',
+    296: 'ResolutionUnit',
+    305: 'Software',
+    306: 'DateTime',
+    315: 'Artist',
+    33432: 'Copyright',
+    
+    # EXIF теги
+    36864: 'ExifVersion',
+    36867: 'DateTimeOriginal',
+    36868: 'DateTimeDigitized',
+    37377: 'ShutterSpeedValue',
+    37378: 'ApertureValue',
+    37379: 'BrightnessValue',
+    37380: 'ExposureBiasValue',
+    37381: 'MaxApertureValue',
+    37382: 'SubjectDistance',
+    37383: 'MeteringMode',
+    37384: 'LightSource',
+    37385: 'Flash',
+    37386: 'FocalLength',
+    37387: 'FlashEnergy',
+    37388: 'SpatialFrequencyResponse',
+    37389: 'Noise',
+    37390: 'FocalPlaneXResolution',
+    37391: 'FocalPlaneYResolution',
+    37392: 'FocalPlaneResolutionUnit',
+    37393: 'ImageNumber',
+    37394: 'SecurityClassification',
+    37395: 'ImageHistory',
+    37396: 'SubjectArea',
+    37397: 'ExposureIndex',
+    37398: 'TIFF/EPStandardID',
+    37399: 'SensingMethod',
+    37500: 'MakerNote',
+    37510: 'UserComment',
+    
+    # GPS теги
+    34853: 'GPSInfo',
+    0: 'GPSVersionID',
+    1: 'GPSLatitudeRef',
+    2: 'GPSLatitude',
+    3: 'GPSLongitudeRef',
+    4: 'GPSLongitude',
+    5: 'GPSAltitudeRef',
+    6: 'GPSAltitude',
+    7: 'GPSTimeStamp',
+    8: 'GPSSatellites',
+    9: 'GPSStatus',
+    10: 'GPSMeasureMode',
+    11: 'GPSDOP',
+    12: 'GPSSpeedRef',
+    13: 'GPSSpeed',
+    14: 'GPSTrackRef',
+    15: 'GPSTrack',
+    16: 'GPSImgDirectionRef',
+    17: 'GPSImgDirection',
+    18: 'GPSMapDatum',
+    19: 'GPSDestLatitudeRef',
+    20: 'GPSDestLatitude',
+    21: 'GPSDestLongitudeRef',
+    22: 'GPSDestLongitude',
+    23: 'GPSDestBearingRef',
+    24: 'GPSDestBearing',
+    25: 'GPSDestDistanceRef',
+    26: 'GPSDestDistance',
+    27: 'GPSProcessingMethod',
+    28: 'GPSAreaInformation',
+    29: 'GPSDateStamp',
+    30: 'GPSDifferential',
+    
+    # Дополнительные теги
+    33434: 'ExposureTime',
+    33437: 'FNumber',
+    34850: 'ExposureProgram',
+    34855: 'ISOSpeedRatings',
+    34856: 'OECF',
+    34866: 'SpectralSensitivity',
+    37520: 'SubsecTime',
+    37521: 'SubsecTimeOriginal',
+    37522: 'SubsecTimeDigitized',
+    40960: 'FlashPixVersion',
+    40961: 'ColorSpace',
+    40962: 'PixelXDimension',
+    40963: 'PixelYDimension',
+    40964: 'RelatedSoundFile',
+    41483: 'FlashEnergy',
+    41484: 'SpatialFrequencyResponse',
+    41486: 'FocalPlaneXResolution',
+    41487: 'FocalPlaneYResolution',
+    41488: 'FocalPlaneResolutionUnit',
+    41492: 'SubjectLocation',
+    41493: 'ExposureIndex',
+    41495: 'SensingMethod',
+    41728: 'FileSource',
+    41729: 'SceneType',
+    41730: 'CFAPattern',
+    41985: 'CustomRendered',
+    41986: 'ExposureMode',
+    41987: 'WhiteBalance',
+    41988: 'DigitalZoomRatio',
+    41989: 'FocalLengthIn35mmFilm',
+    41990: 'SceneCaptureType',
+    41991: 'GainControl',
+    41992: 'Contrast',
+    41993: 'Saturation',
+    41994: 'Sharpness',
+    41995: 'DeviceSettingDescription',
+    41996: 'SubjectDistanceRange',
+    42016: 'ImageUniqueID',
+    42032: 'CameraOwnerName',
+    42033: 'BodySerialNumber',
+    42034: 'LensSpecification',
+    42035: 'LensMake',
+    42036: 'LensModel',
+    42037: 'LensSerialNumber',
+}
+
+# Состояние pillow-heif: проверяется и регистрируется в PIL один раз на процесс
+_pillow_heif_available = None
+_pillow_heif_lock = threading.Lock()
+
+
+def _init_pillow_heif() -> bool:
+    """Импортирует pillow-heif и регистрирует HEIF opener при первом вызове"""
+    global _pillow_heif_available
+    if _pillow_heif_available is None:
+        with _pillow_heif_lock:
+            if _pillow_heif_available is None:
+                try:
+                    import pillow_heif
+                    pillow_heif.register_heif_opener()
+                    _pillow_heif_available = True
+                except ImportError:
+                    _pillow_heif_available = False
+    return _pillow_heif_available
 
 class HEICParser(BaseParser):
     
@@ -14,7 +177,7 @@ class HEICParser(BaseParser):
             'image/heif'
         ]
         
-    def extract_metadata(self, file_path: str) -> List[Dict]:
+    def extract_metadata(self, file_path: str, header: Optional[bytes] = None) -> List[Dict]:
         metadata = []
         
         try:
@@ -23,16 +186,20 @@ class HEICParser(BaseParser):
             for key, value in file_info.items():
                 metadata.append(self._format_metadata(key, value))
             
-            # Пытаемся использовать pillow-heif если доступен
-            if self._has_pillow_heif():
-                heif_metadata = self._extract_with_pillow_heif(file_path)
+            # Сначала читаем боксы ISOBMFF напрямую, без декодирования изображения
+            box_metadata = self._extract_with_boxes(file_path, header)
+            if box_metadata is not None:
+                metadata.extend(box_metadata)
+            # Если структура боксов не разобрана, пробуем pillow-heif
+            elif self._has_pillow_heif():
+                heif_metadata = self._extract_with_pillow_heif(file_path, header)
                 metadata.extend(heif_metadata)
             else:
                 metadata.append(self._format_metadata('HEIC_Warning', 
-                    'pillow-heif not available. Install with: pip install pillow-heif'))
+                    'HEIF boxes could not be read and pillow-heif is not available'))
                 
         except Exception as e:
-            print(f"Error reading HEIC metadata: {e}")
+            logger.warning("Error reading HEIC metadata: %s", e)
             # Возвращаем только базовую информацию в случае ошибки
             file_info = self._get_file_info(file_path)
             for key, value in file_info.items():
@@ -40,27 +207,126 @@ class HEICParser(BaseParser):
             
         return metadata
     
-    def _has_pillow_heif(self) -> bool:
-        """Проверяет, доступен ли pillow-heif"""
+    def _extract_with_boxes(self, file_path: str, header: Optional[bytes] = None) -> Optional[List[Dict]]:
+        """Извлекает метаданные из боксов meta; None, если файл не разобран"""
+        metadata = []
+        try:
+            with self._open(file_path, header) as f:
+                heif = read_heif_meta(f)
+
+                metadata.append(self._format_metadata('HEIF Brand', heif.major_brand))
+                if heif.compatible_brands:
+                    metadata.append(self._format_metadata('HEIF Compatible Brands',
+                                                          ', '.join(heif.compatible_brands)))
+
+                primary = heif.primary_item
+                if primary is not None:
+                    metadata.extend(self._primary_item_metadata(heif.item_properties(primary)))
+
+                for item in heif.find_items('Exif'):
+                    metadata.extend(self._extract_exif_payload(heif.read_item(f, item)))
+                    break
+
+                for item in heif.find_items('mime', 'application/rdf+xml'):
+                    metadata.extend(self._extract_xmp(heif.read_item(f, item)))
+                    break
+
+        except (BoxError, struct.error, IndexError) as e:
+            logger.warning("Error reading HEIF boxes: %s", e)
+            return None
+        return metadata
+
+    def _primary_item_metadata(self, properties: List) -> List[Dict]:
+        """Размеры и цветовые свойства основного изображения из ipco"""
+        metadata = []
+        for prop_type, value in properties:
+            if prop_type == 'ispe' and value:
+                width, height = value['width'], value['height']
+                metadata.append(self._format_metadata('Image Width', width))
+                metadata.append(self._format_metadata('Image Height', height))
+                metadata.append(self._format_metadata('Aspect Ratio', f"{width}:{height}"))
+                metadata.append(self._format_metadata('Megapixels', f"{(width * height) / 1000000:.2f} MP"))
+            elif prop_type == 'irot' and value:
+                metadata.append(self._format_metadata('Rotation', f"{value['angle']}°"))
+            elif prop_type == 'colr' and value.get('icc_size'):
+                metadata.append(self._format_metadata('Color Profile', 'Present'))
+            elif prop_type == 'pixi' and value.get('bits'):
+                metadata.append(self._format_metadata('Bit Depth', ', '.join(map(str, value['bits']))))
+        return metadata
+
+    def _extract_exif_payload(self, data: bytes) -> List[Dict]:
+        """Разбирает элемент Exif: смещение до TIFF-заголовка, затем сам блок EXIF"""
+        metadata = []
         try:
-            import pillow_heif
-            return True
-        except ImportError:
-            return False
+            tiff_offset = struct.unpack('>I', data[:4])[0]
+            exif_data = Image.Exif()
+            exif_data.load(data[4 + tiff_offset:])
+
+            for tag_id, value in exif_data.items():
+                if tag_id == 34853:  # GPSInfo - смещение IFD, теги читаются ниже
+                    continue
+                tag_name = self._get_exif_tag_name(tag_id)
+                if value:
+                    formatted_value = self._format_exif_value(tag_name, value)
+                    metadata.append(self._format_metadata(f'EXIF_{tag_name}', formatted_value))
+
+            for tag_id, value in exif_data.get_ifd(34853).items():
+                tag_name = self._get_exif_tag_name(tag_id)
+                if value:
+                    formatted_value = self._format_exif_value(tag_name, value)
+                    metadata.append(self._format_metadata(f'EXIF_{tag_name}', formatted_value))
+
+            if 274 in exif_data:  # Orientation tag
+                orientation = exif_data[274]
+                metadata.append(self._format_metadata('Orientation',
+                                    ORIENTATION_NAMES.get(orientation, f'Unknown ({orientation})')))
+        except Exception as e:
+            logger.warning("Error extracting EXIF: %s", e)
+        return metadata
+
+    def _extract_xmp(self, data: bytes) -> List[Dict]:
+        """Значения XMP (элемент mime application/rdf+xml) с ключами XMP_<имя>"""
+        metadata = []
+        try:
+            root = ET.fromstring(data.rstrip(b'\x00'))
+            for element in root.iter():
+                name = element.tag.rsplit('}', 1)[-1]
+                # Атрибуты rdf:Description - краткая запись простых свойств
+                if name == 'Description':
+                    for attr, value in element.attrib.items():
+                        attr_name = attr.rsplit('}', 1)[-1]
+                        if attr_name != 'about' and value:
+                            metadata.append(self._format_metadata(f'XMP_{attr_name}', value))
+                    continue
+                text = (element.text or '').strip()
+                if not text or len(element):
+                    continue
+                # Элементы списков rdf:li относятся к свойству-родителю
+                if name == 'li':
+                    continue
+                metadata.append(self._format_metadata(f'XMP_{name}', text))
+            for parent in root.iter():
+                items = [li.text.strip() for container in parent for li in container
+                         if li.tag.endswith('}li') and li.text and li.text.strip()]
+                if items:
+                    name = parent.tag.rsplit('}', 1)[-1]
+                    metadata.append(self._format_metadata(f'XMP_{name}', ', '.join(items)))
+        except Exception as e:
+            logger.warning("Error extracting XMP: %s", e)
+        return metadata
+
+    def _has_pillow_heif(self) -> bool:
+        """Проверяет, доступен ли pillow-heif (opener регистрируется при первой проверке)"""
+        return _init_pillow_heif()
     
-    def _extract_with_pillow_heif(self, file_path: str) -> List[Dict]:
+    def _extract_with_pillow_heif(self, file_path: str, header: Optional[bytes] = None) -> List[Dict]:
         """Извлекает метаданные через pillow-heif"""
         metadata = []
         
         try:
-            import pillow_heif
-            from PIL import Image, ExifTags
-            
-            # Регистрируем HEIF opener
-            pillow_heif.register_heif_opener()
-            
+            # HEIF opener уже зарегистрирован в _init_pillow_heif
             # Открываем изображение
-            with Image.open(file_path) as img:
+            with self._open(file_path, header) as f, Image.open(f) as img:
                 # EXIF данные
                 exif_metadata = self._extract_exif_data(img)
                 metadata.extend(exif_metadata)
@@ -78,7 +344,7 @@ class HEICParser(BaseParser):
                 metadata.extend(additional_metadata)
                         
         except Exception as e:
-            print(f"Error with pillow-heif extraction: {e}")
+            logger.warning("Error with pillow-heif extraction: %s", e)
             
         return metadata
     
@@ -101,7 +367,7 @@ class HEICParser(BaseParser):
                         formatted_value = self._format_exif_value(tag_name, value)
                         metadata.append(self._format_metadata(f'EXIF_{tag_name}', formatted_value))
         except Exception as e:
-            print(f"Error extracting EXIF: {e}")
+            logger.warning("Error extracting EXIF: %s", e)
         return metadata
     
     def _extract_image_info(self, img: Image.Image, file_path: str) -> List[Dict]:
@@ -130,7 +396,7 @@ class HEICParser(BaseParser):
                     metadata.append(self._format_metadata(key, str(value)))
                     
         except Exception as e:
-            print(f"Error extracting image info: {e}")
+            logger.warning("Error extracting image info: %s", e)
         return metadata
     
     def _extract_technical_info(self, img: Image.Image) -> List[Dict]:
@@ -149,7 +415,7 @@ class HEICParser(BaseParser):
                         elif key == 'compression':
                             metadata.append(self._format_metadata('Compression', value))
                         else:
-                            metadata.append(self._format_metadata(f'Tech_{key}', str(value)))
+                            metadata.append(self._format_metadata(f'Tech_{key}', value))
             
             # Ориентация
             try:
@@ -163,23 +429,13 @@ class HEICParser(BaseParser):
                 
                 if exif and 274 in exif:  # Orientation tag
                     orientation = exif[274]
-                    orientation_names = {
-                        1: 'Horizontal (normal)',
-                        2: 'Mirrored horizontal',
-                        3: 'Rotated 180°',
-                        4: 'Mirrored vertical',
-                        5: 'Mirrored horizontal then rotated 90° CCW',
-                        6: 'Rotated 90° CW',
-                        7: 'Mirrored horizontal then rotated 90° CW',
-                        8: 'Rotated 90° CCW'
-                    }
                     metadata.append(self._format_metadata('Orientation', 
-                                        orientation_names.get(orientation, f'Unknown ({orientation})')))
+                                        ORIENTATION_NAMES.get(orientation, f'Unknown ({orientation})')))
             except:
                 pass
                 
         except Exception as e:
-            print(f"Error extracting technical info: {e}")
+            logger.warning("Error extracting technical info: %s", e)
         return metadata
     
     def _extract_additional_metadata(self, img: Image.Image) -> List[Dict]:
@@ -226,11 +482,13 @@ class HEICParser(BaseParser):
                     metadata.append(self._format_metadata(key, value))
                     
         except Exception as e:
-            print(f"Error extracting additional metadata: {e}")
+            logger.warning("Error extracting additional metadata: %s", e)
         return metadata
     
     def _get_file_info(self, file_path: str) -> Dict[str, str]:
         """Извлекает базовую информацию о файле"""
+        if not isinstance(file_path, str):
+            return self._member_info(file_path)
         try:
             stat = os.stat(file_path)
             file_size = stat.st_size
@@ -256,8 +514,11 @@ class HEICParser(BaseParser):
         except Exception as e:
             return {'Error': f'Failed to extract file info: {e}'}
     
-    def _format_exif_value(self, tag_name: str, value) -> str:
+    def _format_exif_value(self, tag_name: str, value):
         """Форматирует значения EXIF для лучшей читаемости"""
+        if isinstance(value, bytes):
+            # MakerNote, UserComment и т.п. - в _format_metadata как BinaryValue
+            return value
         try:
             # GPS координаты
             if 'gps' in tag_name.lower() and isinstance(value, tuple):
@@ -302,127 +563,4 @@ class HEICParser(BaseParser):
     
     def _get_exif_tag_name(self, tag_id: int) -> str:
         """Преобразует ID EXIF тега в читаемое имя"""
-        exif_tags = {
-            # Основные теги
-            271: 'Make',
-            272: 'Model',
-            274: 'Orientation',
-            282: 'XResolution',
-            283: 'YResolution',
-            296: 'ResolutionUnit',
-            305: 'Software',
-            306: 'DateTime',
-            315: 'Artist',
-            33432: 'Copyright',
-            
-            # EXIF теги
-            36864: 'ExifVersion',
-            36867: 'DateTimeOriginal',
-            36868: 'DateTimeDigitized',
-            37377: 'ShutterSpeedValue',
-            37378: 'ApertureValue',
-            37379: 'BrightnessValue',
-            37380: 'ExposureBiasValue',
-            37381: 'MaxApertureValue',
-            37382: 'SubjectDistance',
-            37383: 'MeteringMode',
-            37384: 'LightSource',
-            37385: 'Flash',
-            37386: 'FocalLength',
-            37387: 'FlashEnergy',
-            37388: 'SpatialFrequencyResponse',
-            37389: 'Noise',
-            37390: 'FocalPlaneXResolution',
-            37391: 'FocalPlaneYResolution',
-            37392: 'FocalPlaneResolutionUnit',
-            37393: 'ImageNumber',
-            37394: 'SecurityClassification',
-            37395: 'ImageHistory',
-            37396: 'SubjectArea',
-            37397: 'ExposureIndex',
-            37398: 'TIFF/EPStandardID',
-            37399: 'SensingMethod',
-            37500: 'MakerNote',
-            37510: 'UserComment',
-            
-            # GPS теги
-            34853: 'GPSInfo',
-            0: 'GPSVersionID',
-            1: 'GPSLatitudeRef',
-            2: 'GPSLatitude',
-            3: 'GPSLongitudeRef',
-            4: 'GPSLongitude',
-            5: 'GPSAltitudeRef',
-            6: 'GPSAltitude',
-            7: 'GPSTimeStamp',
-            8: 'GPSSatellites',
-            9: 'GPSStatus',
-            10: 'GPSMeasureMode',
-            11: 'GPSDOP',
-            12: 'GPSSpeedRef',
-            13: 'GPSSpeed',
-            14: 'GPSTrackRef',
-            15: 'GPSTrack',
-            16: 'GPSImgDirectionRef',
-            17: 'GPSImgDirection',
-            18: 'GPSMapDatum',
-            19: 'GPSDestLatitudeRef',
-            20: 'GPSDestLatitude',
-            21: 'GPSDestLongitudeRef',
-            22: 'GPSDestLongitude',
-            23: 'GPSDestBearingRef',
-            24: 'GPSDestBearing',
-            25: 'GPSDestDistanceRef',
-            26: 'GPSDestDistance',
-            27: 'GPSProcessingMethod',
-            28: 'GPSAreaInformation',
-            29: 'GPSDateStamp',
-            30: 'GPSDifferential',
-            
-            # Дополнительные теги
-            33434: 'ExposureTime',
-            33437: 'FNumber',
-            34850: 'ExposureProgram',
-            34855: 'ISOSpeedRatings',
-            34856: 'OECF',
-            34866: 'SpectralSensitivity',
-            37520: 'SubsecTime',
-            37521: 'SubsecTimeOriginal',
-            37522: 'SubsecTimeDigitized',
-            40960: 'FlashPixVersion',
-            40961: 'ColorSpace',
-            40962: 'PixelXDimension',
-            40963: 'PixelYDimension',
-            40964: 'RelatedSoundFile',
-            41483: 'FlashEnergy',
-            41484: 'SpatialFrequencyResponse',
-            41486: 'FocalPlaneXResolution',
-            41487: 'FocalPlaneYResolution',
-            41488: 'FocalPlaneResolutionUnit',
-            41492: 'SubjectLocation',
-            41493: 'ExposureIndex',
-            41495: 'SensingMethod',
-            41728: 'FileSource',
-            41729: 'SceneType',
-            41730: 'CFAPattern',
-            41985: 'CustomRendered',
-            41986: 'ExposureMode',
-            41987: 'WhiteBalance',
-            41988: 'DigitalZoomRatio',
-            41989: 'FocalLengthIn35mmFilm',
-            41990: 'SceneCaptureType',
-            41991: 'GainControl',
-            41992: 'Contrast',
-            41993: 'Saturation',
-            41994: 'Sharpness',
-            41995: 'DeviceSettingDescription',
-            41996: 'SubjectDistanceRange',
-            42016: 'ImageUniqueID',
-            42032: 'CameraOwnerName',
-            42033: 'BodySerialNumber',
-            42034: 'LensSpecification',
-            42035: 'LensMake',
-            42036: 'LensModel',
-            42037: 'LensSerialNumber',
-        }
-        return exif_tags.get(tag_id, f'EXIF_Tag_{tag_id}')
+        return EXIF_TAGS.get(tag_id, f'EXIF_Tag_{tag_id}')
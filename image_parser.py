@@ -1,10 +1,25 @@
 import exifread
 from PIL import Image, ExifTags
-from typing import List, Dict
+from typing import List, Dict, Optional
 from .base_parser import BaseParser
 import datetime
 import os
 from pathlib import Path
+from .scan_logging import get_logger
+
+logger = get_logger('image_parser')
+
+# Названия значений тега Orientation (274)
+ORIENTATION_NAMES = {
+    1: 'Horizontal (normal)',
+    2: 'Mirrored horizontal',
+    3: 'Rotated 180°',
+    4: 'Mirrored vertical',
+    5: 'Mirrored horizontal then rotated 90° CCW',
+    6: 'Rotated 90° CW',
+    7: 'Mirrored horizontal then rotated 90° CW',
+    8: 'Rotated 90° CCW'
+}
 
 class ImageParser(BaseParser):
     
@@ -13,13 +28,12 @@ class ImageParser(BaseParser):
         return [
             'image/jpeg',
             'image/tiff',
-            'image/png',
             'image/webp',
             'image/gif',
             'image/bmp'
         ]
         
-    def extract_metadata(self, file_path: str) -> List[Dict]:
+    def extract_metadata(self, file_path: str, header: Optional[bytes] = None) -> List[Dict]:
         metadata = []
         
         try:
@@ -28,24 +42,26 @@ class ImageParser(BaseParser):
             for key, value in file_info.items():
                 metadata.append(self._format_metadata(key, value))
             
-            # EXIF данные через exifread
-            exif_metadata = self._extract_exif_with_exifread(file_path)
-            metadata.extend(exif_metadata)
-            
-            # EXIF через PIL (если доступно)
-            pil_metadata = self._extract_exif_with_pil(file_path)
-            metadata.extend(pil_metadata)
-            
-            # Информация о изображении через PIL
-            image_metadata = self._extract_image_info(file_path)
-            metadata.extend(image_metadata)
-            
-            # Дополнительная техническая информация
-            tech_metadata = self._extract_technical_info(file_path)
-            metadata.extend(tech_metadata)
+            # Файл открывается один раз: помощники перематывают общий поток в начало
+            with self._open(file_path, header) as f:
+                # EXIF данные через exifread
+                exif_metadata = self._extract_exif_with_exifread(f)
+                metadata.extend(exif_metadata)
+                
+                # EXIF через PIL (если доступно)
+                pil_metadata = self._extract_exif_with_pil(f)
+                metadata.extend(pil_metadata)
+                
+                # Информация о изображении через PIL
+                image_metadata = self._extract_image_info(f)
+                metadata.extend(image_metadata)
+                
+                # Дополнительная техническая информация
+                tech_metadata = self._extract_technical_info(f)
+                metadata.extend(tech_metadata)
                     
         except Exception as e:
-            print(f"Error reading image metadata: {e}")
+            logger.warning("Error reading image metadata: %s", e)
             # Возвращаем хотя бы базовую информацию
             file_info = self._get_file_info(file_path)
             for key, value in file_info.items():
@@ -55,6 +71,8 @@ class ImageParser(BaseParser):
     
     def _get_file_info(self, file_path: str) -> Dict[str, str]:
         """Базовая информация о файле"""
+        if not isinstance(file_path, str):
+            return self._member_info(file_path)
         try:
             stat = os.stat(file_path)
             return {
@@ -73,7 +91,7 @@ class ImageParser(BaseParser):
         """Извлекает EXIF данные через exifread"""
         metadata = []
         try:
-            with open(file_path, 'rb') as f:
+            with self._open(file_path) as f:
                 tags = exifread.process_file(f, details=False)
                 for tag, value in tags.items():
                     if tag not in ('JPEGThumbnail', 'TIFFThumbnail', 'Filename'):
@@ -83,21 +101,21 @@ class ImageParser(BaseParser):
                             clean_value = self._format_gps_value(tag, clean_value)
                         metadata.append(self._format_metadata(f'EXIF_{tag}', clean_value))
         except Exception as e:
-            print(f"Error with exifread: {e}")
+            logger.warning("Error with exifread: %s", e)
         return metadata
     
     def _extract_exif_with_pil(self, file_path: str) -> List[Dict]:
         """Извлекает EXIF данные через PIL"""
         metadata = []
         try:
-            image = Image.open(file_path)
-            # Используем getexif() если доступно, иначе _getexif()
-            if hasattr(image, 'getexif'):
-                exif_data = image.getexif()
-            elif hasattr(image, '_getexif'):
-                exif_data = image._getexif()
-            else:
-                exif_data = None
+            with self._open(file_path) as f, Image.open(f) as image:
+                # Используем getexif() если доступно, иначе _getexif()
+                if hasattr(image, 'getexif'):
+                    exif_data = image.getexif()
+                elif hasattr(image, '_getexif'):
+                    exif_data = image._getexif()
+                else:
+                    exif_data = None
             
             if exif_data:
                 for tag_id, value in exif_data.items():
@@ -106,14 +124,14 @@ class ImageParser(BaseParser):
                         formatted_value = self._format_exif_value(tag_name, value)
                         metadata.append(self._format_metadata(f'EXIF_{tag_name}', formatted_value))
         except Exception as e:
-            print(f"Error with PIL EXIF: {e}")
+            logger.warning("Error with PIL EXIF: %s", e)
         return metadata
     
     def _extract_image_info(self, file_path: str) -> List[Dict]:
         """Извлекает информацию о изображении"""
         metadata = []
         try:
-            with Image.open(file_path) as img:
+            with self._open(file_path) as f, Image.open(f) as img:
                 image_info = {
                     'Image Width': img.width,
                     'Image Height': img.height,
@@ -134,14 +152,14 @@ class ImageParser(BaseParser):
                         metadata.append(self._format_metadata(key, str(value)))
                         
         except Exception as e:
-            print(f"Error extracting image info: {e}")
+            logger.warning("Error extracting image info: %s", e)
         return metadata
     
     def _extract_technical_info(self, file_path: str) -> List[Dict]:
         """Извлекает техническую информацию"""
         metadata = []
         try:
-            with Image.open(file_path) as img:
+            with self._open(file_path) as f, Image.open(f) as img:
                 # Информация о сжатии
                 if hasattr(img, 'info'):
                     for key, value in img.info.items():
@@ -151,7 +169,7 @@ class ImageParser(BaseParser):
                             elif key == 'compression':
                                 metadata.append(self._format_metadata('Compression', value))
                             else:
-                                metadata.append(self._format_metadata(f'Tech_{key}', str(value)))
+                                metadata.append(self._format_metadata(f'Tech_{key}', value))
                 
                 # Ориентация
                 try:
@@ -165,27 +183,20 @@ class ImageParser(BaseParser):
                     
                     if exif and 274 in exif:  # Orientation tag
                         orientation = exif[274]
-                        orientation_names = {
-                            1: 'Horizontal (normal)',
-                            2: 'Mirrored horizontal',
-                            3: 'Rotated 180°',
-                            4: 'Mirrored vertical',
-                            5: 'Mirrored horizontal then rotated 90° CCW',
-                            6: 'Rotated 90° CW',
-                            7: 'Mirrored horizontal then rotated 90° CW',
-                            8: 'Rotated 90° CCW'
-                        }
                         metadata.append(self._format_metadata('Orientation', 
-                                            orientation_names.get(orientation, f'Unknown ({orientation})')))
+                                            ORIENTATION_NAMES.get(orientation, f'Unknown ({orientation})')))
                 except:
                     pass
                     
         except Exception as e:
-            print(f"Error extracting technical info: {e}")
+            logger.warning("Error extracting technical info: %s", e)
         return metadata
     
-    def _format_exif_value(self, tag_name: str, value) -> str:
+    def _format_exif_value(self, tag_name: str, value):
         """Форматирует значения EXIF для лучшей читаемости"""
+        if isinstance(value, bytes):
+            # MakerNote, UserComment и т.п. - в _format_metadata как BinaryValue
+            return value
         try:
             # GPS координаты
             if 'gps' in tag_name.lower() and isinstance(value, tuple):
@@ -0,0 +1,75 @@
+"""Проверка времени импорта ядра анализатора.
+
+Запуск: python -m core.import_budget [--budget-ms 150]
+Код возврата 1, если импорт превысил бюджет или подтянул тяжелые библиотеки парсеров.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+# Библиотеки, которые должны загружаться только при разборе файла соответствующего типа
+HEAVY_MODULES = ['PyPDF2', 'docx', 'openpyxl', 'PIL', 'exifread', 'lxml', 'olefile', 'pillow_heif']
+
+DEFAULT_BUDGET_MS = 150.0
+
+_PROBE = (
+    "import json, sys, time\n"
+    "t = time.perf_counter()\n"
+    "import {module}\n"
+    "ms = (time.perf_counter() - t) * 1000\n"
+    "print(json.dumps({{'ms': ms, 'heavy': [m for m in {heavy!r} if m in sys.modules]}}))\n"
+)
+
+
+def measure_import(module: str = None, runs: int = 5) -> Dict:
+    """Измеряет время импорта модуля в чистом интерпретаторе (минимум из нескольких запусков)"""
+    package = __package__ or 'core'
+    module = module or f'{package}.analyzer_engine'
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [os.path.dirname(package_dir),
+                                                      env.get('PYTHONPATH')]))
+
+    best = None
+    for _ in range(max(1, runs)):
+        output = subprocess.run(
+            [sys.executable, '-c', _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            env=env, capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        if best is None or result['ms'] < best['ms']:
+            best = result
+    best['module'] = module
+    return best
+
+
+def check_import_budget(module: str = None, budget_ms: float = DEFAULT_BUDGET_MS) -> List[str]:
+    """Возвращает список нарушений бюджета импорта (пустой, если все в порядке)"""
+    result = measure_import(module)
+    problems = []
+    if result['ms'] > budget_ms:
+        problems.append(f"import {result['module']} took {result['ms']:.1f} ms (budget {budget_ms:.0f} ms)")
+    for name in result['heavy']:
+        problems.append(f"import {result['module']} eagerly loaded {name}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check analyzer import time budget')
+    parser.add_argument('--module', default=None)
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS)
+    args = parser.parse_args()
+
+    problems = check_import_budget(args.module, args.budget_ms)
+    for problem in problems:
+        print(problem)
+    if not problems:
+        print('Import budget OK')
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == '__main__':
+    main()
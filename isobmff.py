@@ -0,0 +1,305 @@
+import struct
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+# Предел размера бокса meta, который читается в память целиком
+MAX_META_SIZE = 16 * 1024 * 1024
+# Предел размера элемента (Exif, XMP), который читается из файла
+MAX_ITEM_SIZE = 8 * 1024 * 1024
+
+
+class BoxError(ValueError):
+    """Файл не является ISOBMFF или структура боксов повреждена"""
+
+
+class HeifItem:
+    """Элемент HEIF из iinf / iloc"""
+
+    def __init__(self, item_id: int, item_type: str, name: str = '', content_type: str = ''):
+        self.item_id = item_id
+        self.item_type = item_type
+        self.name = name
+        self.content_type = content_type
+        self.construction_method = 0
+        self.base_offset = 0
+        self.extents: List[Tuple[int, int]] = []
+        self.properties: List[int] = []
+
+    @property
+    def size(self) -> int:
+        return sum(length for _, length in self.extents)
+
+
+class HeifMeta:
+    """Структура HEIF/AVIF-файла, собранная из боксов ftyp и meta.
+
+    Данные изображения (mdat) не читаются: в памяти только сам бокс meta,
+    а нужные элементы (Exif, XMP) потом читаются по смещениям из iloc.
+    """
+
+    def __init__(self):
+        self.major_brand = ''
+        self.compatible_brands: List[str] = []
+        self.primary_item_id: Optional[int] = None
+        self.items: Dict[int, HeifItem] = {}
+        # Свойства из ipco в порядке объявления: (тип, разобранное значение)
+        self.properties: List[Tuple[str, Dict]] = []
+        self.idat = b''
+
+    @property
+    def primary_item(self) -> Optional[HeifItem]:
+        return self.items.get(self.primary_item_id)
+
+    def item_properties(self, item: HeifItem) -> List[Tuple[str, Dict]]:
+        """Свойства элемента по ассоциациям из ipma"""
+        return [self.properties[index - 1] for index in item.properties
+                if 0 < index <= len(self.properties)]
+
+    def find_items(self, item_type: str, content_type: str = None) -> List[HeifItem]:
+        return [item for item in self.items.values()
+                if item.item_type == item_type
+                and (content_type is None or item.content_type == content_type)]
+
+    def read_item(self, f: BinaryIO, item: HeifItem) -> bytes:
+        """Читает данные элемента по экстентам из iloc"""
+        if item.size > MAX_ITEM_SIZE:
+            raise BoxError(f'item {item.item_id} is too large ({item.size} bytes)')
+        parts = []
+        for offset, length in item.extents:
+            offset += item.base_offset
+            if item.construction_method == 1:
+                parts.append(self.idat[offset:offset + length])
+            elif item.construction_method == 0:
+                f.seek(offset)
+                data = f.read(length)
+                if len(data) < length:
+                    raise BoxError(f'item {item.item_id} is truncated')
+                parts.append(data)
+            else:
+                raise BoxError(f'unsupported construction method {item.construction_method}')
+        return b''.join(parts)
+
+
+def iter_boxes(data: bytes, start: int = 0, end: int = None) -> Iterator[Tuple[str, int, int]]:
+    """Перебирает боксы в буфере: (тип, начало содержимого, конец бокса)"""
+    end = len(data) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', data, pos)
+        header = 8
+        if size == 1:
+            if pos + 16 > end:
+                raise BoxError('truncated box header')
+            size = struct.unpack_from('>Q', data, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            raise BoxError(f'bad size of box {box_type!r}')
+        yield box_type.decode('latin-1'), pos + header, pos + size
+        pos += size
+
+
+def read_heif_meta(f: BinaryIO) -> HeifMeta:
+    """Находит ftyp и meta на верхнем уровне файла и разбирает их.
+
+    Боксы верхнего уровня (mdat и прочие) пропускаются seek, поэтому
+    читается только заголовок файла и содержимое meta.
+    """
+    meta = HeifMeta()
+    f.seek(0)
+    found_ftyp = False
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            break
+        size, box_type = struct.unpack('>I4s', header)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+            header_size = 16
+        if size and size < header_size:
+            raise BoxError(f'bad size of box {box_type!r}')
+
+        if box_type == b'ftyp':
+            body = f.read(size - header_size)
+            if len(body) < 8:
+                raise BoxError('truncated ftyp box')
+            meta.major_brand = body[:4].decode('latin-1')
+            meta.compatible_brands = [body[i:i + 4].decode('latin-1')
+                                      for i in range(8, len(body) - 3, 4)]
+            found_ftyp = True
+        elif box_type == b'meta':
+            if not found_ftyp:
+                break
+            if size == 0 or size - header_size > MAX_META_SIZE:
+                raise BoxError('meta box is too large')
+            body = f.read(size - header_size)
+            if len(body) < size - header_size:
+                raise BoxError('truncated meta box')
+            _parse_meta(meta, body)
+            return meta
+        elif size == 0 or not found_ftyp:
+            break
+        else:
+            f.seek(size - header_size, 1)
+
+    raise BoxError('no ftyp/meta boxes found')
+
+
+def _parse_meta(meta: HeifMeta, data: bytes):
+    # meta - FullBox: версия и флаги перед дочерними боксами. Порядок боксов
+    # внутри meta не фиксирован, а iloc и ipma ссылаются на элементы из iinf
+    boxes = sorted(iter_boxes(data, 4), key=lambda box: box[0] != 'iinf')
+    for box_type, start, end in boxes:
+        if box_type == 'pitm':
+            version = data[start]
+            fmt = '>H' if version == 0 else '>I'
+            meta.primary_item_id = struct.unpack_from(fmt, data, start + 4)[0]
+        elif box_type == 'iinf':
+            _parse_iinf(meta, data, start, end)
+        elif box_type == 'iloc':
+            _parse_iloc(meta, data, start, end)
+        elif box_type == 'iprp':
+            _parse_iprp(meta, data, start, end)
+        elif box_type == 'idat':
+            meta.idat = data[start:end]
+
+
+def _cstring(data: bytes, pos: int, end: int) -> Tuple[str, int]:
+    """Строка с нулем в конце и позиция за ней"""
+    zero = data.find(b'\x00', pos, end)
+    if zero < 0:
+        return data[pos:end].decode('utf-8', errors='replace'), end
+    return data[pos:zero].decode('utf-8', errors='replace'), zero + 1
+
+
+def _parse_iinf(meta: HeifMeta, data: bytes, start: int, end: int):
+    version = data[start]
+    first = start + (6 if version == 0 else 8)
+    for box_type, pos, box_end in iter_boxes(data, first, end):
+        if box_type != 'infe':
+            continue
+        version = data[pos]
+        if version < 2:
+            # Старые версии infe в HEIF не используются
+            continue
+        pos += 4
+        if version == 2:
+            item_id = struct.unpack_from('>H', data, pos)[0]
+            pos += 2
+        else:
+            item_id = struct.unpack_from('>I', data, pos)[0]
+            pos += 4
+        pos += 2  # item_protection_index
+        item_type = data[pos:pos + 4].decode('latin-1')
+        name, pos = _cstring(data, pos + 4, box_end)
+        content_type = ''
+        if item_type == 'mime':
+            content_type, pos = _cstring(data, pos, box_end)
+        meta.items[item_id] = HeifItem(item_id, item_type, name, content_type)
+
+
+def _read_uint(data: bytes, pos: int, size: int) -> Tuple[int, int]:
+    if size == 0:
+        return 0, pos
+    return int.from_bytes(data[pos:pos + size], 'big'), pos + size
+
+
+def _parse_iloc(meta: HeifMeta, data: bytes, start: int, end: int):
+    version = data[start]
+    pos = start + 4
+    offset_size, length_size = data[pos] >> 4, data[pos] & 0x0F
+    base_offset_size, index_size = data[pos + 1] >> 4, data[pos + 1] & 0x0F
+    pos += 2
+    if version < 2:
+        item_count = struct.unpack_from('>H', data, pos)[0]
+        pos += 2
+    else:
+        item_count = struct.unpack_from('>I', data, pos)[0]
+        pos += 4
+
+    for _ in range(item_count):
+        if pos >= end:
+            raise BoxError('truncated iloc box')
+        if version < 2:
+            item_id = struct.unpack_from('>H', data, pos)[0]
+            pos += 2
+        else:
+            item_id = struct.unpack_from('>I', data, pos)[0]
+            pos += 4
+        construction_method = 0
+        if version in (1, 2):
+            construction_method = struct.unpack_from('>H', data, pos)[0] & 0x0F
+            pos += 2
+        pos += 2  # data_reference_index
+        base_offset, pos = _read_uint(data, pos, base_offset_size)
+        extent_count = struct.unpack_from('>H', data, pos)[0]
+        pos += 2
+        extents = []
+        for _ in range(extent_count):
+            if version in (1, 2) and index_size:
+                pos += index_size
+            offset, pos = _read_uint(data, pos, offset_size)
+            length, pos = _read_uint(data, pos, length_size)
+            extents.append((offset, length))
+
+        item = meta.items.get(item_id)
+        if item is None:
+            item = meta.items[item_id] = HeifItem(item_id, '')
+        item.construction_method = construction_method
+        item.base_offset = base_offset
+        item.extents = extents
+
+
+def _parse_iprp(meta: HeifMeta, data: bytes, start: int, end: int):
+    for box_type, pos, box_end in iter_boxes(data, start, end):
+        if box_type == 'ipco':
+            for prop_type, prop_start, prop_end in iter_boxes(data, pos, box_end):
+                meta.properties.append((prop_type, _parse_property(prop_type, data, prop_start, prop_end)))
+        elif box_type == 'ipma':
+            _parse_ipma(meta, data, pos, box_end)
+
+
+def _parse_property(prop_type: str, data: bytes, start: int, end: int) -> Dict:
+    """Разбирает свойства, которые нужны для метаданных"""
+    if prop_type == 'ispe' and end - start >= 12:
+        width, height = struct.unpack_from('>II', data, start + 4)
+        return {'width': width, 'height': height}
+    if prop_type == 'irot' and end > start:
+        return {'angle': (data[start] & 0x03) * 90}
+    if prop_type == 'colr' and end - start >= 4:
+        colour_type = data[start:start + 4].decode('latin-1')
+        return {'colour_type': colour_type, 'icc_size': end - start - 4 if colour_type in ('prof', 'rICC') else 0}
+    if prop_type == 'pixi' and end - start >= 5:
+        channels = data[start + 4]
+        return {'bits': list(data[start + 5:start + 5 + channels])}
+    return {}
+
+
+def _parse_ipma(meta: HeifMeta, data: bytes, start: int, end: int):
+    version = data[start]
+    flags = int.from_bytes(data[start + 1:start + 4], 'big')
+    entry_count = struct.unpack_from('>I', data, start + 4)[0]
+    pos = start + 8
+    for _ in range(entry_count):
+        if pos >= end:
+            raise BoxError('truncated ipma box')
+        if version < 1:
+            item_id = struct.unpack_from('>H', data, pos)[0]
+            pos += 2
+        else:
+            item_id = struct.unpack_from('>I', data, pos)[0]
+            pos += 4
+        count = data[pos]
+        pos += 1
+        indexes = []
+        for _ in range(count):
+            if flags & 1:
+                indexes.append(struct.unpack_from('>H', data, pos)[0] & 0x7FFF)
+                pos += 2
+            else:
+                indexes.append(data[pos] & 0x7F)
+                pos += 1
+        item = meta.items.get(item_id)
+        if item is not None:
+            item.properties = indexes
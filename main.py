@@ -1,16 +1,27 @@
 import sys
 import os
+from contextlib import contextmanager
 from pathlib import Path
 from PySide6.QtWidgets import (QApplication, QMainWindow, QFileDialog, 
                               QMessageBox, QTreeView, QTableView, QLineEdit,
                               QPushButton, QLabel, QVBoxLayout, QHBoxLayout,
                               QWidget, QMenuBar, QStatusBar, QSplitter)
-from PySide6.QtCore import QDir, Qt
+from PySide6.QtCore import QDir, Qt, QObject, QTimer, Signal
 from PySide6.QtGui import QAction
 from core.export_manager import ExportManager
 from core.analyzer_engine import AnalyzerEngine
+from core.folder_watcher import FolderWatcher
 from core.file_tree_model import FileSystemModel
 from core.metadata_model import MetadataTableModel
+from core.scan_aggregate import ScanAggregate
+from core.scan_metrics import ScanMetrics
+from core.scan_logging import get_logger, setup_logging, shutdown_logging
+
+logger = get_logger('main')
+
+class WatchEvents(QObject):
+    """Передача событий FolderWatcher из его потока в GUI"""
+    event = Signal(dict)
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -18,8 +29,18 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("Metadata Analyzer")
         self.setGeometry(100, 100, 1200, 800)
         
-        # Инициализация движка анализа
-        self.analyzer_engine = AnalyzerEngine()
+        # Инициализация движка анализа (с метриками для строки состояния)
+        self.analyzer_engine = AnalyzerEngine(metrics=ScanMetrics())
+        
+        # Наблюдение за папкой: отдельный движок, чтобы не мешать ручным сканированиям
+        self.folder_watcher = None
+        self.watch_events = WatchEvents()
+        self.watch_refresh_timer = QTimer(self)
+        self.watch_refresh_timer.setSingleShot(True)
+        self.watch_refresh_timer.setInterval(500)
+        
+        # Сканирование папки идет в потоке GUI (см. scan_in_progress)
+        self.scanning = False
         
         # Создание интерфейса
         self.setup_ui()
@@ -49,6 +70,8 @@ class MainWindow(QMainWindow):
         self.scan_btn = QPushButton("Scan Folder")
         self.export_btn = QPushButton("Export Report")
         self.export_folder_btn = QPushButton("Export Folder Report")
+        self.watch_btn = QPushButton("Watch Folder")
+        self.watch_btn.setCheckable(True)
         self.clear_btn = QPushButton("Clear")
         
         control_layout.addWidget(self.path_edit)
@@ -56,6 +79,7 @@ class MainWindow(QMainWindow):
         control_layout.addWidget(self.scan_btn)
         control_layout.addWidget(self.export_btn)
         control_layout.addWidget(self.export_folder_btn)
+        control_layout.addWidget(self.watch_btn)
         control_layout.addWidget(self.clear_btn)
         
         # Labels для информации
@@ -90,6 +114,11 @@ class MainWindow(QMainWindow):
         # Создание меню
         self.create_menu()
         
+        # Элементы, недоступные во время сканирования
+        self.scan_controls = [self.path_edit, self.browse_btn, self.scan_btn, self.export_btn,
+                              self.export_folder_btn, self.watch_btn, self.clear_btn, self.file_tree,
+                              self.open_action]
+        
         # Status bar
         self.status_bar = QStatusBar()
         self.setStatusBar(self.status_bar)
@@ -102,10 +131,10 @@ class MainWindow(QMainWindow):
         # File menu
         file_menu = menubar.addMenu("File")
         
-        open_action = QAction("Open Folder", self)
-        open_action.setShortcut("Ctrl+O")
-        open_action.triggered.connect(self.browse_folder)
-        file_menu.addAction(open_action)
+        self.open_action = QAction("Open Folder", self)
+        self.open_action.setShortcut("Ctrl+O")
+        self.open_action.triggered.connect(self.browse_folder)
+        file_menu.addAction(self.open_action)
         
         exit_action = QAction("Exit", self)
         exit_action.setShortcut("Ctrl+Q")
@@ -140,6 +169,9 @@ class MainWindow(QMainWindow):
         self.export_btn.clicked.connect(self.export_report)
         self.export_folder_btn.clicked.connect(self.export_folder_report)
         self.clear_btn.clicked.connect(self.clear_results)
+        self.watch_btn.toggled.connect(self.toggle_watch)
+        self.watch_events.event.connect(self.on_watch_event)
+        self.watch_refresh_timer.timeout.connect(self.refresh_watch_results)
         self.file_tree.clicked.connect(self.on_file_selected)
         
         
@@ -170,7 +202,9 @@ class MainWindow(QMainWindow):
             
             metadata, risks = self.analyzer_engine.analyze_file(file_path)
             self.metadata_model.update_data(metadata, risks)
-            self.update_risk_display(risks)
+            aggregate = ScanAggregate()
+            aggregate.add(file_path, {'risks': risks})
+            self.update_risk_display(aggregate.by_level)
             
             self.status_bar.showMessage(f"Analysis complete: {os.path.basename(file_path)}")
             self.info_label.setText(f"File: {os.path.basename(file_path)}")
@@ -189,74 +223,72 @@ class MainWindow(QMainWindow):
         try:
             self.status_bar.showMessage("Scanning folder...")
             
-            results = self.analyzer_engine.analyze_folder(folder_path)
-            self.display_scan_results(results)
+            with self.scan_in_progress():
+                results = self.analyzer_engine.analyze_folder(folder_path,
+                                                              progress_callback=self.on_scan_progress)
+            self.display_scan_results(results, self.analyzer_engine.aggregate)
             
-            self.status_bar.showMessage("Folder scan complete")
+            self.status_bar.showMessage(
+                f"Folder scan complete | {self.analyzer_engine.metrics.summary()}"
+            )
             
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Scan failed: {str(e)}")
             self.status_bar.showMessage("Scan failed")
             
-    def display_scan_results(self, results):
-        """Отображение результатов сканирования папки"""
-        total_files = len(results)
+    @contextmanager
+    def scan_in_progress(self):
+        """Блокирует элементы управления на время сканирования
+        
+        on_scan_progress обрабатывает события, пока analyze_folder работает в
+        потоке GUI; без блокировки кнопки и таблица могли бы повторно войти в
+        движок или в результаты посреди сканирования.
+        """
+        self.scanning = True
+        for control in self.scan_controls:
+            control.setEnabled(False)
+        try:
+            yield
+        finally:
+            for control in self.scan_controls:
+                control.setEnabled(True)
+            self.scanning = False
+            
+    def on_scan_progress(self, processed):
+        """Обновление строки состояния во время сканирования"""
+        self.status_bar.showMessage(f"Scanning... {self.analyzer_engine.metrics.summary()}")
+        QApplication.processEvents()
+            
+    def display_scan_results(self, results, aggregate):
+        """Отображение результатов сканирования папки (aggregate - их статистика)"""
         all_metadata = []
         all_risks = []
         
-        # Собираем все метаданные и риски из всех файлов
-        for file_path, file_data in results.items():
-            try:
-                metadata = file_data.get('metadata', [])
-                risks = file_data.get('risks', [])
-                
-                # Добавляем информацию о файле к каждому элементу метаданных
-                for item in metadata:
-                    # Создаем копию элемента с информацией о файле
-                    item_with_file = item.copy()
-                    item_with_file['file_path'] = file_path
-                    item_with_file['file_name'] = os.path.basename(file_path)
-                    all_metadata.append(item_with_file)
-                
-                # Добавляем риски с информацией о файле
-                for risk in risks:
-                    risk_with_file = risk.copy()
-                    risk_with_file['file_path'] = file_path
-                    risk_with_file['file_name'] = os.path.basename(file_path)
-                    all_risks.append(risk_with_file)
-                    
-            except Exception as e:
-                print(f"Error processing file {file_path} for display: {e}")
+        # Собираем все метаданные и риски из всех файлов; модель сопоставляет
+        # риски с метаданными по ключу, значению и источнику, копии не нужны
+        for file_data in results.values():
+            all_metadata.extend(file_data.get('metadata', []))
+            all_risks.extend(file_data.get('risks', []))
         
         # Загружаем все данные в модель
         self.metadata_model.update_data(all_metadata, all_risks)
         
-        # Обновляем статистику
-        high_risk = sum(1 for file_data in results.values() 
-                       if any(r.get('level') == 'high' for r in file_data.get('risks', [])))
-        medium_risk = sum(1 for file_data in results.values() 
-                         if any(r.get('level') == 'medium' for r in file_data.get('risks', [])))
-        low_risk = sum(1 for file_data in results.values() 
-                      if any(r.get('level') == 'low' for r in file_data.get('risks', [])))
-        
+        # Статистика уже посчитана по мере сканирования
+        files_by_level = aggregate.files_by_level
         self.info_label.setText(
-            f"Scanned: {total_files} files | "
-            f"High risk: {high_risk} | "
-            f"Medium risk: {medium_risk} | "
-            f"Low risk: {low_risk}"
+            f"Scanned: {len(results)} files | "
+            f"High risk: {files_by_level['high']} | "
+            f"Medium risk: {files_by_level['medium']} | "
+            f"Low risk: {files_by_level['low']}"
         )
         
         # Обновляем отображение рисков
-        self.update_risk_display(all_risks)
-        
-    def update_risk_display(self, risks):
-        """Обновление информации о рисках"""
-        high_risk = sum(1 for r in risks if r['level'] == 'high')
-        medium_risk = sum(1 for r in risks if r['level'] == 'medium')
-        low_risk = sum(1 for r in risks if r['level'] == 'low')
+        self.update_risk_display(aggregate.by_level)
         
+    def update_risk_display(self, risk_counts):
+        """Обновление информации о рисках (risk_counts - число рисков по уровням)"""
         self.risk_label.setText(
-            f"Risks: High ({high_risk}) | Medium ({medium_risk}) | Low ({low_risk})"
+            f"Risks: High ({risk_counts['high']}) | Medium ({risk_counts['medium']}) | Low ({risk_counts['low']})"
         )
         
     def export_report(self):
@@ -280,12 +312,14 @@ class MainWindow(QMainWindow):
                 if selected_filter == "HTML Files (*.html)":
                     if not file_path.endswith('.html'):
                         file_path += '.html'
-                    success = ExportManager.export_to_html(file_path, metadata, risks)
+                    with self.analyzer_engine.metrics.timer('export'):
+                        success = ExportManager.export_to_html(file_path, metadata, risks)
                     
                 elif selected_filter == "CSV Files (*.csv)":
                     if not file_path.endswith('.csv'):
                         file_path += '.csv'
-                    success = ExportManager.export_to_csv(file_path, metadata, risks)
+                    with self.analyzer_engine.metrics.timer('export'):
+                        success = ExportManager.export_to_csv(file_path, metadata, risks)
                 
                 if success:
                     QMessageBox.information(self, "Success", 
@@ -315,6 +349,52 @@ class MainWindow(QMainWindow):
         self.info_label.setText("Ready to analyze")
         self.status_bar.showMessage("Results cleared")
         
+    def toggle_watch(self, enabled):
+        """Включение и выключение наблюдения за папкой"""
+        if not enabled:
+            if self.folder_watcher:
+                self.folder_watcher.stop()
+                self.folder_watcher = None
+            self.status_bar.showMessage("Watch stopped")
+            return
+        
+        folder_path = self.path_edit.text()
+        if not folder_path or not os.path.isdir(folder_path):
+            QMessageBox.warning(self, "Warning", "Please select a valid folder first")
+            self.watch_btn.setChecked(False)
+            return
+        
+        self.folder_watcher = FolderWatcher(AnalyzerEngine(), folder_path,
+                                            on_event=self.watch_events.event.emit)
+        self.folder_watcher.start()
+        self.status_bar.showMessage(f"Watching: {folder_path}")
+        
+    def on_watch_event(self, event):
+        """Новый или снятый риск в наблюдаемой папке"""
+        action = "New risk" if event['event'] == 'new_risk' else "Risk resolved"
+        self.status_bar.showMessage(
+            f"{action}: {event['rule']} ({event['level']}) in {os.path.basename(event['file_path'])}"
+        )
+        # Таблица перестраивается один раз на серию событий
+        self.watch_refresh_timer.start()
+        
+    def refresh_watch_results(self):
+        if self.scanning:
+            # Таблица занята сканированием - обновим после него
+            self.watch_refresh_timer.start()
+            return
+        if self.folder_watcher:
+            self.display_scan_results(self.folder_watcher.snapshot(), self.folder_watcher.aggregate)
+        
+    def closeEvent(self, event):
+        if self.scanning:
+            self.status_bar.showMessage("Scan in progress, close the window after it finishes")
+            event.ignore()
+            return
+        if self.folder_watcher:
+            self.folder_watcher.stop()
+        super().closeEvent(event)
+        
     def show_about(self):
         """Показать информацию о программе"""
         QMessageBox.about(self, "About Metadata Analyzer",
@@ -340,7 +420,9 @@ class MainWindow(QMainWindow):
                 self.status_bar.showMessage("Analyzing folder for export...")
                 
                 # Анализируем всю папку
-                results = self.analyzer_engine.analyze_folder(folder_path)
+                with self.scan_in_progress():
+                    results = self.analyzer_engine.analyze_folder(folder_path,
+                                                                  progress_callback=self.on_scan_progress)
                 
                 if not results:
                     QMessageBox.information(self, "Info", "No risks found in the selected folder")
@@ -349,20 +431,26 @@ class MainWindow(QMainWindow):
                 
                 # Преобразуем результаты в старый формат для экспорта (только риски)
                 results_for_export = {}
-                for file_path, file_data in results.items():
-                    results_for_export[file_path] = file_data.get('risks', [])
+                for result_path, file_data in results.items():
+                    results_for_export[result_path] = file_data.get('risks', [])
                 
                 success = False
                 
                 if selected_filter == "HTML Files (*.html)":
                     if not file_path.endswith('.html'):
                         file_path += '.html'
-                    success = ExportManager.export_folder_to_html(file_path, results_for_export, folder_path)
+                    with self.analyzer_engine.metrics.timer('export'):
+                        success = ExportManager.export_folder_to_html(file_path, results_for_export, folder_path,
+                                                                      self.analyzer_engine.last_scan_errors,
+                                                                      self.analyzer_engine.aggregate)
                     
                 elif selected_filter == "CSV Files (*.csv)":
                     if not file_path.endswith('.csv'):
                         file_path += '.csv'
-                    success = ExportManager.export_folder_to_csv(file_path, results_for_export, folder_path)
+                    with self.analyzer_engine.metrics.timer('export'):
+                        success = ExportManager.export_folder_to_csv(file_path, results_for_export, folder_path,
+                                                                     self.analyzer_engine.last_scan_errors,
+                                                                     self.analyzer_engine.aggregate)
                 
                 if success:
                     QMessageBox.information(self, "Success", 
@@ -391,6 +479,9 @@ class MainWindow(QMainWindow):
             self.status_bar.showMessage("Folder export failed")
 
 def main():
+    # Журнал пишется из отдельного потока и не тормозит сканирование
+    setup_logging()
+    
     app = QApplication(sys.argv)
     app.setApplicationName("Metadata Analyzer")
     app.setApplicationVersion("1.0.0")
@@ -398,7 +489,9 @@ def main():
     window = MainWindow()
     window.show()
     
-    sys.exit(app.exec())
+    exit_code = app.exec()
+    shutdown_logging()
+    sys.exit(exit_code)
 
 if __name__ == '__main__':
     main()
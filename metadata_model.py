@@ -1,5 +1,6 @@
 from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex
 from PySide6.QtGui import QColor
+from .metadata_value import materialize
 
 class MetadataTableModel(QAbstractTableModel):
     def __init__(self, parent=None):
@@ -70,8 +71,8 @@ class MetadataTableModel(QAbstractTableModel):
             if col == 1:
                 item = self._data[row]
                 if isinstance(item, dict):
-                    value = item.get('value', '')
-                    return str(value) if value is not None else ''
+                    # Полное значение (для двоичного - все байты) строится только здесь
+                    return materialize(item.get('value', ''))
                 
         return None
         
@@ -0,0 +1,192 @@
+import re
+import time
+from typing import Optional, Pattern, Union
+
+# Начало длинного текста, которое проверяется правилами одним поиском
+MAX_SCAN_CHARS = 2048
+# Остаток проверяется кусками с перекрытием, чтобы не терять совпадения на границе
+SCAN_CHUNK_CHARS = 2048
+SCAN_OVERLAP_CHARS = 256
+
+# Байт в шестнадцатеричном превью двоичного значения
+HEX_PREVIEW_BYTES = 32
+# Короткие двоичные значения с печатным текстом показываются как текст
+MAX_TEXT_BYTES = 1024
+
+# Префиксы кодировки UserComment / XPComment в EXIF
+_EXIF_CHARSETS = {
+    b'ASCII\x00\x00\x00': 'ascii',
+    b'UNICODE\x00': 'utf-16',
+    b'\x00' * 8: 'utf-8',
+}
+
+# Печатные ASCII-строки внутри двоичных данных (пути, имена, серийные номера)
+_TEXT_RUNS = re.compile(rb'[\x20-\x7e]{4,}')
+
+
+class BinaryValue:
+    """Двоичное значение метаданных (MakerNote, UserComment, XMP в info PIL).
+
+    Хранит ссылку на байты без преобразования в строку: str() дает длину и
+    шестнадцатеричное превью, правилам рисков передаются только печатные
+    ASCII-строки из данных, полное значение строится materialize() для
+    отображения или экспорта.
+    """
+
+    __slots__ = ('data', '_scan_text')
+
+    def __init__(self, data: bytes):
+        self.data = bytes(data)
+        self._scan_text = None
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __bool__(self) -> bool:
+        return bool(self.data)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, BinaryValue) and other.data == self.data
+
+    def __hash__(self) -> int:
+        return hash(self.data)
+
+    def __reduce__(self):
+        # Передается между процессами разбора без кэша текста
+        return BinaryValue, (self.data,)
+
+    @property
+    def preview(self) -> str:
+        return self.data[:HEX_PREVIEW_BYTES].hex(' ')
+
+    def __str__(self) -> str:
+        more = ' ...' if len(self.data) > HEX_PREVIEW_BYTES else ''
+        return f'<{len(self.data)} bytes> {self.preview}{more}'
+
+    def __repr__(self) -> str:
+        return f'BinaryValue({self})'
+
+    def scan_text(self) -> str:
+        """Печатные строки из данных для проверки правилами (вычисляется один раз)"""
+        if self._scan_text is None:
+            self._scan_text = ' '.join(run.decode('ascii') for run in _TEXT_RUNS.findall(self.data))
+        return self._scan_text
+
+    def materialize(self) -> str:
+        """Полное значение в шестнадцатеричном виде"""
+        return self.data.hex(' ')
+
+
+def _decode_text(data: bytes) -> Union[str, None]:
+    """Текст из короткого двоичного значения, если он там есть"""
+    if len(data) > MAX_TEXT_BYTES:
+        return None
+    encoding = _EXIF_CHARSETS.get(data[:8])
+    if encoding:
+        data = data[8:]
+    try:
+        text = data.decode(encoding or 'utf-8').rstrip('\x00')
+    except UnicodeDecodeError:
+        return None
+    return text if text.isprintable() else None
+
+
+def metadata_value(value) -> Union[str, BinaryValue]:
+    """Значение элемента метаданных: байты - BinaryValue, остальное - строка"""
+    if isinstance(value, BinaryValue):
+        return value
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        data = bytes(value)
+        text = _decode_text(data)
+        return text if text is not None else BinaryValue(data)
+    return str(value) if value else ''
+
+
+def scan_text(value) -> str:
+    """Текст значения, по которому проверяются правила рисков"""
+    if isinstance(value, BinaryValue):
+        return value.scan_text()
+    return value if isinstance(value, str) else str(value)
+
+
+def materialize(value) -> str:
+    """Полное значение для отображения и экспорта"""
+    if isinstance(value, BinaryValue):
+        return value.materialize()
+    return '' if value is None else str(value)
+
+
+def _confirm_match(regex: Pattern, text: str, start: int, end: int,
+                   deadline: Optional[float]) -> Optional[bool]:
+    # endpos для шаблона выглядит как конец строки, поэтому совпадение,
+    # упершееся в конец куска, может быть ложным (\b, $). Оно повторяется
+    # с того же места на куске вдвое длиннее, пока не закончится внутри
+    # куска или кусок не дойдет до конца текста
+    length = len(text)
+    while True:
+        end = min(length, end + max(end - start, SCAN_OVERLAP_CHARS))
+        match = regex.match(text, start, end)
+        if match is None:
+            return False
+        if end >= length or match.end() < end - 1:
+            return True
+        if deadline is not None and time.perf_counter() > deadline:
+            return None
+
+
+def _search_chunk(regex: Pattern, text: str, pos: int, end: int,
+                  deadline: Optional[float]) -> Optional[bool]:
+    while True:
+        match = regex.search(text, pos, end)
+        if match is None:
+            return False
+        # Совпадение, кончающееся у границы куска (или перед последним '\n'
+        # для $), проверяется с продолжением текста
+        if end >= len(text) or match.end() < end - 1:
+            return True
+        confirmed = _confirm_match(regex, text, match.start(), end, deadline)
+        if confirmed is not False:
+            return confirmed
+        pos = match.start() + 1
+        if pos > end:
+            return False
+        if deadline is not None and time.perf_counter() > deadline:
+            return None
+
+
+def search_text(regex: Pattern, text: str, prefilter: Optional[Pattern] = None,
+                time_budget: Optional[float] = None) -> Optional[bool]:
+    """Поиск правила в тексте значения с ограниченной длиной одного поиска.
+
+    Первые MAX_SCAN_CHARS символов проверяются одним поиском, остаток -
+    кусками по SCAN_CHUNK_CHARS с перекрытием SCAN_OVERLAP_CHARS до первого
+    совпадения. Шаблоны вида '/.*/.*' на длинной строке не уходят в
+    квадратичный перебор, а поиск не копирует подстроки. Совпадение у
+    границы куска засчитывается, только если оно подтверждается с
+    продолжением текста, поэтому \b и $ на границе не срабатывают ложно.
+
+    Args:
+        prefilter: строки, без которых совпадения нет; кусок без них не проверяется
+        time_budget: секунды на весь текст, проверяются между кусками
+
+    Returns:
+        Optional[bool]: None, если бюджет исчерпан раньше конца текста
+    """
+    length = len(text)
+    if length <= MAX_SCAN_CHARS:
+        if prefilter is not None and not prefilter.search(text):
+            return False
+        return regex.search(text) is not None
+    deadline = time.perf_counter() + time_budget if time_budget is not None else None
+    pos, end = 0, MAX_SCAN_CHARS
+    while True:
+        if prefilter is None or prefilter.search(text, pos, end):
+            found = _search_chunk(regex, text, pos, end, deadline)
+            if found is not False:
+                return found
+        if end >= length:
+            return False
+        if deadline is not None and time.perf_counter() > deadline:
+            return None
+        pos = end - SCAN_OVERLAP_CHARS
+        end = pos + SCAN_CHUNK_CHARS
@@ -0,0 +1,90 @@
+import olefile
+from typing import List, Dict, Optional
+from .base_parser import BaseParser
+from .scan_logging import get_logger
+
+logger = get_logger('ole_parser')
+
+# Свойства SummaryInformation и DocumentSummaryInformation -> ключи метаданных
+# (имена совпадают с DocxParser там, где свойство то же самое)
+OLE_PROPERTIES = {
+    'title': 'title',
+    'subject': 'subject',
+    'author': 'author',
+    'keywords': 'keywords',
+    'comments': 'comments',
+    'template': 'template',
+    'last_saved_by': 'last_modified_by',
+    'revision_number': 'revision',
+    'create_time': 'created',
+    'last_saved_time': 'modified',
+    'last_printed': 'last_printed',
+    'creating_application': 'application',
+    'category': 'category',
+    'manager': 'manager',
+    'company': 'company',
+    'content_status': 'content_status',
+    'language': 'language',
+}
+
+
+class OLEParser(BaseParser):
+    """Метаданные старых документов Office (.doc, .xls, .ppt).
+
+    Читаются только потоки \\x05SummaryInformation и
+    \\x05DocumentSummaryInformation составного файла OLE; текст документа,
+    листы и слайды не загружаются.
+    """
+
+    @staticmethod
+    def supported_formats() -> List[str]:
+        return [
+            'application/msword',
+            'application/vnd.ms-excel',
+            'application/vnd.ms-powerpoint'
+        ]
+
+    def extract_metadata(self, file_path: str, header: Optional[bytes] = None) -> List[Dict]:
+        metadata = []
+
+        if header is not None and not header.startswith(olefile.MAGIC):
+            return metadata
+
+        try:
+            with self._open(file_path, header) as f, olefile.OleFileIO(f) as ole:
+                # get_metadata читает только два потока свойств
+                props = ole.get_metadata()
+
+            encoding = self._encoding(props.codepage)
+            for attr, key in OLE_PROPERTIES.items():
+                value = getattr(props, attr, None)
+                if isinstance(value, bytes):
+                    value = value.decode(encoding, errors='replace').rstrip('\x00')
+                if value:
+                    metadata.append(self._format_metadata(key, value))
+
+            # olefile переводит время редактирования в секунды
+            if props.total_edit_time:
+                minutes = props.total_edit_time // 60
+                metadata.append(self._format_metadata('total_edit_time', f'{minutes} min'))
+
+        except Exception as e:
+            logger.warning("Error reading OLE metadata: %s", e)
+
+        return metadata
+
+    @staticmethod
+    def _encoding(codepage: Optional[int]) -> str:
+        """Кодировка строк по кодовой странице из SummaryInformation"""
+        if codepage == 65001:
+            return 'utf-8'
+        if codepage in (1200, 1201):
+            return 'utf-16-le' if codepage == 1200 else 'utf-16-be'
+        if codepage:
+            encoding = f'cp{codepage}'
+            try:
+                ''.encode(encoding)
+                return encoding
+            except LookupError:
+                pass
+        return 'latin-1'
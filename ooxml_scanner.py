@@ -0,0 +1,231 @@
+import html
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import BinaryIO, Callable, Dict, IO, Iterator, List, Optional, Tuple, Union
+from .scan_logging import get_logger
+
+logger = get_logger('ooxml_scanner')
+
+# Не больше стольких разных значений одного ключа с файла
+MAX_VALUES_PER_KEY = 50
+
+# Размер куска распакованных данных при поиске исправлений в тексте документа
+CHUNK_SIZE = 1024 * 1024
+# Длиннее тег не переносится между кусками (защита от незакрытого '<')
+MAX_TAG_SIZE = 64 * 1024
+# docProps/core.xml читается целиком, если не больше этого
+MAX_CORE_PART_SIZE = 1024 * 1024
+
+# Элементы исправлений WordprocessingML с атрибутом w:author
+REVISION_ELEMENTS = {
+    'ins', 'del', 'moveFrom', 'moveTo', 'rPrChange', 'pPrChange', 'sectPrChange',
+    'tblPrChange', 'tblGridChange', 'trPrChange', 'tcPrChange', 'numberingChange',
+}
+
+# Остаток открывающего тега до '>': '>' допустим внутри значений атрибутов
+_TAG_REST = rb'(?:[^>"\']|"[^"]*"|\'[^\']*\')*>'
+# Открывающий тег элемента исправления и атрибуты в нем
+_REVISION_TAG = re.compile(
+    rb'<(?:[\w.-]+:)?(?:' + b'|'.join(name.encode() for name in sorted(REVISION_ELEMENTS)) + rb')\b'
+    + _TAG_REST)
+_TAG_END = re.compile(_TAG_REST)
+_ATTRIBUTE = re.compile(rb'\s(?:[\w.-]+:)?([\w.-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+
+# Свойства docProps/app.xml -> ключи метаданных
+APP_PROPERTIES = {
+    'Template': 'template',
+    'Company': 'company',
+    'Manager': 'manager',
+    'Application': 'application',
+    'AppVersion': 'app_version',
+    'HyperlinkBase': 'hyperlink_base',
+}
+
+
+def _local(name: str) -> str:
+    """Имя элемента или атрибута без пространства имен"""
+    return name.rsplit('}', 1)[-1]
+
+
+def _attr(elem: ET.Element, name: str) -> str:
+    """Значение атрибута по локальному имени (w:author, w15:author, ...)"""
+    for attr, value in elem.attrib.items():
+        if _local(attr) == name:
+            return value
+    return ''
+
+
+def iter_elements(stream: IO[bytes]) -> Iterator[Tuple[str, ET.Element]]:
+    """Потоковый разбор части пакета: (локальное имя, элемент) по закрытию элемента.
+
+    После обработки элемент очищается и удаляется из родителя, поэтому
+    дерево в памяти не растет: на любой момент в нем только цепочка
+    открытых предков текущего элемента.
+    """
+    stack = []
+    for event, elem in ET.iterparse(stream, events=('start', 'end')):
+        if event == 'start':
+            stack.append(elem)
+            continue
+        stack.pop()
+        yield _local(elem.tag), elem
+        elem.clear()
+        if stack:
+            # Предыдущие братья уже удалены, поэтому remove находит элемент сразу
+            stack[-1].remove(elem)
+
+
+def _app_properties(stream: IO[bytes]) -> Iterator[Tuple[str, str]]:
+    for name, elem in iter_elements(stream):
+        key = APP_PROPERTIES.get(name)
+        if key and elem.text and elem.text.strip():
+            yield key, elem.text.strip()
+
+
+def _word_comments(stream: IO[bytes]) -> Iterator[Tuple[str, str]]:
+    for name, elem in iter_elements(stream):
+        if name == 'comment':
+            yield 'comment_author', _attr(elem, 'author')
+            yield 'comment_initials', _attr(elem, 'initials')
+
+
+def _people(stream: IO[bytes]) -> Iterator[Tuple[str, str]]:
+    # word/people.xml: w15:person w15:author + w15:presenceInfo;
+    # xl/persons/person.xml: person displayName userId
+    for name, elem in iter_elements(stream):
+        if name == 'person':
+            yield 'person_author', _attr(elem, 'author') or _attr(elem, 'displayName')
+            yield 'person_user_id', _attr(elem, 'userId')
+        elif name == 'presenceInfo':
+            yield 'person_user_id', _attr(elem, 'userId')
+
+
+def _tracked_changes(stream: IO[bytes]) -> Iterator[Tuple[str, str]]:
+    # Текст документа бывает в сотни мегабайт, а исправлений в нем мало или
+    # нет совсем. Вызов Python на каждый элемент iterparse здесь в 20-30 раз
+    # медленнее, поэтому открывающие теги исправлений ищутся регулярным
+    # выражением прямо в распакованных кусках, память так же постоянная.
+    tail = b''
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        data = tail + chunk
+        # Тег, разрезанный границей куска, переносится в следующий кусок
+        # ('<' в значениях атрибутов недопустим, а '>' - допустим)
+        cut = data.rfind(b'<')
+        if cut >= 0 and not _TAG_END.match(data, cut + 1) and len(data) - cut < MAX_TAG_SIZE:
+            data, tail = data[:cut], data[cut:]
+        else:
+            tail = b''
+        for tag in _REVISION_TAG.finditer(data):
+            # Атрибуты разбираются по порядку, так что текст внутри значения
+            # другого атрибута не принимается за author
+            for attribute in _ATTRIBUTE.finditer(tag.group()):
+                if attribute.group(1) == b'author':
+                    value = attribute.group(2) if attribute.group(2) is not None else attribute.group(3)
+                    yield 'tracked_change_author', html.unescape(value.decode('utf-8', errors='replace'))
+                    break
+
+
+def _sheet_revisions(stream: IO[bytes]) -> Iterator[Tuple[str, str]]:
+    # Общая книга с журналом изменений: xl/revisions/revisionHeaders.xml
+    for name, elem in iter_elements(stream):
+        if name == 'header':
+            yield 'tracked_change_author', _attr(elem, 'userName')
+
+
+def _sheet_comments(stream: IO[bytes]) -> Iterator[Tuple[str, str]]:
+    for name, elem in iter_elements(stream):
+        if name == 'author' and elem.text:
+            yield 'comment_author', elem.text.strip()
+
+
+def _relationships(stream: IO[bytes]) -> Iterator[Tuple[str, str]]:
+    # Внешние ссылки: шаблон документа, книги Excel, связанные файлы и объекты.
+    # Гиперссылки из текста сюда не попадают.
+    for name, elem in iter_elements(stream):
+        if name != 'Relationship':
+            continue
+        rel_type = elem.get('Type', '')
+        if rel_type.endswith('/attachedTemplate'):
+            yield 'attached_template', elem.get('Target', '')
+        elif elem.get('TargetMode') == 'External' and not rel_type.endswith('/hyperlink'):
+            yield 'external_link', elem.get('Target', '')
+
+
+def _relationship_target(package: zipfile.ZipFile, type_suffix: str) -> Optional[str]:
+    """Часть пакета по типу связи из _rels/.rels (core-properties, officeDocument)"""
+    try:
+        with package.open('_rels/.rels') as stream:
+            for name, elem in iter_elements(stream):
+                if name == 'Relationship' and elem.get('Type', '').endswith(type_suffix):
+                    return elem.get('Target', '').lstrip('/')
+    except (KeyError, ET.ParseError):
+        pass
+    return None
+
+
+def read_core_part(file_path: Union[str, BinaryIO]) -> Optional[bytes]:
+    """Содержимое docProps/core.xml (основные свойства) или None, если части нет"""
+    with zipfile.ZipFile(file_path) as package:
+        name = _relationship_target(package, '/core-properties') or 'docProps/core.xml'
+        try:
+            info = package.getinfo(name)
+        except KeyError:
+            return None
+        if info.file_size > MAX_CORE_PART_SIZE:
+            logger.warning("Core properties part %s is too large (%d bytes)", name, info.file_size)
+            return None
+        return package.read(info)
+
+
+def workbook_sheet_names(file_path: Union[str, BinaryIO]) -> List[str]:
+    """Имена листов книги из xl/workbook.xml (листы не распаковываются)"""
+    with zipfile.ZipFile(file_path) as package:
+        name = _relationship_target(package, '/officeDocument') or 'xl/workbook.xml'
+        with package.open(name) as stream:
+            return [_attr(elem, 'name') for tag, elem in iter_elements(stream) if tag == 'sheet']
+
+
+# Части пакета -> обработчик. Остальные части не распаковываются.
+PART_HANDLERS: List[Tuple['re.Pattern', Callable[[IO[bytes]], Iterator[Tuple[str, str]]]]] = [
+    (re.compile(r'docProps/app\.xml'), _app_properties),
+    (re.compile(r'word/comments\.xml'), _word_comments),
+    (re.compile(r'word/people\.xml'), _people),
+    (re.compile(r'word/(document|header\d*|footer\d*|footnotes|endnotes)\.xml'), _tracked_changes),
+    (re.compile(r'word/_rels/(settings|document)\.xml\.rels'), _relationships),
+    (re.compile(r'xl/externalLinks/_rels/externalLink\d+\.xml\.rels'), _relationships),
+    (re.compile(r'xl/comments\d*\.xml'), _sheet_comments),
+    (re.compile(r'xl/persons/person\.xml'), _people),
+    (re.compile(r'xl/revisions/revisionHeaders\.xml'), _sheet_revisions),
+]
+
+
+def scan_ooxml_parts(file_path: Union[str, BinaryIO]) -> List[Tuple[str, str]]:
+    """Ищет в пакете OOXML (.docx, .xlsx) рецензентов, авторов исправлений,
+    внешние ссылки и свойства из docProps/app.xml.
+
+    Каждая нужная часть ZIP читается потоком (iterparse с очисткой
+    элементов, для текста документа - поиск тегов исправлений по кускам),
+    DOM не строится, остальные части (листы, медиа) не распаковываются.
+    Возвращает пары (ключ, значение) без повторов.
+    """
+    findings: Dict[str, List[str]] = {}
+    with zipfile.ZipFile(file_path) as package:
+        for info in package.infolist():
+            for pattern, handler in PART_HANDLERS:
+                if not pattern.fullmatch(info.filename):
+                    continue
+                try:
+                    with package.open(info) as stream:
+                        for key, value in handler(stream):
+                            values = findings.setdefault(key, [])
+                            if value and value not in values and len(values) < MAX_VALUES_PER_KEY:
+                                values.append(value)
+                except ET.ParseError as e:
+                    logger.warning("Error parsing OOXML part %s: %s", info.filename, e)
+                break
+
+    return [(key, value) for key, values in findings.items() for value in values]
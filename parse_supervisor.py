@@ -0,0 +1,277 @@
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from multiprocessing.connection import wait
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .parser_registry import get_parser_for_file
+from .scan_logging import LOGGER_NAME, ScanErrorCollector, file_context, get_logger
+from .scan_metrics import ScanMetrics
+
+try:
+    import resource
+except ImportError:  # Windows: ограничение памяти недоступно
+    resource = None
+
+logger = get_logger('parse_supervisor')
+
+
+def _worker_main(conn, memory_limit_mb: Optional[int]):
+    """Цикл рабочего процесса: получает файл, возвращает метаданные"""
+    # Записи журнала парсеров не печатаются в процессе, а уходят родителю вместе с результатом
+    collector = ScanErrorCollector()
+    root_logger = logging.getLogger(LOGGER_NAME)
+    root_logger.addHandler(collector)
+    root_logger.propagate = False
+
+    if resource is not None and memory_limit_mb:
+        limit = memory_limit_mb * 1024 * 1024
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ValueError, OSError) as e:
+            logger.warning("Cannot set memory limit for parse worker: %s", e)
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+
+        file_path, mime_type, header = task
+        collector.records = []
+        try:
+            with file_context(file_path):
+                parser = get_parser_for_file(file_path, mime_type)
+                start = time.perf_counter()
+                metadata = parser.extract_metadata(file_path, header) if parser else []
+                elapsed = time.perf_counter() - start
+            conn.send(('ok', (metadata, parser.__class__.__name__ if parser else None, elapsed,
+                              collector.records)))
+        except MemoryError:
+            conn.send(('memory', None))
+        except Exception as e:
+            conn.send(('error', (str(e), collector.records)))
+
+
+class _Worker:
+    """Рабочий процесс и канал связи с ним"""
+
+    def __init__(self, context, memory_limit_mb: Optional[int]):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, memory_limit_mb),
+                                       daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.task = None
+        self.deadline = None
+
+    def kill(self):
+        self.conn.close()
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(1)
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, BrokenPipeError):
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(1)
+        self.conn.close()
+
+
+class ParseSupervisor:
+    """Разбор файлов в отдельных процессах с ограничением времени и памяти.
+
+    Зависший (циклический xref в PDF) или раздувшийся (decompression bomb)
+    процесс убивается и перезапускается, а файл получает результат
+    'Parse Timeout' / 'Parse Failure' вместо остановки всего сканирования.
+    Лимит памяти задается через RLIMIT_AS и действует только на POSIX.
+    """
+
+    def __init__(self, workers: Optional[int] = None, timeout: Optional[float] = 120.0,
+                 memory_limit_mb: Optional[int] = 2048, metrics: Optional[ScanMetrics] = None):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.metrics = metrics or ScanMetrics(enabled=False)
+        # spawn безопасен для GUI-процесса с потоками Qt
+        self._context = multiprocessing.get_context('spawn')
+        self._pool: List[_Worker] = []
+        # Свободные процессы для parse() и защита пула при вызовах из нескольких потоков
+        self._idle: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """Останавливает все рабочие процессы"""
+        for worker in self._pool:
+            if worker.task is None:
+                worker.stop()
+            else:
+                worker.kill()
+        self._pool = []
+        self._idle = queue.Queue()
+
+    def _spawn(self) -> _Worker:
+        return _Worker(self._context, self.memory_limit_mb)
+
+    def _replace(self, worker: _Worker) -> _Worker:
+        worker.kill()
+        new_worker = self._spawn()
+        with self._lock:
+            self._pool[self._pool.index(worker)] = new_worker
+        return new_worker
+
+    def _assign(self, worker: _Worker, file_path: str, detected: Dict) -> _Worker:
+        """Отправляет файл рабочему процессу"""
+        task = (file_path, detected['mime'], detected.get('header'))
+        try:
+            worker.conn.send(task)
+        except (OSError, BrokenPipeError):
+            # Процесс умер между задачами - перезапускаем и повторяем отправку
+            worker = self._replace(worker)
+            worker.conn.send(task)
+        worker.task = (file_path, detected)
+        worker.deadline = time.monotonic() + self.timeout if self.timeout else None
+        return worker
+
+    def _receive(self, worker: _Worker) -> Tuple[_Worker, List[Dict]]:
+        """Забирает готовый результат рабочего процесса"""
+        file_path, _ = worker.task
+        try:
+            status, payload = worker.conn.recv()
+        except (EOFError, OSError):
+            # Процесс завершился аварийно (OOM killer, segfault в нативной библиотеке)
+            logger.error("Parse worker crashed on %s", file_path,
+                         extra={'file_path': file_path})
+            self.metrics.incr('parse_crashes')
+            return self._replace(worker), [self._failure('Parse Failure', 'worker crashed')]
+
+        worker.task = None
+        if status == 'ok':
+            metadata, parser_name, elapsed, records = payload
+            self._replay(records)
+            if parser_name:
+                self.metrics.observe(f'parse:{parser_name}', elapsed)
+            return worker, metadata
+        if status == 'memory':
+            logger.error("Memory limit exceeded parsing %s", file_path,
+                         extra={'file_path': file_path})
+            self.metrics.incr('parse_memory_limit')
+            # После MemoryError состояние процесса ненадежно
+            return self._replace(worker), [self._failure(
+                'Parse Failure', f'memory limit {self.memory_limit_mb} MB exceeded')]
+
+        message, records = payload
+        self._replay(records)
+        logger.warning("Error analyzing %s: %s", file_path, message,
+                       extra={'file_path': file_path})
+        self.metrics.incr('parse_errors')
+        return worker, []
+
+    def _expire(self, worker: _Worker) -> Tuple[_Worker, List[Dict]]:
+        """Убивает процесс, не уложившийся в timeout"""
+        file_path, _ = worker.task
+        logger.error("Parse timeout after %.0f s: %s", self.timeout, file_path,
+                     extra={'file_path': file_path})
+        self.metrics.incr('parse_timeouts')
+        return self._replace(worker), [self._failure(
+            'Parse Timeout', f'parse timeout after {self.timeout:.0f} s')]
+
+    def parse(self, file_path: str, detected: Dict) -> List[Dict]:
+        """Разбирает один файл свободным рабочим процессом
+
+        Блокирует вызывающий поток до результата; безопасно вызывается из
+        нескольких потоков одновременно (по одному на рабочий процесс).
+        """
+        with self._lock:
+            while len(self._pool) < self.workers:
+                worker = self._spawn()
+                self._pool.append(worker)
+                self._idle.put(worker)
+        worker = self._idle.get()
+        try:
+            worker = self._assign(worker, file_path, detected)
+            if worker.conn.poll(self.timeout):
+                worker, metadata = self._receive(worker)
+            else:
+                worker, metadata = self._expire(worker)
+            return metadata
+        finally:
+            self._idle.put(worker)
+
+    def map(self, tasks: Iterable[Tuple[str, Dict]]) -> Iterator[Tuple[str, Dict, List[Dict]]]:
+        """Разбирает файлы и возвращает результаты по мере готовности
+
+        Args:
+            tasks: пары (путь, результат TypeDetector.detect)
+
+        Returns:
+            Iterator: тройки (путь, результат определения типа, метаданные)
+        """
+        tasks = iter(tasks)
+        exhausted = False
+        while len(self._pool) < self.workers:
+            self._pool.append(self._spawn())
+
+        while True:
+            # Раздаем задачи свободным процессам
+            for worker in list(self._pool):
+                if worker.task is not None or exhausted:
+                    continue
+                try:
+                    file_path, detected = next(tasks)
+                except StopIteration:
+                    exhausted = True
+                    break
+                self._assign(worker, file_path, detected)
+
+            busy = [w for w in self._pool if w.task is not None]
+            if not busy:
+                if exhausted:
+                    return
+                continue
+
+            deadlines = [w.deadline for w in busy if w.deadline is not None]
+            wait_time = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+            ready = wait([w.conn for w in busy], wait_time)
+
+            for worker in busy:
+                file_path, detected = worker.task
+                if worker.conn in ready:
+                    _, metadata = self._receive(worker)
+                elif worker.deadline is not None and time.monotonic() >= worker.deadline:
+                    _, metadata = self._expire(worker)
+                else:
+                    continue
+                yield file_path, detected, metadata
+
+    @staticmethod
+    def _replay(records: List[Dict]):
+        """Передает записи журнала рабочего процесса в журнал текущего процесса"""
+        for record in records:
+            logging.getLogger(record['source']).log(
+                logging.getLevelName(record['level']), '%s', record['message'],
+                extra={'file_path': record['file_path']})
+
+    @staticmethod
+    def _failure(key: str, message: str) -> Dict:
+        return {
+            'key': key,
+            'value': message,
+            'source': 'ParseSupervisor'
+        }
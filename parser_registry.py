@@ -0,0 +1,85 @@
+import importlib
+import threading
+from typing import Dict, Optional, Tuple
+from .base_parser import BaseParser
+from .type_detector import mime_for_extension
+from .scan_logging import get_logger
+
+logger = get_logger('parser_registry')
+
+# MIME-тип -> (модуль, класс парсера).
+# Модуль парсера (и его тяжелая библиотека: PyPDF2, python-docx, openpyxl,
+# Pillow, exifread, olefile) импортируется только при первом файле этого типа.
+PARSER_REGISTRY: Dict[str, Tuple[str, str]] = {
+    'application/pdf': ('pdf_parser', 'PDFParser'),
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document': ('docx_parser', 'DocxParser'),
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': ('excel_parser', 'ExcelParser'),
+    'application/msword': ('ole_parser', 'OLEParser'),
+    'application/vnd.ms-excel': ('ole_parser', 'OLEParser'),
+    'application/vnd.ms-powerpoint': ('ole_parser', 'OLEParser'),
+    'image/jpeg': ('image_parser', 'ImageParser'),
+    'image/tiff': ('image_parser', 'ImageParser'),
+    'image/png': ('png_parser', 'PNGParser'),
+    'image/webp': ('image_parser', 'ImageParser'),
+    'image/gif': ('image_parser', 'ImageParser'),
+    'image/bmp': ('image_parser', 'ImageParser'),
+    'image/heic': ('heic_parser', 'HEICParser'),
+    'image/heif': ('heic_parser', 'HEICParser'),
+    'application/zip': ('archive_parser', 'ArchiveParser'),
+    'application/x-tar': ('archive_parser', 'ArchiveParser'),
+    'application/gzip': ('archive_parser', 'ArchiveParser'),
+}
+
+# Уже загруженные классы парсеров
+_parser_classes: Dict[Tuple[str, str], type] = {}
+
+# Экземпляры парсеров: один на класс в процессе. Парсеры не хранят состояние
+# между файлами, поэтому тяжелая инициализация выполняется один раз, а в
+# рабочих процессах у каждого процесса свой набор экземпляров.
+_parser_instances: Dict[type, BaseParser] = {}
+_instances_lock = threading.Lock()
+
+
+def register_parser(mime_type: str, module_name: str, class_name: str):
+    """Регистрирует парсер для MIME-типа без импорта его модуля"""
+    PARSER_REGISTRY[mime_type] = (module_name, class_name)
+
+
+def get_parser_class(mime_type: Optional[str]) -> Optional[type]:
+    """Возвращает класс парсера для MIME-типа, импортируя модуль при первом обращении"""
+    entry = PARSER_REGISTRY.get(mime_type)
+    if entry is None:
+        return None
+
+    parser_class = _parser_classes.get(entry)
+    if parser_class is None:
+        module_name, class_name = entry
+        try:
+            module = importlib.import_module(f'.{module_name}', __package__)
+        except ImportError as e:
+            logger.warning("Parser backend for %s is not available: %s", mime_type, e)
+            return None
+        parser_class = getattr(module, class_name)
+        _parser_classes[entry] = parser_class
+    return parser_class
+
+
+def get_parser_for_file(file_path: str, mime_type: Optional[str] = None) -> Optional[BaseParser]:
+    """Возвращает парсер для файла по MIME-типу (или по расширению, если тип не задан)
+
+    Экземпляр парсера создается один раз на процесс и переиспользуется.
+    """
+    if mime_type is None:
+        mime_type = mime_for_extension(file_path)
+    parser_class = get_parser_class(mime_type)
+    if parser_class is None:
+        return None
+
+    parser = _parser_instances.get(parser_class)
+    if parser is None:
+        with _instances_lock:
+            parser = _parser_instances.get(parser_class)
+            if parser is None:
+                parser = parser_class()
+                _parser_instances[parser_class] = parser
+    return parser
@@ -1,6 +1,9 @@
 import PyPDF2
-from typing import List, Dict
+from typing import List, Dict, Optional
 from .base_parser import BaseParser
+from .scan_logging import get_logger
+
+logger = get_logger('pdf_parser')
 
 class PDFParser(BaseParser):
     
@@ -8,11 +11,11 @@ class PDFParser(BaseParser):
     def supported_formats() -> List[str]:
         return ['application/pdf']
         
-    def extract_metadata(self, file_path: str) -> List[Dict]:
+    def extract_metadata(self, file_path: str, header: Optional[bytes] = None) -> List[Dict]:
         metadata = []
         
         try:
-            with open(file_path, 'rb') as file:
+            with self._open(file_path, header) as file:
                 pdf_reader = PyPDF2.PdfReader(file)
                 doc_info = pdf_reader.metadata
                 
@@ -27,6 +30,6 @@ class PDFParser(BaseParser):
                 metadata.append(self._format_metadata('Encrypted', pdf_reader.is_encrypted))
                 
         except Exception as e:
-            print(f"Error reading PDF metadata: {e}")
+            logger.warning("Error reading PDF metadata: %s", e)
             
         return metadata
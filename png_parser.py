@@ -0,0 +1,181 @@
+import datetime
+import os
+import struct
+import zlib
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional, Tuple
+from .base_parser import BaseParser
+from .scan_logging import get_logger
+
+logger = get_logger('png_parser')
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# Чанки, которые читаются целиком; остальные (IDAT, fdAT, ...) пропускаются seek
+METADATA_CHUNKS = {b'IHDR', b'tEXt', b'zTXt', b'iTXt', b'eXIf', b'iCCP', b'pHYs', b'tIME', b'acTL'}
+
+# Предел размера читаемого чанка и распакованного текста zTXt / iTXt
+MAX_CHUNK_SIZE = 8 * 1024 * 1024
+MAX_TEXT_SIZE = 1024 * 1024
+
+# Тип цвета из IHDR -> режим изображения в терминах PIL
+COLOR_TYPES = {0: 'L', 2: 'RGB', 3: 'P', 4: 'LA', 6: 'RGBA'}
+
+
+class PNGParser(BaseParser):
+    """Метаданные PNG обходом списка чанков без декодирования изображения.
+
+    Читаются только заголовки чанков и чанки с метаданными (tEXt, iTXt,
+    zTXt, eXIf, iCCP, tIME, pHYs); данные изображения IDAT пропускаются
+    seek. Сжатый текст zTXt / iTXt распаковывается не дальше первых
+    MAX_TEXT_SIZE байт, PIL импортируется только для файлов с eXIf.
+    """
+
+    @staticmethod
+    def supported_formats() -> List[str]:
+        return ['image/png']
+
+    def extract_metadata(self, file_path: str, header: Optional[bytes] = None) -> List[Dict]:
+        metadata = []
+        for key, value in self._get_file_info(file_path).items():
+            metadata.append(self._format_metadata(key, value))
+
+        if header is not None and not header.startswith(PNG_SIGNATURE):
+            return metadata
+
+        try:
+            with self._open(file_path, header) as f:
+                if f.read(8) != PNG_SIGNATURE:
+                    return metadata
+                for chunk_type, data in self._iter_chunks(f):
+                    metadata.extend(self._decode_chunk(chunk_type, data))
+        except Exception as e:
+            logger.warning("Error reading PNG chunks: %s", e)
+
+        return metadata
+
+    def _iter_chunks(self, f: BinaryIO):
+        """Перебирает (тип, данные) чанков с метаданными до IEND"""
+        while True:
+            chunk_header = f.read(8)
+            if len(chunk_header) < 8:
+                return
+            length, chunk_type = struct.unpack('>I4s', chunk_header)
+            if chunk_type == b'IEND':
+                return
+            if chunk_type not in METADATA_CHUNKS or length > MAX_CHUNK_SIZE:
+                # Данные и CRC пропускаются без чтения
+                f.seek(length + 4, os.SEEK_CUR)
+                continue
+            data = f.read(length)
+            if len(data) < length:
+                logger.warning("Truncated PNG chunk %s", chunk_type.decode('latin-1'))
+                return
+            f.seek(4, os.SEEK_CUR)
+            yield chunk_type, data
+
+    def _decode_chunk(self, chunk_type: bytes, data: bytes) -> List[Dict]:
+        if chunk_type in (b'tEXt', b'zTXt', b'iTXt'):
+            text = self._decode_text(chunk_type, data)
+            if text is None:
+                return []
+            keyword, value = text
+            return [self._format_metadata(f'PNG_{keyword}', value)]
+        if chunk_type == b'eXIf':
+            return self._decode_exif(data)
+        if chunk_type == b'IHDR' and len(data) >= 13:
+            width, height, bit_depth, color_type = struct.unpack('>IIBB', data[:10])
+            return [
+                self._format_metadata('Image Width', width),
+                self._format_metadata('Image Height', height),
+                self._format_metadata('Image Format', 'PNG'),
+                self._format_metadata('Image Mode', COLOR_TYPES.get(color_type, f'Unknown ({color_type})')),
+                self._format_metadata('Bit Depth', bit_depth),
+            ]
+        if chunk_type == b'iCCP':
+            name = data.split(b'\x00', 1)[0].decode('latin-1')
+            return [self._format_metadata('ICC Profile Name', name)]
+        if chunk_type == b'tIME' and len(data) >= 7:
+            year, month, day, hour, minute, second = struct.unpack('>HBBBBB', data[:7])
+            return [self._format_metadata(
+                'PNG_ModifyTime', f'{year:04d}-{month:02d}-{day:02d} {hour:02d}:{minute:02d}:{second:02d}')]
+        if chunk_type == b'pHYs' and len(data) >= 9:
+            x, y, unit = struct.unpack('>IIB', data[:9])
+            if unit == 1:
+                # Точек на метр -> точек на дюйм
+                return [self._format_metadata('Resolution', f'({x * 0.0254:.0f}, {y * 0.0254:.0f}) DPI')]
+            return []
+        if chunk_type == b'acTL' and len(data) >= 8:
+            frames = struct.unpack('>I', data[:4])[0]
+            return [self._format_metadata('Image Animated', 'Yes'),
+                    self._format_metadata('Image Frames', frames)]
+        return []
+
+    @staticmethod
+    def _decompress(data: bytes) -> bytes:
+        """Распаковывает zlib-поток не больше MAX_TEXT_SIZE байт"""
+        return zlib.decompressobj().decompress(data, MAX_TEXT_SIZE)
+
+    def _decode_text(self, chunk_type: bytes, data: bytes) -> Optional[Tuple[str, str]]:
+        """Ключевое слово и текст из tEXt / zTXt / iTXt"""
+        keyword, sep, rest = data.partition(b'\x00')
+        if not sep or not keyword:
+            return None
+        keyword = keyword.decode('latin-1')
+
+        if chunk_type == b'tEXt':
+            return keyword, rest.decode('latin-1')
+
+        if chunk_type == b'zTXt':
+            # Метод сжатия (всегда 0 - zlib), затем сжатый текст
+            return keyword, self._decompress(rest[1:]).decode('latin-1')
+
+        # iTXt: флаг сжатия, метод, язык\0, переведенное ключевое слово\0, текст UTF-8
+        if len(rest) < 2:
+            return None
+        compressed = rest[0]
+        _, _, rest = rest[2:].partition(b'\x00')
+        _, _, text = rest.partition(b'\x00')
+        if compressed:
+            text = self._decompress(text)
+        return keyword, text.decode('utf-8', errors='replace')
+
+    def _decode_exif(self, data: bytes) -> List[Dict]:
+        """Теги EXIF из чанка eXIf (TIFF-структура, как в APP1 у JPEG)"""
+        metadata = []
+        try:
+            # PIL нужен только для файлов с eXIf
+            from PIL import Image, ExifTags
+            exif = Image.Exif()
+            exif.load(data)
+            for tag_id, value in exif.items():
+                if tag_id == 0x8825:
+                    continue
+                tag_name = ExifTags.TAGS.get(tag_id, f'Unknown_{tag_id}')
+                if value:
+                    metadata.append(self._format_metadata(f'EXIF_{tag_name}', value))
+            for tag_id, value in exif.get_ifd(0x8825).items():
+                tag_name = ExifTags.GPSTAGS.get(tag_id, f'Unknown_{tag_id}')
+                if value:
+                    metadata.append(self._format_metadata(f'EXIF_{tag_name}', value))
+        except Exception as e:
+            logger.warning("Error reading PNG eXIf chunk: %s", e)
+        return metadata
+
+    def _get_file_info(self, file_path: str) -> Dict[str, str]:
+        """Базовая информация о файле"""
+        if not isinstance(file_path, str):
+            return self._member_info(file_path)
+        try:
+            stat = os.stat(file_path)
+            return {
+                'File Name': os.path.basename(file_path),
+                'File Size': f"{stat.st_size} bytes ({stat.st_size / 1024:.1f} KB)",
+                'File Extension': Path(file_path).suffix,
+                'File Path': file_path,
+                'File Created': datetime.datetime.fromtimestamp(stat.st_ctime).strftime('%Y-%m-%d %H:%M:%S'),
+                'File Modified': datetime.datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
+                'File Accessed': datetime.datetime.fromtimestamp(stat.st_atime).strftime('%Y-%m-%d %H:%M:%S'),
+            }
+        except Exception as e:
+            return {'Error': f'File info error: {e}'}
@@ -0,0 +1,50 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+class ResultCache:
+    """Общий кэш результатов анализа файлов между сканированиями.
+
+    Запись действительна, пока у файла не изменились размер и mtime и пока
+    не сменился набор правил рисков (ruleset - RiskAnalyzer.ruleset_hash).
+    Хранится и отрицательный результат (None - у файла нет рисков), чтобы
+    повторное сканирование не разбирало такие файлы заново. При превышении
+    max_entries вытесняются давно не использованные записи.
+    """
+
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[str, Tuple[Tuple[int, int, Optional[str]], Optional[Dict]]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, file_path: str, size: int, mtime_ns: int,
+            ruleset: Optional[str] = None) -> Tuple[bool, Optional[Dict]]:
+        """Возвращает (найдено, результат {'metadata', 'risks'} или None)"""
+        with self._lock:
+            cached = self._entries.get(file_path)
+            if cached is None or cached[0] != (size, mtime_ns, ruleset):
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(file_path)
+            self.hits += 1
+            return True, cached[1]
+
+    def put(self, file_path: str, size: int, mtime_ns: int, entry: Optional[Dict],
+            ruleset: Optional[str] = None):
+        with self._lock:
+            self._entries[file_path] = ((size, mtime_ns, ruleset), entry)
+            self._entries.move_to_end(file_path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
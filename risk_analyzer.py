@@ -1,190 +1,122 @@
-import re
-from typing import List, Dict
+from typing import List, Dict, Optional
+from .metadata_value import scan_text
+from .rule_index import RuleIndex
+from .rule_packs import DEFAULT_CACHE_DIR, DEFAULT_RULE_PACK, RulePackError, compile_rules, pack_stamp, read_rule_packs
+from .scan_logging import get_logger
+from .scan_metrics import ScanMetrics
+
+logger = get_logger('risk_analyzer')
 
 class RiskAnalyzer:
-    def __init__(self):
-        # Правила для определения рисков
-        self.rules = [
-            # Персональные данные
-            {
-                'name': 'Author Information',
-                'pattern': r'(author|creator|producer|company|organization|username|user(name)?|login)',
-                'level': 'medium',
-                'case_sensitive': False
-            },
-            {
-                'name': 'Email Addresses',
-                'pattern': r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
-                'level': 'high',
-                'case_sensitive': False
-            },
-            {
-                'name': 'Phone Numbers',
-                'pattern': r'\+7\d{10}',
-                'level': 'high',
-                'case_sensitive': False
-            },
-            
-            # Пути и местоположения
-            {
-                'name': 'File Paths',
-                'pattern': r'([A-Za-z]:\\[\\\S|*\S]?.*\$|/.*/.*|\\\\.*\\.*)',
-                'level': 'high',
-                'case_sensitive': False
-            },
-            {
-                'name': 'Internal Network Paths',
-                'pattern': r'\\\\[A-Za-z0-9_.-]+\\',
-                'level': 'high',
-                'case_sensitive': False
-            },
-            {
-                'name': 'Home Directory Paths',
-                'pattern': r'(/home/|/Users/|C:\\Users\\|C:\\Documents and Settings\\)',
-                'level': 'medium',
-                'case_sensitive': False
-            },
-            
-            # Геолокация и координаты
-            {
-                'name': 'GPS Coordinates',
-                'pattern': r'(\d{1,3}°\s\d{1,2}\'\s\d{1,2}\"|\d{1,3}\.\d+\s*[NS]\s*\d{1,3}\.\d+\s*[EW]|\-?\d{1,3}\.\d+,\s*\-?\d{1,3}\.\d+)',
-                'level': 'high',
-                'case_sensitive': False
-            },
-            {
-                'name': 'GPS EXIF Data',
-                'pattern': r'(gps|gpslatitude|gpslongitude|gpsaltitude|geotag|geolocation)',
-                'level': 'high',
-                'case_sensitive': False
-            },
-            {
-                'name': 'Address Information',
-                'pattern': r'(street|st\.|avenue|ave\.|boulevard|blvd\.|road|rd\.|city|town|zip(code)?|postal(code)?)',
-                'level': 'medium',
-                'case_sensitive': False
-            },
-            
-            # Системная информация
-            {
-                'name': 'Computer Name',
-                'pattern': r'(computername|hostname|machine(name)?)',
-                'level': 'medium',
-                'case_sensitive': False
-            },
-            {
-                'name': 'IP Addresses',
-                'pattern': r'\b(?:(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\.){3}(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\b(?!\s*[\.\d])',
-                'level': 'medium',
-                'case_sensitive': False
-            },
-            {
-                'name': 'MAC Addresses',
-                'pattern': r'([0-9A-Fa-f]{2}[:-]){5}([0-9A-Fa-f]{2})',
-                'level': 'medium',
-                'case_sensitive': False
-            },
-            
-            # Даты и временные метки
-            {
-                'name': 'Creation Dates',
-                'pattern': r'(created|creation(date)?|date.*created|createtime)',
-                'level': 'low',
-                'case_sensitive': False
-            },
-            {
-                'name': 'Modification Dates',
-                'pattern': r'(modified|modification(date)?|date.*modified|lastmodified)',
-                'level': 'low',
-                'case_sensitive': False
-            },
-            
-            # Программное обеспечение
-            {
-                'name': 'Software Versions',
-                'pattern': r'(version|software|application|appversion|build(number)?)',
-                'level': 'low',
-                'case_sensitive': False
-            },
-            {
-                'name': 'Office Product IDs',
-                'pattern': r'(producer|generator|createdwith|softwareversion)',
-                'level': 'low',
-                'case_sensitive': False
-            },
-            
-            # Сетевые ресурсы
-            {
-                'name': 'URLs and Domains',
-                'pattern': r'(https?://|www\.|ftp://|\.(com|org|net|ru|com\.ru))',
-                'level': 'medium',
-                'case_sensitive': False
-            },
-            {
-                'name': 'Server Names',
-                'pattern': r'(server|host|database|db(name)?)',
-                'level': 'high',
-                'case_sensitive': False
-            },
-            
-            # Безопасность и доступ
-            {
-                'name': 'Password References',
-                'pattern': r'(password|passwd|pwd|secret|key|token|auth)',
-                'level': 'high',
-                'case_sensitive': False
-            },
-            {
-                'name': 'Security Identifiers',
-                'pattern': r'(sid|guid|uuid|api[_-]?key)',
-                'level': 'high',
-                'case_sensitive': False
-            },
-            
-            # Документооборот
-            {
-                'name': 'Document IDs',
-                'pattern': r'(documentid|docid|revision|version(id)?)',
-                'level': 'low',
-                'case_sensitive': False
-            },
-            {
-                'name': 'Template Paths',
-                'pattern': r'(template|normal\.dot(m)?)',
-                'level': 'medium',
-                'case_sensitive': False
-            }
-        ]
+    """Поиск рисков в метаданных по правилам из наборов (rule packs).
+
+    Правила читаются из JSON файлов наборов (по умолчанию встроенный
+    risk_rules.json), компилируются один раз и перечитываются
+    reload_if_changed(), когда файлы наборов меняются. ruleset_hash -
+    хэш содержимого наборов: по нему кэши результатов понимают, что
+    риски посчитаны по другим правилам.
+    """
+
+    def __init__(self, metrics: Optional[ScanMetrics] = None, rule_packs: Optional[List[str]] = None,
+                 cache_dir: Optional[str] = DEFAULT_CACHE_DIR):
+        """
+        Args:
+            rule_packs: файлы наборов правил по порядку; правило с тем же именем
+                в следующем наборе заменяет предыдущее
+            cache_dir: каталог кэша разобранных наборов (None - без кэша на диске)
+        """
+        self.rule_packs = list(rule_packs) if rule_packs else [DEFAULT_RULE_PACK]
+        self.cache_dir = cache_dir
+        self.ruleset_hash: Optional[str] = None
+        self.rules: List[Dict] = []
+        self.index = RuleIndex(self.rules)
+        self._stamp = None
+        
+        # Сколько раз правило исчерпало бюджет времени на значение
+        self.budget_overruns: Dict[str, int] = {}
+        self.metrics = metrics or ScanMetrics(enabled=False)
         
+        # Ошибка во встроенном или заданном наборе при создании - RulePackError
+        self._load()
+        
+    def _load(self):
+        stamp = pack_stamp(self.rule_packs)
+        rules, ruleset_hash = read_rule_packs(self.rule_packs)
+        if ruleset_hash != self.ruleset_hash:
+            rules = compile_rules(rules, ruleset_hash, self.cache_dir)
+            # Правила с 'sources' и 'keys' проверяются только для своих элементов.
+            # analyze_risks берет индекс один раз, поэтому замена во время
+            # анализа не смешивает старые и новые правила
+            self.index = RuleIndex(rules)
+            self.rules = rules
+            self.ruleset_hash = ruleset_hash
+        self._stamp = stamp
+        
+    def reload_if_changed(self) -> bool:
+        """Перечитывает наборы правил, если их файлы изменились
+
+        Returns:
+            bool: True, если сменился набор правил (ruleset_hash)
+        """
+        if pack_stamp(self.rule_packs) == self._stamp:
+            return False
+        previous = self.ruleset_hash
+        try:
+            self._load()
+        except RulePackError as e:
+            # Остаются прежние правила; повторная попытка - при следующем изменении файлов
+            self._stamp = pack_stamp(self.rule_packs)
+            logger.error("Rule packs not reloaded, keeping ruleset %s: %s", previous[:12], e)
+            return False
+        if self.ruleset_hash == previous:
+            return False
+        logger.info("Risk rules reloaded: %d rules, ruleset %s", len(self.rules), self.ruleset_hash[:12])
+        return True
         
     def analyze_risks(self, metadata: List[Dict]) -> List[Dict]:
         """Анализирует метаданные на наличие рисков"""
         risks = []
+        index = self.index
         
         for item in metadata:
-            for rule in self.rules:
-                if self._check_rule(item, rule):
-                    risk = {
-                        'key': item['key'],
-                        'value': item['value'],
-                        'rule': rule['name'],
-                        'level': rule['level'],
-                        'source': item['source']
-                    }
-                    risks.append(risk)
+            # Текст значения строится один раз для всех правил и только если нужен
+            text = None
+            for rule, key_matched in index.dispatch(item['source'], item['key']):
+                if not key_matched:
+                    if text is None:
+                        text = scan_text(item['value'])
+                    if not self._check_value(item, rule, text):
+                        continue
+                risk = {
+                    'key': item['key'],
+                    'value': item['value'],
+                    'rule': rule['name'],
+                    'level': rule['level'],
+                    'source': item['source']
+                }
+                # Элемент из члена архива: адрес внутри файла
+                if 'member' in item:
+                    risk['member'] = item['member']
+                risks.append(risk)
                     
         return risks
         
-    def _check_rule(self, metadata_item: Dict, rule: Dict) -> bool:
-        """Проверяет одно правило для одного элемента метаданных"""
-        flags = 0 if rule.get('case_sensitive', False) else re.IGNORECASE
+    def _check_value(self, metadata_item: Dict, rule: Dict, text: str) -> bool:
+        """Проверяет правило по значению элемента (совпадения по ключу отбирает RuleIndex)
+
+        Args:
+            text: текст значения для проверки (scan_text)
+        """
+        # Длинный текст проверяется кусками ограниченной длины
+        matched = rule['regex'].search(text)
+        if matched is None:
+            self._report_overrun(metadata_item, rule, text)
+        return bool(matched)
         
-        # Проверяем ключ
-        if re.search(rule['pattern'], metadata_item['key'], flags):
-            return True
-            
-        # Проверяем значение
-        if re.search(rule['pattern'], str(metadata_item['value']), flags):
-            return True
-            
-        return False
+    def _report_overrun(self, metadata_item: Dict, rule: Dict, text: str):
+        """Правило не уложилось в бюджет времени: значение проверено не до конца"""
+        name = rule['name']
+        self.budget_overruns[name] = self.budget_overruns.get(name, 0) + 1
+        self.metrics.incr(f'rule_budget_exceeded:{name}')
+        logger.warning("Risk rule '%s' exceeded its time budget on %s (%d chars), value checked partially",
+                       name, metadata_item['key'], len(text))
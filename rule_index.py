@@ -0,0 +1,68 @@
+from typing import Dict, List, Tuple
+
+# Не больше стольких пар (источник, ключ) в кэше отбора правил
+MAX_CACHED_KEYS = 10000
+
+# Правило и признак того, что оно уже совпало по ключу
+RulePlan = Tuple[Tuple[Dict, bool], ...]
+
+
+class KeyPrefixTrie:
+    """Префиксное дерево ключей метаданных: значения, привязанные к префиксам"""
+
+    __slots__ = ('children', 'values')
+
+    def __init__(self):
+        self.children: Dict[str, 'KeyPrefixTrie'] = {}
+        self.values: List = []
+
+    def insert(self, prefix: str, value):
+        node = self
+        for char in prefix:
+            node = node.children.setdefault(char, KeyPrefixTrie())
+        node.values.append(value)
+
+    def collect(self, key: str) -> List:
+        """Значения всех префиксов ключа, включая пустой"""
+        node = self
+        found = list(node.values)
+        for char in key:
+            node = node.children.get(char)
+            if node is None:
+                break
+            found.extend(node.values)
+        return found
+
+
+class RuleIndex:
+    """Отбор правил риска для элемента метаданных по источнику и ключу.
+
+    Правило может объявить 'sources' - источники (парсеры), и 'keys' -
+    префиксы ключей, к которым оно применимо; без них правило проверяется
+    для всех элементов. Для пары (источник, ключ) запоминается список
+    применимых правил и то, какие из них совпали по ключу, поэтому шаблон
+    по одному и тому же ключу проверяется один раз за все сканирование.
+    """
+
+    def __init__(self, rules: List[Dict]):
+        self.rules = rules
+        self._trie = KeyPrefixTrie()
+        for position, rule in enumerate(rules):
+            for prefix in rule.get('keys') or ('',):
+                self._trie.insert(prefix, position)
+        self._cache: Dict[Tuple[str, str], RulePlan] = {}
+
+    def dispatch(self, source: str, key: str) -> RulePlan:
+        """Применимые правила в порядке объявления: (правило, совпало ли по ключу)"""
+        cache_key = (source, key)
+        plan = self._cache.get(cache_key)
+        if plan is None:
+            positions = sorted(set(self._trie.collect(key)))
+            plan = tuple(
+                (rule, bool(rule['regex'].search(key)))
+                for rule in (self.rules[position] for position in positions)
+                if not rule.get('sources') or source in rule['sources'])
+            if len(self._cache) >= MAX_CACHED_KEYS:
+                self._cache.clear()
+            self._cache[cache_key] = plan
+        return plan
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from typing import Dict, List, Optional, Tuple
+from .rule_regex import RuleRegex, RulePatternError
+from .scan_logging import get_logger
+
+logger = get_logger('rule_packs')
+
+# Встроенный набор правил
+DEFAULT_RULE_PACK = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'risk_rules.json')
+
+# Каталог кэша разобранных наборов правил (файлы по хэшу содержимого)
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'metadate', 'rules')
+
+# Версия формата файла набора правил
+RULE_PACK_FORMAT = 1
+
+RISK_LEVELS = ('low', 'medium', 'high')
+
+# Состояние файлов наборов: (путь, размер, mtime) или (путь, None), если файла нет
+PackStamp = Tuple[Tuple, ...]
+
+
+class RulePackError(ValueError):
+    """Файл набора правил не читается или содержит ошибки"""
+
+
+def pack_stamp(paths: List[str]) -> PackStamp:
+    """Размер и время изменения файлов наборов для проверки перезагрузки"""
+    stamp = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            stamp.append((path, stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            stamp.append((path, None))
+    return tuple(stamp)
+
+
+def _validate_rule(rule, path: str):
+    if not isinstance(rule, dict):
+        raise RulePackError(f'{path}: rule must be an object')
+    name = rule.get('name')
+    if not isinstance(name, str) or not name:
+        raise RulePackError(f'{path}: rule without a name')
+    if rule.get('enabled', True) is False:
+        return
+    if not isinstance(rule.get('pattern'), str):
+        raise RulePackError(f"{path}: rule '{name}' has no pattern")
+    if rule.get('level') not in RISK_LEVELS:
+        raise RulePackError(f"{path}: rule '{name}' has invalid level {rule.get('level')!r}")
+    for field in ('sources', 'keys'):
+        values = rule.get(field)
+        if values is not None and not (isinstance(values, list) and all(isinstance(v, str) for v in values)):
+            raise RulePackError(f"{path}: rule '{name}' field '{field}' must be a list of strings")
+
+
+def read_rule_packs(paths: List[str]) -> Tuple[List[Dict], str]:
+    """Читает наборы правил по порядку и возвращает (правила, хэш набора).
+
+    Файл набора - JSON {"format": 1, "name": ..., "version": ..., "rules": [...]}.
+    Правило с тем же именем в следующем наборе заменяет предыдущее (на его
+    месте), "enabled": false отключает его. Хэш считается по содержимому
+    файлов, поэтому одинаковые наборы на разных машинах дают один хэш.
+    """
+    digest = hashlib.sha256(f'rule-packs:{RULE_PACK_FORMAT}'.encode())
+    rules: Dict[str, Dict] = {}
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError as e:
+            raise RulePackError(f'Cannot read rule pack {path}: {e}') from e
+        digest.update(len(data).to_bytes(8, 'big'))
+        digest.update(data)
+
+        try:
+            pack = json.loads(data)
+        except ValueError as e:
+            raise RulePackError(f'{path}: invalid JSON: {e}') from e
+        if not isinstance(pack, dict) or not isinstance(pack.get('rules'), list):
+            raise RulePackError(f'{path}: rule pack must be an object with a "rules" list')
+        if pack.get('format', RULE_PACK_FORMAT) != RULE_PACK_FORMAT:
+            raise RulePackError(f"{path}: unsupported rule pack format {pack.get('format')!r}")
+
+        for rule in pack['rules']:
+            _validate_rule(rule, path)
+            rules[rule['name']] = rule
+        logger.debug("Rule pack %s version %s: %d rules", pack.get('name', path), pack.get('version'),
+                     len(pack['rules']))
+
+    enabled = [rule for rule in rules.values() if rule.get('enabled', True) is not False]
+    return enabled, digest.hexdigest()
+
+
+def _plan_path(cache_dir: str, ruleset_hash: str) -> str:
+    # Разбор шаблонов зависит от версии модуля re
+    return os.path.join(cache_dir, f'{ruleset_hash}-py{sys.version_info[0]}{sys.version_info[1]}.json')
+
+
+def _load_plan(cache_dir: Optional[str], ruleset_hash: str) -> Optional[Dict]:
+    if not cache_dir:
+        return None
+    try:
+        with open(_plan_path(cache_dir, ruleset_hash), 'r', encoding='utf-8') as f:
+            plan = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return plan if isinstance(plan, dict) else None
+
+
+def _save_plan(cache_dir: Optional[str], ruleset_hash: str, plan: Dict):
+    if not cache_dir:
+        return
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(plan, f, ensure_ascii=False)
+        os.replace(tmp_path, _plan_path(cache_dir, ruleset_hash))
+    except OSError as e:
+        logger.warning("Cannot write rule cache to %s: %s", cache_dir, e)
+
+
+def compile_rules(rules: List[Dict], ruleset_hash: str, cache_dir: Optional[str] = DEFAULT_CACHE_DIR) -> List[Dict]:
+    """Компилирует правила: у каждого появляется 'regex' (RuleRegex).
+
+    Результат разбора шаблонов (проверка на опасные повторы и обязательные
+    строки для фильтра) кэшируется на диске по хэшу набора, поэтому при
+    следующем запуске шаблоны только компилируются. Правило с опасным
+    шаблоном не применяется.
+    """
+    plan = _load_plan(cache_dir, ruleset_hash)
+    fresh = plan is None
+    if fresh:
+        plan = {}
+
+    compiled = []
+    for rule in rules:
+        rule = dict(rule)
+        analysis = plan.get(rule['name'])
+        try:
+            if analysis is not None and analysis.get('error'):
+                raise RulePatternError(analysis['error'])
+            regex = RuleRegex(rule['pattern'], rule.get('case_sensitive', False), analysis=analysis)
+        except RulePatternError as e:
+            plan[rule['name']] = {'error': str(e)}
+            logger.error("Risk rule '%s' disabled: %s", rule['name'], e)
+            continue
+        plan[rule['name']] = regex.analysis
+        rule['regex'] = regex
+        compiled.append(rule)
+
+    if fresh:
+        _save_plan(cache_dir, ruleset_hash, plan)
+    return compiled
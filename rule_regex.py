@@ -0,0 +1,179 @@
+import re
+from typing import Dict, List, Optional
+
+try:
+    # Python 3.11+
+    from re import _constants as sre_constants
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_constants
+    import sre_parse
+
+from .metadata_value import search_text
+
+try:
+    # google-re2: поиск за линейное время, без возвратов
+    import re2
+except ImportError:
+    re2 = None
+
+# Бюджет времени одного правила на одно значение, секунды. Проверяется между
+# кусками длинного значения, поэтому худший случай - бюджет плюс поиск в
+# одном куске (metadata_value.SCAN_CHUNK_CHARS символов).
+RULE_TIME_BUDGET = 0.1
+
+_REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT}
+if hasattr(sre_constants, 'POSSESSIVE_REPEAT'):
+    _REPEATS.add(sre_constants.POSSESSIVE_REPEAT)
+
+
+class RulePatternError(ValueError):
+    """Шаблон правила не компилируется или опасен (экспоненциальный перебор)"""
+
+
+def _subpatterns(op, av) -> List:
+    """Вложенные последовательности узла разобранного шаблона (кроме повторов)"""
+    if op is sre_constants.SUBPATTERN:
+        return [av[-1]]
+    if op is sre_constants.BRANCH:
+        return av[1]
+    if op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+        return [av[1]]
+    if op is getattr(sre_constants, 'ATOMIC_GROUP', None):
+        return [av]
+    return []
+
+
+def has_nested_quantifier(items, in_repeat: bool = False) -> bool:
+    """Есть ли неограниченный повтор внутри неограниченного повтора: (a+)+, (\\w+\\s?)*"""
+    for op, av in items:
+        if op in _REPEATS:
+            _, high, sub = av
+            unbounded = high == sre_constants.MAXREPEAT
+            if unbounded and in_repeat:
+                return True
+            if has_nested_quantifier(sub, in_repeat or unbounded):
+                return True
+        else:
+            for sub in _subpatterns(op, av):
+                if has_nested_quantifier(sub, in_repeat):
+                    return True
+    return False
+
+
+def required_literals(items) -> Optional[List[str]]:
+    """Строки, одна из которых входит в любое совпадение (None - таких нет).
+
+    Из всех обязательных наборов выбирается тот, у которого самая короткая
+    строка длиннее: такой фильтр отсекает больше текста.
+    """
+    candidates = []
+    run = []
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            run.append(chr(av))
+            continue
+        if run:
+            candidates.append([''.join(run)])
+            run = []
+        literals = None
+        if op is sre_constants.SUBPATTERN:
+            # Группа с локальными флагами ((?i:...)) сравнивается по-другому
+            if not av[1] and not av[2]:
+                literals = required_literals(av[-1])
+        elif op is sre_constants.BRANCH:
+            branches = [required_literals(branch) for branch in av[1]]
+            if all(branches):
+                literals = [literal for branch in branches for literal in branch]
+        elif op in _REPEATS and av[0] >= 1:
+            literals = required_literals(av[2])
+        if literals:
+            candidates.append(literals)
+    if run:
+        candidates.append([''.join(run)])
+    return max(candidates, key=lambda literals: min(map(len, literals)), default=None)
+
+
+def analyze_pattern(pattern: str, flags: int = 0) -> Optional[List[str]]:
+    """Проверка шаблона при загрузке; возвращает обязательные строки для фильтра"""
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except re.error as e:
+        raise RulePatternError(f'Invalid pattern {pattern!r}: {e}') from e
+    if has_nested_quantifier(parsed):
+        raise RulePatternError(f'Nested quantifier in pattern {pattern!r}')
+    return required_literals(parsed)
+
+
+def _compile_re2(pattern: str, case_sensitive: bool):
+    if re2 is None:
+        return None
+    options = re2.Options()
+    options.case_sensitive = case_sensitive
+    options.never_capture = True
+    options.log_errors = False
+    try:
+        return re2.compile(pattern, options)
+    except re2.error:
+        # Опережающие проверки и обратные ссылки re2 не поддерживает
+        return None
+
+
+class RuleRegex:
+    """Скомпилированный шаблон правила риска.
+
+    При загрузке шаблон разбирается: вложенные неограниченные повторы
+    отклоняются (RulePatternError), из остальных извлекаются обязательные
+    строки. Если установлен re2 и шаблон ему подходит, поиск идет за
+    линейное время. Иначе используется re: куски значения без обязательных
+    строк пропускаются, а на все значение у правила есть бюджет времени.
+    """
+
+    __slots__ = ('pattern', 'engine', 'regex', 'prefilter', 'time_budget', 'literals')
+
+    def __init__(self, pattern: str, case_sensitive: bool = False,
+                 time_budget: Optional[float] = RULE_TIME_BUDGET, analysis: Optional[Dict] = None):
+        """
+        Args:
+            analysis: результат прошлой проверки шаблона (свойство analysis),
+                например из кэша набора правил; тогда шаблон не разбирается
+        """
+        flags = 0 if case_sensitive else re.IGNORECASE
+        literals = analyze_pattern(pattern, flags) if analysis is None else analysis.get('literals')
+        try:
+            regex = re.compile(pattern, flags)
+        except re.error as e:
+            raise RulePatternError(f'Invalid pattern {pattern!r}: {e}') from e
+
+        self.pattern = pattern
+        self.literals = literals
+        self.regex = _compile_re2(pattern, case_sensitive)
+        if self.regex is not None:
+            self.engine = 're2'
+            self.prefilter = None
+            self.time_budget = None
+        else:
+            self.engine = 're'
+            self.regex = regex
+            self.prefilter = re.compile(
+                '|'.join(re.escape(literal) for literal in sorted(set(literals), key=len, reverse=True)),
+                flags) if literals else None
+            self.time_budget = time_budget
+
+    @property
+    def analysis(self) -> Dict:
+        """Результат проверки шаблона для кэша"""
+        return {'literals': self.literals}
+
+    def search(self, text: str) -> Optional[bool]:
+        """Есть ли совпадение в тексте; None - бюджет времени исчерпан раньше конца текста.
+
+        На re длинный текст проверяется кусками (search_text); совпадения у
+        границы куска подтверждаются с продолжением текста, так что \b и $
+        не срабатывают на границе ложно.
+        """
+        if self.engine == 're2':
+            # Линейный поиск не нужно делить на куски, а обертка re2 при
+            # каждом вызове с pos/endpos перекодирует весь текст
+            return self.regex.search(text) is not None
+        return search_text(self.regex, text, self.prefilter, self.time_budget)
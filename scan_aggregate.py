@@ -0,0 +1,91 @@
+import os
+import threading
+from typing import Dict, List, Optional
+from .archive_parser import MEMBER_SEPARATOR
+
+RISK_LEVELS = ('high', 'medium', 'low')
+
+
+def _bump(counter: Dict[str, int], key: str, delta: int):
+    value = counter.get(key, 0) + delta
+    if value:
+        counter[key] = value
+    else:
+        counter.pop(key, None)
+
+
+class ScanAggregate:
+    """Сводная статистика рисков, которая обновляется по мере готовности файлов.
+
+    Считает риски по уровню, правилу, источнику (парсеру), каталогу и
+    расширению, а также файлы с рисками каждого уровня. add() и remove()
+    стоят O(рисков файла), чтение счетчиков - O(1), поэтому GUI и экспорт не
+    перебирают все результаты заново. Адрес члена архива (a.zip!/b.docx)
+    учитывается в каталоге архива и с расширением члена.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.files = 0
+            self.total_risks = 0
+            self.by_level: Dict[str, int] = {level: 0 for level in RISK_LEVELS}
+            self.files_by_level: Dict[str, int] = {level: 0 for level in RISK_LEVELS}
+            self.by_rule: Dict[str, int] = {}
+            self.by_source: Dict[str, int] = {}
+            self.by_directory: Dict[str, int] = {}
+            self.by_extension: Dict[str, int] = {}
+
+    @classmethod
+    def from_risks(cls, results: Dict[str, List[Dict]]) -> 'ScanAggregate':
+        """Статистика по готовым результатам {путь: риски} (один проход)"""
+        aggregate = cls()
+        for file_path, risks in results.items():
+            aggregate.add(file_path, {'risks': risks})
+        return aggregate
+
+    def add(self, file_path: str, entry: Optional[Dict]):
+        """Учитывает результат файла ({'metadata', 'risks'} или None)"""
+        self._apply(file_path, entry, 1)
+
+    def remove(self, file_path: str, entry: Optional[Dict]):
+        """Вычитает ранее учтенный результат файла"""
+        self._apply(file_path, entry, -1)
+
+    def _apply(self, file_path: str, entry: Optional[Dict], sign: int):
+        risks = entry.get('risks') if entry else None
+        if not risks:
+            return
+        directory = os.path.dirname(file_path.split(MEMBER_SEPARATOR, 1)[0])
+        extension = os.path.splitext(file_path)[1].lower()
+        levels = set()
+        with self._lock:
+            self.files += sign
+            self.total_risks += sign * len(risks)
+            _bump(self.by_directory, directory, sign * len(risks))
+            _bump(self.by_extension, extension, sign * len(risks))
+            for risk in risks:
+                level = risk.get('level')
+                levels.add(level)
+                self.by_level[level] = self.by_level.get(level, 0) + sign
+                _bump(self.by_rule, risk.get('rule'), sign)
+                _bump(self.by_source, risk.get('source'), sign)
+            for level in levels:
+                self.files_by_level[level] = self.files_by_level.get(level, 0) + sign
+
+    def snapshot(self) -> Dict:
+        """Копия счетчиков (для JSON и передачи в другой поток)"""
+        with self._lock:
+            return {
+                'files': self.files,
+                'total_risks': self.total_risks,
+                'by_level': dict(self.by_level),
+                'files_by_level': dict(self.files_by_level),
+                'by_rule': dict(self.by_rule),
+                'by_source': dict(self.by_source),
+                'by_directory': dict(self.by_directory),
+                'by_extension': dict(self.by_extension),
+            }
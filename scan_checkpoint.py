@@ -0,0 +1,186 @@
+import json
+import os
+import threading
+import time
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from .metadata_value import BinaryValue
+from .scan_logging import get_logger
+from .scan_metrics import ScanMetrics
+
+logger = get_logger('scan_checkpoint')
+
+CHECKPOINT_VERSION = 1
+
+
+def _encode_value(value):
+    # Значения метаданных, которых нет в JSON, пишутся с меткой типа, чтобы
+    # продолженное сканирование вернуло те же значения, что и новое
+    if isinstance(value, BinaryValue):
+        return {'__binary__': value.data.hex()}
+    if isinstance(value, (bytes, bytearray)):
+        return {'__bytes__': bytes(value).hex()}
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, date):
+        return {'__date__': value.isoformat()}
+    return str(value)
+
+
+_DECODERS = {
+    '__binary__': lambda text: BinaryValue(bytes.fromhex(text)),
+    '__bytes__': bytes.fromhex,
+    '__datetime__': datetime.fromisoformat,
+    '__date__': date.fromisoformat,
+}
+
+
+def _decode_value(obj: Dict):
+    if len(obj) == 1:
+        tag, text = next(iter(obj.items()))
+        decoder = _DECODERS.get(tag)
+        if decoder is not None and isinstance(text, str):
+            return decoder(text)
+    return obj
+
+
+class ScanCheckpoint:
+    """Контрольная точка сканирования папки для продолжения после сбоя.
+
+    Файл - журнал JSON строк, в который только дописываются записи:
+        {"type": "scan", "folder": ..., "version": 1, "ruleset": ..., "started_at": ...}
+        {"type": "file", "path": ..., "size": ..., "mtime_ns": ..., "entry": {...} | null}
+        {"type": "state", "time": ..., "files": N}
+        {"type": "complete", "time": ...}
+    Записи о готовых файлах копятся в памяти и сбрасываются на диск одной
+    записью раз в flush_interval секунд или каждые flush_every файлов,
+    fsync выполняется только вместе с записью состояния. При сбое теряются
+    результаты не больше чем за flush_interval секунд.
+
+    Обход дерева параллельный и без фиксированного порядка, поэтому позиция
+    обхода - множество готовых файлов: при продолжении они не разбираются,
+    если не изменились размер и mtime, а их результаты берутся из файла.
+    Точка, записанная с другим набором правил (ruleset), не продолжается.
+    Двоичные значения и даты пишутся с меткой типа ({"__binary__": hex},
+    {"__datetime__": ISO}) и восстанавливаются при чтении.
+    """
+
+    def __init__(self, path: str, folder_path: str, resume: bool = False,
+                 flush_interval: float = 5.0, flush_every: int = 1000,
+                 metrics: Optional[ScanMetrics] = None, ruleset: Optional[str] = None):
+        self.path = path
+        self.folder_path = os.path.abspath(folder_path)
+        self.ruleset = ruleset
+        self.flush_interval = flush_interval
+        self.flush_every = flush_every
+        self.metrics = metrics or ScanMetrics(enabled=False)
+        self.files = 0
+        self.resumed = 0
+        self._done: Dict[str, Tuple[Tuple[int, int], Optional[Dict]]] = {}
+        self._pending: List[str] = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+        if resume and os.path.exists(path) and self._load():
+            self._file = open(path, 'a', encoding='utf-8')
+        else:
+            self._file = open(path, 'w', encoding='utf-8')
+            self._pending.append(self._line({
+                'type': 'scan',
+                'folder': self.folder_path,
+                'version': CHECKPOINT_VERSION,
+                'ruleset': ruleset,
+                'started_at': time.time(),
+            }))
+            self.flush(sync=True)
+
+    @staticmethod
+    def _line(record: Dict) -> str:
+        return json.dumps(record, ensure_ascii=False, default=_encode_value) + '\n'
+
+    def _load(self) -> bool:
+        """Читает готовые файлы из существующей контрольной точки"""
+        # Конец последней целой строки: недописанный хвост обрезается, чтобы
+        # следующая запись не приклеилась к нему
+        valid_end = offset = 0
+        with open(self.path, 'rb') as f:
+            for number, line in enumerate(f):
+                offset += len(line)
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError('unterminated line')
+                    record = json.loads(line, object_hook=_decode_value)
+                except ValueError:
+                    if number == 0:
+                        logger.warning("Checkpoint %s has a damaged header, starting over", self.path)
+                        return False
+                    # Недописанная последняя строка после сбоя
+                    logger.warning("Skipping damaged checkpoint line %d in %s", number + 1, self.path)
+                    continue
+                valid_end = offset
+                if number == 0:
+                    if (record.get('type') != 'scan' or record.get('version') != CHECKPOINT_VERSION
+                            or record.get('folder') != self.folder_path):
+                        logger.warning("Checkpoint %s belongs to another scan, starting over", self.path)
+                        return False
+                    if record.get('ruleset') != self.ruleset:
+                        logger.warning("Checkpoint %s was written with other risk rules, starting over", self.path)
+                        return False
+                elif record.get('type') == 'file':
+                    self._done[record['path']] = ((record['size'], record['mtime_ns']), record['entry'])
+        if valid_end == 0:
+            return False
+        if valid_end < offset:
+            os.truncate(self.path, valid_end)
+        self.resumed = len(self._done)
+        logger.info("Resuming scan of %s: %d files already done", self.folder_path, self.resumed)
+        return True
+
+    def get(self, file_path: str, size: int, mtime_ns: int) -> Tuple[bool, Optional[Dict]]:
+        """Результат файла из контрольной точки (тот же интерфейс, что у ResultCache)"""
+        done = self._done.get(file_path)
+        if done is None or done[0] != (size, mtime_ns):
+            return False, None
+        return True, done[1]
+
+    def put(self, file_path: str, size: int, mtime_ns: int, entry: Optional[Dict]):
+        """Отмечает файл как готовый"""
+        line = self._line({'type': 'file', 'path': file_path, 'size': size,
+                           'mtime_ns': mtime_ns, 'entry': entry})
+        with self._lock:
+            self._pending.append(line)
+            self.files += 1
+            due = (len(self._pending) >= self.flush_every
+                   or time.monotonic() - self._last_flush >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def flush(self, sync: bool = False):
+        """Сбрасывает накопленные записи; sync - с записью состояния и fsync"""
+        with self._lock:
+            if self._file is None:
+                return
+            with self.metrics.timer('checkpoint'):
+                if not sync:
+                    sync = time.monotonic() - self._last_flush >= self.flush_interval
+                if sync:
+                    self._pending.append(self._line({'type': 'state', 'time': time.time(),
+                                                     'files': self.resumed + self.files}))
+                self._file.write(''.join(self._pending))
+                self._pending = []
+                self._file.flush()
+                if sync:
+                    os.fsync(self._file.fileno())
+                self._last_flush = time.monotonic()
+
+    def close(self, complete: bool = False):
+        """Дописывает оставшиеся записи; complete - сканирование закончено"""
+        if complete:
+            with self._lock:
+                self._pending.append(self._line({'type': 'complete', 'time': time.time()}))
+        self.flush(sync=True)
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,502 @@
+"""Локальная служба сканирования с очередью заданий.
+
+Запуск:
+    python -m core.scan_daemon --port 8765             # http://127.0.0.1:8765
+    python -m core.scan_daemon --socket /tmp/metadate.sock
+
+API (JSON):
+    POST   /jobs               {"folder": "...", "extensions": [...], "exclude": [...],
+                                "sniff_unknown": true} -> задание
+    GET    /jobs               список заданий
+    GET    /jobs/<id>          состояние и прогресс задания
+    GET    /jobs/<id>/results  результаты (готовые на данный момент)
+    GET    /jobs/<id>/stream   результаты по мере появления, по строке JSON на файл
+    DELETE /jobs/<id>          отмена задания, ожидающего в очереди
+    GET    /cache              состояние общего кэша результатов
+
+По TCP запрос должен прийти на localhost (заголовок Host) и нести токен
+"Authorization: Bearer <токен>"; токен пишется в --token-file (0600).
+Unix-сокет доступен только владельцу и токена не требует.
+
+Пример: curl --unix-socket /tmp/metadate.sock -d '{"folder": "/srv/share"}' http://localhost/jobs
+        curl -H "Authorization: Bearer $(cat ~/.cache/metadate/daemon-token)" http://127.0.0.1:8765/jobs
+"""
+import argparse
+import hmac
+import itertools
+import json
+import os
+import secrets
+import socketserver
+import stat
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional
+
+from .result_cache import ResultCache
+from .scan_filter import DEFAULT_MAX_FILE_SIZE, SUPPORTED_EXTENSIONS, ScanFilter
+from .scan_logging import get_logger
+
+logger = get_logger('scan_daemon')
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+# Файл с токеном доступа к TCP API
+DEFAULT_TOKEN_FILE = os.path.join(os.path.expanduser('~'), '.cache', 'metadate', 'daemon-token')
+
+# Допустимые имена в заголовке Host (защита от DNS rebinding)
+LOOPBACK_HOSTS = ('127.0.0.1', 'localhost', '[::1]')
+
+
+def storage_root(path: str) -> str:
+    """Точка монтирования, на которой лежит путь"""
+    path = os.path.realpath(path)
+    while not os.path.ismount(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+class ScanJob:
+    """Задание на сканирование папки и накопленные результаты"""
+
+    def __init__(self, job_id: str, folder: str, root: str, options: Dict):
+        self.id = job_id
+        self.folder = folder
+        self.root = root
+        self.options = options
+        self.status = QUEUED
+        self.error: Optional[str] = None
+        self.processed = 0
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.metrics: Dict = {}
+        # Сводная статистика рисков (ScanAggregate.snapshot())
+        self.summary: Dict = {}
+        # Хэш набора правил, по которому посчитаны риски
+        self.ruleset: Optional[str] = None
+        # Файлы с рисками в порядке появления (для потоковой выдачи)
+        self.results: List[tuple] = []
+        self._changed = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    def add_result(self, file_path: str, entry: Dict):
+        with self._changed:
+            self.results.append((file_path, entry))
+            self._changed.notify_all()
+
+    def set_status(self, status: str, error: Optional[str] = None):
+        with self._changed:
+            self.status = status
+            self.error = error
+            if status == RUNNING:
+                self.started_at = time.time()
+            elif self.finished:
+                self.finished_at = time.time()
+            self._changed.notify_all()
+
+    def stream(self, timeout: float = 1.0) -> Iterator[Optional[tuple]]:
+        """Результаты по мере появления; None - результатов пока нет (для keep-alive)"""
+        position = 0
+        while True:
+            with self._changed:
+                if position >= len(self.results) and not self.finished:
+                    self._changed.wait(timeout)
+                batch = self.results[position:]
+                finished = self.finished
+            position += len(batch)
+            if batch:
+                yield from batch
+            elif not finished:
+                yield None
+            if finished and position >= len(self.results):
+                return
+
+    def to_dict(self) -> Dict:
+        return {
+            'id': self.id,
+            'folder': self.folder,
+            'root': self.root,
+            'options': self.options,
+            'status': self.status,
+            'error': self.error,
+            'processed': self.processed,
+            'files_with_risks': len(self.results),
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'metrics': self.metrics,
+            'summary': self.summary,
+            'ruleset': self.ruleset,
+        }
+
+
+class ScanDaemon:
+    """Очередь заданий сканирования над общим кэшем результатов.
+
+    Задания выполняют max_jobs потоков, у каждого свой AnalyzerEngine, а
+    кэш результатов общий: файл, уже разобранный для одной команды, не
+    разбирается повторно для другой, пока не изменится. На одну точку
+    монтирования одновременно работает не больше per_root_limit заданий,
+    чтобы несколько команд не перегружали один файловый сервер; задания
+    для других хранилищ при этом не ждут.
+    """
+
+    def __init__(self, max_jobs: int = 2, per_root_limit: int = 1, cache_entries: int = 100000,
+                 engine_factory: Optional[Callable] = None, history: int = 100,
+                 rule_packs: Optional[List[str]] = None):
+        self.max_jobs = max_jobs
+        self.per_root_limit = per_root_limit
+        self.history = history
+        self.cache = ResultCache(cache_entries)
+        self.rule_packs = rule_packs
+        self.engine_factory = engine_factory or self._default_engine
+        self.jobs: Dict[str, ScanJob] = {}
+        self._queue: deque = deque()
+        self._running_roots: Dict[str, int] = {}
+        self._ids = itertools.count(1)
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._workers: List[threading.Thread] = []
+
+    def _default_engine(self):
+        from .analyzer_engine import AnalyzerEngine
+        from .scan_metrics import ScanMetrics
+        return AnalyzerEngine(metrics=ScanMetrics(), result_cache=self.cache, rule_packs=self.rule_packs)
+
+    def start(self):
+        for index in range(self.max_jobs):
+            worker = threading.Thread(target=self._worker, name=f'scan-job-{index}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def stop(self):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        for worker in self._workers:
+            worker.join(1)
+        self._workers = []
+
+    def submit(self, folder: str, options: Optional[Dict] = None) -> ScanJob:
+        """Ставит папку в очередь сканирования"""
+        folder = os.path.abspath(folder)
+        if not os.path.isdir(folder):
+            raise ValueError(f"Not a folder: {folder}")
+        job = ScanJob(str(next(self._ids)), folder, storage_root(folder), options or {})
+        with self._condition:
+            self.jobs[job.id] = job
+            self._queue.append(job)
+            self._forget_old_jobs()
+            self._condition.notify_all()
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        """Отменяет задание, которое еще ждет в очереди"""
+        with self._condition:
+            job = self.jobs.get(job_id)
+            if job is None or job not in self._queue:
+                return False
+            self._queue.remove(job)
+        job.set_status(CANCELLED)
+        return True
+
+    def _forget_old_jobs(self):
+        finished = [job for job in self.jobs.values() if job.finished]
+        for job in finished[:max(0, len(finished) - self.history)]:
+            del self.jobs[job.id]
+
+    def _next_job(self) -> Optional[ScanJob]:
+        """Первое задание в очереди, хранилище которого не занято (вызывается под _condition)"""
+        for job in self._queue:
+            if self._running_roots.get(job.root, 0) < self.per_root_limit:
+                self._queue.remove(job)
+                self._running_roots[job.root] = self._running_roots.get(job.root, 0) + 1
+                return job
+        return None
+
+    def _worker(self):
+        engine = self.engine_factory()
+        while True:
+            with self._condition:
+                job = None
+                while not self._stopping:
+                    job = self._next_job()
+                    if job is not None:
+                        break
+                    self._condition.wait()
+                if job is None:
+                    return
+            try:
+                self._run_job(engine, job)
+            finally:
+                with self._condition:
+                    self._running_roots[job.root] -= 1
+                    self._condition.notify_all()
+
+    def _run_job(self, engine, job: ScanJob):
+        job.set_status(RUNNING)
+        options = job.options
+        scan_filter = None
+        if options.get('extensions') or options.get('exclude') or options.get('sniff_unknown'):
+            # Заданные поля заменяют только свои значения фильтра по умолчанию
+            scan_filter = ScanFilter(extensions=options.get('extensions') or SUPPORTED_EXTENSIONS,
+                                     exclude=options.get('exclude'), max_size=DEFAULT_MAX_FILE_SIZE,
+                                     sniff_unknown=bool(options.get('sniff_unknown')))
+
+        def on_progress(processed: int):
+            job.processed = processed
+            job.metrics = engine.metrics.snapshot()['counters']
+            job.summary = engine.aggregate.snapshot()
+
+        try:
+            # Измененные наборы правил подхватываются перед каждым заданием
+            engine.reload_rules()
+            job.ruleset = engine.ruleset_hash
+            engine.analyze_folder(job.folder, scan_filter, progress_callback=on_progress,
+                                  result_callback=job.add_result)
+            job.metrics = engine.metrics.snapshot()['counters']
+            job.processed = job.metrics.get('files_parsed', job.processed)
+            job.summary = engine.aggregate.snapshot()
+            job.set_status(DONE)
+        except Exception as e:
+            logger.error("Scan job %s failed: %s", job.id, e)
+            job.set_status(FAILED, str(e))
+
+
+def _json_bytes(data) -> bytes:
+    # Значения метаданных бывают datetime и bytes
+    return json.dumps(data, ensure_ascii=False, default=str).encode('utf-8')
+
+
+class DaemonRequestHandler(BaseHTTPRequestHandler):
+    """HTTP API службы (одинаковый для TCP и Unix-сокета)"""
+
+    protocol_version = 'HTTP/1.1'
+    scan_daemon: ScanDaemon = None
+    # Для TCP: токен доступа и проверка Host (для Unix-сокета не нужны)
+    token: Optional[str] = None
+    check_host: bool = False
+
+    def address_string(self) -> str:
+        # У клиента Unix-сокета нет адреса
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format: str, *args):
+        logger.debug("%s %s", self.address_string(), format % args)
+
+    def _send_json(self, data, status: int = 200, close: bool = False):
+        body = _json_bytes(data)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if close:
+            self.send_header('Connection', 'close')
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status: int, message: str):
+        # Тело отклоненного запроса может остаться непрочитанным и было бы
+        # принято за следующий запрос keep-alive, поэтому соединение закрывается
+        self._send_json({'error': message}, status, close=True)
+
+    def _authorized(self) -> bool:
+        """Проверка Host и токена; при отказе ответ уже отправлен"""
+        if self.check_host:
+            host = self.headers.get('Host', '')
+            if host.startswith('['):
+                name = host[:host.find(']') + 1]
+            else:
+                name = host.rsplit(':', 1)[0]
+            if name.lower() not in LOOPBACK_HOSTS:
+                self._error(403, 'forbidden host')
+                return False
+        if self.token is not None:
+            scheme, _, token = self.headers.get('Authorization', '').partition(' ')
+            if scheme.lower() != 'bearer' or not hmac.compare_digest(token.strip(), self.token):
+                self._error(401, 'missing or invalid token')
+                return False
+        return True
+
+    def _job(self, job_id: str) -> Optional[ScanJob]:
+        job = self.scan_daemon.jobs.get(job_id)
+        if job is None:
+            self._error(404, f'unknown job {job_id}')
+        return job
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        parts = [p for p in self.path.split('?')[0].split('/') if p]
+        if parts == ['jobs']:
+            self._send_json([job.to_dict() for job in list(self.scan_daemon.jobs.values())])
+        elif parts == ['cache']:
+            cache = self.scan_daemon.cache
+            self._send_json({'entries': len(cache), 'hits': cache.hits, 'misses': cache.misses})
+        elif len(parts) == 2 and parts[0] == 'jobs':
+            job = self._job(parts[1])
+            if job:
+                self._send_json(job.to_dict())
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'results':
+            job = self._job(parts[1])
+            if job:
+                self._send_json({'job': job.to_dict(), 'results': dict(list(job.results))})
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'stream':
+            job = self._job(parts[1])
+            if job:
+                self._stream(job)
+        else:
+            self._error(404, 'not found')
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        if self.path.rstrip('/') != '/jobs':
+            self._error(404, 'not found')
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            folder = request.pop('folder')
+            job = self.scan_daemon.submit(folder, request)
+        except (KeyError, ValueError, TypeError, AttributeError) as e:
+            self._error(400, f'bad request: {e}')
+            return
+        self._send_json(job.to_dict(), 202)
+
+    def do_DELETE(self):
+        if not self._authorized():
+            return
+        parts = [p for p in self.path.split('/') if p]
+        if len(parts) != 2 or parts[0] != 'jobs':
+            self._error(404, 'not found')
+            return
+        job = self._job(parts[1])
+        if job is None:
+            return
+        if self.scan_daemon.cancel(job.id):
+            self._send_json(job.to_dict())
+        else:
+            self._error(409, f'job {job.id} is {job.status}')
+
+    def _stream(self, job: ScanJob):
+        """NDJSON в chunked-ответе: строка на файл, в конце - итог задания"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson; charset=utf-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            for item in job.stream():
+                if item is None:
+                    # Пустая строка держит соединение и обнаруживает отключение клиента
+                    self._write_chunk(b'\n')
+                    continue
+                file_path, entry = item
+                self._write_chunk(_json_bytes({'file_path': file_path, **entry}) + b'\n')
+            self._write_chunk(_json_bytes({'job': job.to_dict()}) + b'\n')
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f'{len(data):X}\r\n'.encode('ascii') + data + b'\r\n')
+        self.wfile.flush()
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(daemon: ScanDaemon, port: Optional[int] = None, socket_path: Optional[str] = None,
+          token: Optional[str] = None):
+    """Создает сервер API; TCP слушает только 127.0.0.1
+
+    Для TCP требуется токен (без token создается случайный, он доступен как
+    server.token) и Host с именем localhost.
+    """
+    if socket_path:
+        handler = type('Handler', (DaemonRequestHandler,), {'scan_daemon': daemon})
+        if os.path.lexists(socket_path):
+            # Удаляется только оставшийся сокет, а не файл, указанный по ошибке
+            if not stat.S_ISSOCK(os.lstat(socket_path).st_mode):
+                raise ValueError(f'{socket_path} exists and is not a socket')
+            os.unlink(socket_path)
+        # Сокет сразу создается доступным только владельцу
+        umask = os.umask(0o077)
+        try:
+            server = UnixHTTPServer(socket_path, handler)
+        finally:
+            os.umask(umask)
+        server.token = None
+        return server
+    token = token or secrets.token_urlsafe(32)
+    handler = type('Handler', (DaemonRequestHandler,),
+                   {'scan_daemon': daemon, 'token': token, 'check_host': True})
+    server = ThreadingHTTPServer(('127.0.0.1', 8765 if port is None else port), handler)
+    server.token = token
+    return server
+
+
+def write_token(path: str, token: str):
+    """Записывает токен в файл, доступный только владельцу"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    if os.path.exists(path):
+        os.unlink(path)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(token + '\n')
+
+
+def main():
+    from .scan_logging import setup_logging
+
+    parser = argparse.ArgumentParser(description='Local metadata scan service')
+    parser.add_argument('--port', type=int, default=8765, help='localhost HTTP port')
+    parser.add_argument('--socket', help='listen on this Unix socket instead of TCP')
+    parser.add_argument('--jobs', type=int, default=2, help='concurrent scan jobs')
+    parser.add_argument('--per-root', type=int, default=1, help='concurrent jobs per storage root')
+    parser.add_argument('--cache-entries', type=int, default=100000)
+    parser.add_argument('--token-file', default=DEFAULT_TOKEN_FILE,
+                        help='where to write the TCP API token (a new one is generated on each start)')
+    parser.add_argument('--rule-pack', action='append', dest='rule_packs',
+                        help='risk rule pack JSON file (repeatable, replaces the built-in pack)')
+    args = parser.parse_args()
+    setup_logging()
+
+    daemon = ScanDaemon(max_jobs=args.jobs, per_root_limit=args.per_root, cache_entries=args.cache_entries,
+                        rule_packs=args.rule_packs)
+    try:
+        server = serve(daemon, args.port, args.socket)
+    except (ValueError, OSError) as e:
+        parser.error(str(e))
+    daemon.start()
+    if server.token is not None:
+        write_token(args.token_file, server.token)
+        logger.info("API token written to %s", args.token_file)
+    logger.info("Scan daemon listening on %s", args.socket or f'http://127.0.0.1:{server.server_address[1]}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        daemon.stop()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+import os
+import re
+import time
+from fnmatch import fnmatch
+from typing import Iterable, List, Optional
+
+# Расширения, которые анализатор умеет разбирать
+SUPPORTED_EXTENSIONS = {'.pdf', '.docx', '.xlsx', '.doc', '.xls', '.ppt', '.jpg', '.jpeg', '.png',
+                        '.tiff', '.tif', '.heic', '.heif', '.zip', '.tar', '.tgz', '.tar.gz'}
+
+# Составные расширения: одиночный .gz - не архив, а .tar.gz - архив
+COMPOUND_EXTENSIONS = ('.tar.gz',)
+
+# Ограничение размера файла по умолчанию
+DEFAULT_MAX_FILE_SIZE = 100 * 1024 * 1024  # 100 MB
+
+
+def file_extension(name: str) -> str:
+    """Расширение файла в нижнем регистре с учетом составных (.tar.gz)"""
+    name = name.lower()
+    for extension in COMPOUND_EXTENSIONS:
+        if name.endswith(extension):
+            return extension
+    return os.path.splitext(name)[1]
+
+
+class ScanFilter:
+    """Спецификация фильтрации файлов и каталогов при обходе.
+
+    Проверяется прямо во время обхода: отсеченные каталоги не читаются вовсе,
+    а stat() для файла выполняется только если заданы ограничения по размеру
+    или времени изменения и файл прошел проверки по имени.
+    Glob-шаблоны сравниваются и с именем, и с путем относительно корня
+    (разделитель '/'), регулярные выражения ищутся в относительном пути.
+    """
+
+    def __init__(self,
+                 include: Optional[List[str]] = None,
+                 exclude: Optional[List[str]] = None,
+                 include_regex: Optional[List[str]] = None,
+                 exclude_regex: Optional[List[str]] = None,
+                 extensions: Optional[Iterable[str]] = None,
+                 min_size: Optional[int] = None,
+                 max_size: Optional[int] = None,
+                 modified_within_days: Optional[float] = None,
+                 prune_dirs: Optional[List[str]] = None,
+                 sniff_unknown: bool = False):
+        """
+        Args:
+            include: glob-шаблоны файлов; если заданы, файл должен подойти хотя бы под один
+            exclude: glob-шаблоны исключаемых файлов
+            include_regex: регулярные выражения для включения файлов
+            exclude_regex: регулярные выражения для исключения файлов
+            extensions: допустимые расширения (в нижнем регистре, с точкой), None - любые
+            min_size: минимальный размер файла в байтах
+            max_size: максимальный размер файла в байтах
+            modified_within_days: только файлы, измененные за последние N дней
+            prune_dirs: glob-шаблоны каталогов, в которые обход не заходит (node_modules, .git, ...)
+            sniff_unknown: файлы без расширения или с нераспознанным расширением (report.dat)
+                не отсеиваются по extensions, а передаются на определение типа по содержимому
+        """
+        self.include = list(include or [])
+        self.exclude = list(exclude or [])
+        self.include_regex = [re.compile(p) for p in include_regex or []]
+        self.exclude_regex = [re.compile(p) for p in exclude_regex or []]
+        self.extensions = {e.lower() for e in extensions} if extensions is not None else None
+        self.min_size = min_size
+        self.max_size = max_size
+        self.modified_within_days = modified_within_days
+        self.prune_dirs = list(prune_dirs or [])
+        self.sniff_unknown = sniff_unknown
+
+        # Граница по времени фиксируется при создании фильтра, чтобы весь обход
+        # использовал одно и то же окно
+        self.min_mtime = None
+        if modified_within_days is not None:
+            self.min_mtime = time.time() - modified_within_days * 86400
+
+    @classmethod
+    def default(cls, sniff_unknown: bool = False) -> 'ScanFilter':
+        """Фильтр по умолчанию: поддерживаемые расширения и файлы до 100 MB"""
+        return cls(extensions=SUPPORTED_EXTENSIONS, max_size=DEFAULT_MAX_FILE_SIZE,
+                   sniff_unknown=sniff_unknown)
+
+    @property
+    def needs_stat(self) -> bool:
+        """Требуется ли stat() для принятия решения по файлу"""
+        return (self.min_size is not None or self.max_size is not None
+                or self.min_mtime is not None)
+
+    def should_descend(self, name: str, rel_path: str) -> bool:
+        """Нужно ли заходить в каталог"""
+        rel_path = rel_path.replace(os.sep, '/')
+        for pattern in self.prune_dirs:
+            if fnmatch(name, pattern) or fnmatch(rel_path, pattern):
+                return False
+        return True
+
+    def accepts_name(self, name: str, rel_path: str) -> bool:
+        """Проверки, не требующие обращения к ФС"""
+        rel_path = rel_path.replace(os.sep, '/')
+
+        if self.extensions is not None:
+            extension = file_extension(name)
+            plain_extension = os.path.splitext(name)[1].lower()
+            if extension not in self.extensions and plain_extension not in self.extensions:
+                # Нераспознанное расширение не говорит о содержимом: тип определит TypeDetector
+                unknown = (extension not in SUPPORTED_EXTENSIONS
+                           and plain_extension not in SUPPORTED_EXTENSIONS)
+                if not (self.sniff_unknown and unknown):
+                    return False
+
+        if self.include or self.include_regex:
+            included = any(fnmatch(name, p) or fnmatch(rel_path, p) for p in self.include)
+            if not included:
+                included = any(r.search(rel_path) for r in self.include_regex)
+            if not included:
+                return False
+
+        for pattern in self.exclude:
+            if fnmatch(name, pattern) or fnmatch(rel_path, pattern):
+                return False
+        for regex in self.exclude_regex:
+            if regex.search(rel_path):
+                return False
+
+        return True
+
+    def accepts_stat(self, stat: os.stat_result) -> bool:
+        """Проверки по размеру и времени изменения"""
+        if self.min_size is not None and stat.st_size < self.min_size:
+            return False
+        if self.max_size is not None and stat.st_size > self.max_size:
+            return False
+        if self.min_mtime is not None and stat.st_mtime < self.min_mtime:
+            return False
+        return True
+
+    def accepts(self, entry: os.DirEntry, rel_path: str, follow_symlinks: bool = False) -> bool:
+        """Полная проверка файла во время обхода"""
+        if not self.accepts_name(entry.name, rel_path):
+            return False
+        if self.needs_stat:
+            try:
+                stat = entry.stat(follow_symlinks=follow_symlinks)
+            except OSError:
+                return False
+            return self.accepts_stat(stat)
+        return True
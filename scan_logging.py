@@ -0,0 +1,180 @@
+import contextvars
+import itertools
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+# Корневой логгер анализатора
+LOGGER_NAME = 'metadate'
+
+# Файл, который обрабатывается в текущем потоке/контексте
+_current_file: contextvars.ContextVar = contextvars.ContextVar('metadate_current_file', default=None)
+# Сканирование, к которому относятся записи журнала в текущем контексте
+_current_scan: contextvars.ContextVar = contextvars.ContextVar('metadate_current_scan', default=None)
+_scan_ids = itertools.count(1)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_setup_lock = threading.Lock()
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Логгер модуля анализатора (metadate.<name>)"""
+    return logging.getLogger(f'{LOGGER_NAME}.{name}')
+
+
+@contextmanager
+def file_context(file_path: str):
+    """Привязывает записи журнала внутри блока к файлу"""
+    token = _current_file.set(file_path)
+    try:
+        yield
+    finally:
+        _current_file.reset(token)
+
+
+def _record_file_path(record: logging.LogRecord) -> Optional[str]:
+    return getattr(record, 'file_path', None) or _current_file.get()
+
+
+class RateLimitFilter(logging.Filter):
+    """Ограничивает повторы одного и того же сообщения.
+
+    Записи группируются по логгеру, уровню и шаблону сообщения (до
+    подстановки аргументов), поэтому тысячи "Error with exifread: ..." с
+    разными файлами считаются повтором. В каждом окне interval пропускается
+    не больше burst записей, количество подавленных добавляется к
+    следующей пропущенной записи.
+    """
+
+    def __init__(self, burst: int = 10, interval: float = 60.0):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self._windows: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (record.name, record.levelno, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window else 0
+                self._windows[key] = [now, 1, 0]
+            elif window[1] < self.burst:
+                window[1] += 1
+                suppressed = 0
+            else:
+                window[2] += 1
+                return False
+        if suppressed:
+            record.msg = f'{record.msg} [{suppressed} similar messages suppressed]'
+        return True
+
+
+class ScanErrorCollector(logging.Handler):
+    """Собирает предупреждения и ошибки, относящиеся к файлам, в результат сканирования
+
+    С scan_id принимаются только записи из контекста этого сканирования,
+    поэтому одновременные сканирования (задания службы, наблюдатель и GUI)
+    не получают ошибки друг друга.
+    """
+
+    def __init__(self, level: int = logging.WARNING, max_records: int = 100000,
+                 scan_id: Optional[int] = None):
+        super().__init__(level)
+        self.max_records = max_records
+        self.scan_id = scan_id
+        self.records: List[Dict] = []
+        self.dropped = 0
+
+    def emit(self, record: logging.LogRecord):
+        if self.scan_id is not None and _current_scan.get() != self.scan_id:
+            return
+        file_path = _record_file_path(record)
+        if file_path is None:
+            return
+        if len(self.records) >= self.max_records:
+            self.dropped += 1
+            return
+        self.records.append(error_record(file_path, record.levelname, record.name, record.getMessage()))
+
+    def by_file(self) -> Dict[str, List[Dict]]:
+        """Записи, сгруппированные по файлам"""
+        grouped: Dict[str, List[Dict]] = {}
+        for record in self.records:
+            grouped.setdefault(record['file_path'], []).append(record)
+        return grouped
+
+
+def error_record(file_path: str, level: str, source: str, message: str) -> Dict:
+    """Запись об ошибке обработки файла в формате результата сканирования"""
+    return {
+        'file_path': file_path,
+        'level': level,
+        'source': source,
+        'message': message,
+    }
+
+
+@contextmanager
+def collect_errors(level: int = logging.WARNING):
+    """Подключает ScanErrorCollector к логгеру анализатора на время блока
+
+    Блок получает свой идентификатор сканирования в contextvars; потоки,
+    которые пишут в журнал от имени сканирования, должны выполняться в
+    копии контекста (contextvars.copy_context().run).
+    """
+    collector = ScanErrorCollector(level, scan_id=next(_scan_ids))
+    token = _current_scan.set(collector.scan_id)
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.addHandler(collector)
+    try:
+        yield collector
+    finally:
+        logger.removeHandler(collector)
+        _current_scan.reset(token)
+
+
+def setup_logging(level: int = logging.INFO, handler: Optional[logging.Handler] = None,
+                  burst: int = 10, interval: float = 60.0):
+    """Настраивает неблокирующий вывод журнала анализатора
+
+    Записи попадают в очередь, а форматирование и запись в консоль (или в
+    переданный handler) выполняются отдельным потоком QueueListener.
+    Повторы ограничиваются RateLimitFilter до постановки в очередь, пока
+    шаблон сообщения еще не подставлен. Повторный вызов ничего не делает.
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+
+        if handler is None:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter(
+                '%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+        log_queue = queue.SimpleQueue()
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        queue_handler.addFilter(RateLimitFilter(burst, interval))
+        logger = logging.getLogger(LOGGER_NAME)
+        logger.setLevel(level)
+        logger.addHandler(queue_handler)
+        logger.propagate = False
+
+        _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+        _listener.start()
+
+
+def shutdown_logging():
+    """Останавливает поток вывода журнала, дописав оставшиеся записи"""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
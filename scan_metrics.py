@@ -0,0 +1,198 @@
+import json
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Optional
+from .scan_logging import get_logger
+
+logger = get_logger('scan_metrics')
+
+# Границы корзин гистограммы задержек, в миллисекундах
+LATENCY_BUCKETS_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500,
+                      1000, 2500, 5000, 10000, 30000, 60000]
+
+
+class LatencyHistogram:
+    """Гистограмма задержек с фиксированными корзинами"""
+
+    __slots__ = ('counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, seconds: float):
+        ms = seconds * 1000
+        self.counts[bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if self.min is None or ms < self.min:
+            self.min = ms
+        if self.max is None or ms > self.max:
+            self.max = ms
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Оценка квантиля по верхней границе корзины"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= target:
+                return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else self.max
+        return self.max
+
+    def to_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'total_ms': round(self.total, 3),
+            'mean_ms': round(self.total / self.count, 3) if self.count else None,
+            'min_ms': round(self.min, 3) if self.min is not None else None,
+            'max_ms': round(self.max, 3) if self.max is not None else None,
+            'p50_ms': self.quantile(0.5),
+            'p95_ms': self.quantile(0.95),
+            'p99_ms': self.quantile(0.99),
+            'buckets_ms': {str(b): c for b, c in zip(LATENCY_BUCKETS_MS + ['inf'], self.counts) if c},
+        }
+
+
+class _NullTimer:
+    """Таймер-заглушка для выключенных метрик"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _StageTimer:
+    __slots__ = ('metrics', 'stage', 'start')
+
+    def __init__(self, metrics: 'ScanMetrics', stage: str):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class ScanMetrics:
+    """Счетчики и гистограммы задержек по стадиям сканирования.
+
+    Стадии: enumerate, stat, sniff, readahead, parse:<класс парсера>, risk, export.
+    Выключенный экземпляр возвращает общий таймер-заглушку и не берет
+    блокировку, поэтому накладные расходы сводятся к проверке флага.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Сбрасывает все значения (в начале нового сканирования)"""
+        with self._lock:
+            self.counters: Dict[str, int] = {}
+            self.histograms: Dict[str, LatencyHistogram] = {}
+            self.started_at = None
+            self.finished_at = None
+
+    def start_scan(self):
+        if self.enabled:
+            self.reset()
+            self.started_at = time.time()
+
+    def finish_scan(self):
+        if self.enabled:
+            self.finished_at = time.time()
+
+    def timer(self, stage: str):
+        """Контекстный менеджер, измеряющий длительность стадии"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _StageTimer(self, stage)
+
+    def observe(self, stage: str, seconds: float):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = LatencyHistogram()
+            histogram.observe(seconds)
+
+    def incr(self, name: str, value: int = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def files_per_second(self) -> float:
+        elapsed = self.elapsed()
+        return self.counters.get('files_parsed', 0) / elapsed if elapsed > 0 else 0.0
+
+    def snapshot(self) -> Dict:
+        """Текущее состояние метрик в виде словаря"""
+        with self._lock:
+            return {
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                'elapsed_s': round(self.elapsed(), 3),
+                'files_per_second': round(self.files_per_second(), 2),
+                'counters': dict(self.counters),
+                'stages': {stage: h.to_dict() for stage, h in sorted(self.histograms.items())},
+            }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def dump(self, file_path: str) -> bool:
+        """Сохраняет метрики в JSON файл"""
+        try:
+            with open(file_path, 'w', encoding='utf-8') as f:
+                f.write(self.to_json())
+            return True
+        except Exception as e:
+            logger.error("Error writing metrics to %s: %s", file_path, e)
+            return False
+
+    def summary(self) -> str:
+        """Краткая строка для строки состояния GUI"""
+        if not self.enabled:
+            return ''
+        files = self.counters.get('files_parsed', 0)
+        mb_scanned = self.counters.get('bytes_parsed', 0) / (1024 * 1024)
+        parts = [f"Files: {files} ({self.files_per_second():.1f}/s)", f"Scanned: {mb_scanned:.1f} MB"]
+        with self._lock:
+            parse_ms = sum(h.total for s, h in self.histograms.items() if s.startswith('parse:'))
+            risk = self.histograms.get('risk')
+            sniff = self.histograms.get('sniff')
+        parts.append(f"Parse: {parse_ms / 1000:.1f} s")
+        if sniff:
+            parts.append(f"Sniff: {sniff.total / 1000:.1f} s")
+        if risk:
+            parts.append(f"Risk: {risk.total / 1000:.1f} s")
+        errors = self.counters.get('parse_errors', 0)
+        if errors:
+            parts.append(f"Errors: {errors}")
+        return ' | '.join(parts)
@@ -0,0 +1,138 @@
+"""Профилирование одного сканирования папки.
+
+Запуск: python -m core.scan_profiler FOLDER --out DIR
+В DIR сохраняются:
+    scan.pstats     - результат cProfile (snakeviz, pstats)
+    scan.folded     - свернутые стеки сэмплирующего профилировщика
+                      (flamegraph.pl, speedscope, inferno)
+    top_files.txt   - файлы, на которые ушло больше всего времени
+"""
+import argparse
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class ScanProfiler:
+    """cProfile и сэмплирование стеков потока, выполняющего сканирование.
+
+    cProfile дает точные счетчики вызовов, а сэмплы стеков - готовые для
+    flamegraph свернутые стеки. Дополнительно накапливается время по файлам,
+    чтобы сразу видеть конкретные файлы, замедляющие сканирование.
+    """
+
+    def __init__(self, output_dir: str, sample_interval: float = 0.005, top_files: int = 50):
+        self.output_dir = output_dir
+        self.sample_interval = sample_interval
+        self.top_files = top_files
+        self.file_times: Dict[str, float] = {}
+        self.stack_counts: Dict[str, int] = {}
+        self._profile = cProfile.Profile()
+        self._stop = threading.Event()
+        self._sampler = None
+        self._target_thread = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        self.write()
+        return False
+
+    def start(self):
+        """Запускает профилирование текущего потока"""
+        self._target_thread = threading.get_ident()
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._sample_loop, name='scan-profiler', daemon=True)
+        self._sampler.start()
+        self._profile.enable()
+
+    def stop(self):
+        self._profile.disable()
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+            self._sampler = None
+
+    def record_file(self, file_path: str, seconds: float):
+        """Добавляет время, затраченное на файл"""
+        with self._lock:
+            self.file_times[file_path] = self.file_times.get(file_path, 0.0) + seconds
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.sample_interval):
+            frame = sys._current_frames().get(self._target_thread)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                frame = frame.f_back
+            key = ';'.join(reversed(stack))
+            self.stack_counts[key] = self.stack_counts.get(key, 0) + 1
+
+    def top(self, limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Файлы, отсортированные по затраченному времени"""
+        with self._lock:
+            items = sorted(self.file_times.items(), key=lambda item: item[1], reverse=True)
+        return items[:limit or self.top_files]
+
+    def write(self) -> Dict[str, str]:
+        """Сохраняет результаты профилирования в output_dir"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        paths = {
+            'pstats': os.path.join(self.output_dir, 'scan.pstats'),
+            'folded': os.path.join(self.output_dir, 'scan.folded'),
+            'top_files': os.path.join(self.output_dir, 'top_files.txt'),
+        }
+        self._profile.dump_stats(paths['pstats'])
+
+        with open(paths['folded'], 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self.stack_counts.items()):
+                f.write(f'{stack} {count}\n')
+
+        with open(paths['top_files'], 'w', encoding='utf-8') as f:
+            for file_path, seconds in self.top():
+                f.write(f'{seconds * 1000:10.1f} ms  {file_path}\n')
+
+        return paths
+
+    def print_stats(self, limit: int = 25):
+        """Печатает самые дорогие функции по cumulative time"""
+        pstats.Stats(self._profile).sort_stats('cumulative').print_stats(limit)
+
+
+def main():
+    from .analyzer_engine import AnalyzerEngine
+    from .scan_logging import setup_logging
+
+    parser = argparse.ArgumentParser(description='Profile a single folder scan')
+    parser.add_argument('folder')
+    parser.add_argument('--out', default='scan_profile', help='output directory')
+    parser.add_argument('--interval', type=float, default=0.005, help='sampling interval, seconds')
+    args = parser.parse_args()
+    setup_logging()
+
+    engine = AnalyzerEngine(profile_dir=args.out, profile_interval=args.interval)
+    start = time.perf_counter()
+    results = engine.analyze_folder(args.folder)
+    elapsed = time.perf_counter() - start
+
+    print(f"Scanned {args.folder} in {elapsed:.2f} s, files with risks: {len(results)}")
+    print(f"Profile written to {os.path.abspath(args.out)}")
+    if engine.last_profiler:
+        print("Slowest files:")
+        for file_path, seconds in engine.last_profiler.top(10):
+            print(f'{seconds * 1000:10.1f} ms  {file_path}')
+
+
+if __name__ == '__main__':
+    main()
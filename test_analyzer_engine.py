@@ -0,0 +1,87 @@
+import struct
+import threading
+import zlib
+
+from core.analyzer_engine import AnalyzerEngine
+from core.base_parser import BaseParser
+from core.result_cache import ResultCache
+from core.scan_filter import ScanFilter
+from core.type_detector import HEADER_SIZE
+
+
+def _png_with_author(path, author: str):
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    ihdr = struct.pack('>IIBBBBB', 1, 1, 8, 0, 0, 0, 0)
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', ihdr) + chunk(b'tEXt', b'Author\x00' + author.encode())
+                + chunk(b'IDAT', zlib.compress(b'\x00\x00')) + chunk(b'IEND', b''))
+
+
+def _engine(**kwargs):
+    # Разбор в текущем процессе: тестам не нужны рабочие процессы
+    return AnalyzerEngine(parse_timeout=None, memory_limit_mb=None, **kwargs)
+
+
+def test_unknown_extension_is_skipped_by_default(tmp_path):
+    _png_with_author(tmp_path / 'report.dat', 'alice')
+
+    assert _engine().analyze_folder(str(tmp_path)) == {}
+
+
+def test_unknown_extension_is_sniffed(tmp_path):
+    _png_with_author(tmp_path / 'report.dat', 'alice')
+    _png_with_author(tmp_path / 'noextension', 'bob')
+    (tmp_path / 'notes.txt').write_text('plain text, nothing to parse')
+    engine = _engine()
+
+    results = engine.analyze_folder(str(tmp_path), ScanFilter.default(sniff_unknown=True))
+
+    assert set(results) == {str(tmp_path / 'report.dat'), str(tmp_path / 'noextension')}
+    # Содержимое без парсера не отправляется на разбор
+    assert engine._sniff(str(tmp_path / 'notes.txt')) is None
+
+
+def test_sniff_unknown_keeps_known_extensions_filtered(tmp_path):
+    # .docx распознается, поэтому фильтр extensions={'.png'} его по-прежнему отсекает
+    _png_with_author(tmp_path / 'image.docx', 'alice')
+    scan_filter = ScanFilter(extensions={'.png'}, sniff_unknown=True)
+
+    assert not scan_filter.accepts_name('image.docx', 'image.docx')
+    assert scan_filter.accepts_name('report.dat', 'report.dat')
+    assert scan_filter.accepts_name('README', 'README')
+
+
+def test_header_is_served_from_memory(tmp_path):
+    path = tmp_path / 'data.bin'
+    content = bytes(range(256)) * ((HEADER_SIZE * 3) // 256)
+    path.write_bytes(content)
+    # Подмена заголовка показывает, что эти байты не читаются с диска
+    header = b'\xff' * HEADER_SIZE
+    expected = header + content[HEADER_SIZE:]
+
+    with BaseParser._open(str(path), header) as f:
+        assert f.read(10) == expected[:10]
+        assert f.read() == expected[10:]
+        f.seek(HEADER_SIZE - 5)
+        assert f.read(10) == expected[HEADER_SIZE - 5:HEADER_SIZE + 5]
+        f.seek(-3, 2)
+        assert f.read() == expected[-3:]
+        assert f.tell() == len(expected)
+
+
+def test_async_pipeline_stores_cache_hits_in_loop_thread(tmp_path):
+    for index in range(20):
+        _png_with_author(tmp_path / f'image{index}.png', f'user{index}')
+    cache = ResultCache(100)
+    _engine(result_cache=cache).analyze_folder(str(tmp_path))
+    engine = _engine(result_cache=cache, async_pipeline=True)
+    threads = set()
+
+    results = engine.analyze_folder(str(tmp_path), result_callback=lambda path, entry: threads.add(
+        threading.current_thread()))
+
+    assert len(results) == 20
+    assert engine.aggregate.files == 20
+    assert threads == {threading.current_thread()}
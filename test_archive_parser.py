@@ -0,0 +1,31 @@
+import io
+import struct
+import tarfile
+import zlib
+
+from core.archive_parser import ArchiveParser
+
+
+def _png_with_author(author: str) -> bytes:
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    ihdr = struct.pack('>IIBBBBB', 1, 1, 8, 0, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', ihdr) + chunk(b'tEXt', b'Author\x00' + author.encode())
+            + chunk(b'IDAT', zlib.compress(b'\x00\x00')) + chunk(b'IEND', b''))
+
+
+def test_tar_member_with_out_of_range_mtime(tmp_path):
+    path = tmp_path / 'archive.tar'
+    data = _png_with_author('alice')
+    with tarfile.open(path, 'w', format=tarfile.PAX_FORMAT) as archive:
+        info = tarfile.TarInfo('images/photo.png')
+        info.size = len(data)
+        info.mtime = 10 ** 13
+        archive.addfile(info, io.BytesIO(data))
+
+    metadata = ArchiveParser().extract_metadata(str(path))
+
+    assert any(item['member'] == 'images/photo.png' and item['key'] == 'PNG_Author'
+               and str(item['value']) == 'alice' for item in metadata)
+    assert not any(item['key'] == 'File Modified' for item in metadata)
@@ -0,0 +1,16 @@
+from core.analyzer_engine import AnalyzerEngine
+from core.folder_watcher import FolderWatcher
+
+
+def test_walker_excludes_apply_to_file_events(tmp_path):
+    (tmp_path / 'drafts').mkdir()
+    for name in ('report.docx', '~$report.docx', 'drafts/report.docx', 'notes.txt'):
+        (tmp_path / name).write_bytes(b'PK\x03\x04')
+    engine = AnalyzerEngine(parse_timeout=None, memory_limit_mb=None, exclude=['~$*', 'drafts/*'])
+    watcher = FolderWatcher(engine, str(tmp_path))
+
+    assert watcher._accepts(str(tmp_path / 'report.docx'))
+    # Файлы, которые пропускает полное сканирование, не попадают в индекс и по событиям
+    assert not watcher._accepts(str(tmp_path / '~$report.docx'))
+    assert not watcher._accepts(str(tmp_path / 'drafts' / 'report.docx'))
+    assert not watcher._accepts(str(tmp_path / 'notes.txt'))
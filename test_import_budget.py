@@ -0,0 +1,17 @@
+import pytest
+
+from core.import_budget import DEFAULT_BUDGET_MS, check_import_budget, measure_import
+
+
+@pytest.mark.parametrize('module', ['core.analyzer_engine', 'core.scan_daemon', 'core.folder_watcher'])
+def test_import_loads_no_heavy_modules(module):
+    result = measure_import(module, runs=1)
+
+    assert result['heavy'] == []
+
+
+def test_import_budget():
+    result = measure_import()
+
+    assert result['ms'] <= DEFAULT_BUDGET_MS, result
+    assert check_import_budget() == []
@@ -0,0 +1,39 @@
+import re
+from metadata_value import MAX_SCAN_CHARS, SCAN_CHUNK_CHARS, SCAN_OVERLAP_CHARS, search_text
+
+
+def _at_chunk_boundary(fragment: str, tail: str) -> str:
+    # fragment кончается ровно на границе первого куска поиска
+    head = ' ' * (MAX_SCAN_CHARS - len(fragment))
+    return head + fragment + tail + ' ' * (SCAN_CHUNK_CHARS * 2)
+
+
+def test_word_boundary_at_chunk_end_is_not_a_match():
+    regex = re.compile(r'\bfoo\b')
+    text = _at_chunk_boundary('foo', 'bar')
+    assert regex.search(text) is None
+    assert search_text(regex, text) is False
+
+
+def test_match_straddling_chunk_end_is_found():
+    regex = re.compile(r'\bfoo\w*\b')
+    text = _at_chunk_boundary('foo', 'bar baz')
+    assert search_text(regex, text) is True
+
+
+def test_email_truncated_at_later_chunk_end():
+    regex = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+    end = MAX_SCAN_CHARS - SCAN_OVERLAP_CHARS + SCAN_CHUNK_CHARS
+    fragment = 'user@example.co'
+    text = ' ' * (end - len(fragment)) + fragment + 'm1' + ' ' * SCAN_CHUNK_CHARS
+    assert regex.search(text) is None
+    assert search_text(regex, text) is False
+    text = ' ' * (end - len(fragment)) + fragment + 'm ' + ' ' * SCAN_CHUNK_CHARS
+    assert search_text(regex, text) is True
+
+
+def test_dollar_before_chunk_end_newline():
+    regex = re.compile(r'foo$')
+    text = ' ' * (MAX_SCAN_CHARS - 4) + 'foo\nbar' + ' ' * SCAN_CHUNK_CHARS
+    assert regex.search(text) is None
+    assert search_text(regex, text) is False
@@ -0,0 +1,164 @@
+import http.client
+import json
+import os
+import stat
+import struct
+import threading
+import time
+import zlib
+
+import pytest
+
+from core.analyzer_engine import AnalyzerEngine
+from core.scan_daemon import ScanDaemon, serve
+
+
+def _png_with_author(path, author: str):
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    ihdr = struct.pack('>IIBBBBB', 1, 1, 8, 0, 0, 0, 0)
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', ihdr) + chunk(b'tEXt', b'Author\x00' + author.encode())
+                + chunk(b'IDAT', zlib.compress(b'\x00\x00')) + chunk(b'IEND', b''))
+
+
+@pytest.fixture
+def folder(tmp_path):
+    for index in range(3):
+        _png_with_author(tmp_path / f'image{index}.png', f'user{index}')
+    return str(tmp_path)
+
+
+@pytest.fixture
+def api():
+    daemon = ScanDaemon(max_jobs=1)
+    # Разбор в текущем процессе: тестам не нужны рабочие процессы
+    daemon.engine_factory = lambda: AnalyzerEngine(parse_timeout=None, memory_limit_mb=None,
+                                                   result_cache=daemon.cache)
+    server = serve(daemon, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield daemon, server
+    server.shutdown()
+    server.server_close()
+    daemon.stop()
+
+
+def _request(server, method, path, body=None, host=None, token=True, connection=None):
+    port = server.server_address[1]
+    conn = connection or http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    data = json.dumps(body).encode() if body is not None else b''
+    conn.putrequest(method, path, skip_host=True)
+    conn.putheader('Host', host or f'127.0.0.1:{port}')
+    if token:
+        conn.putheader('Authorization', f'Bearer {server.token}')
+    conn.putheader('Content-Length', str(len(data)))
+    conn.endheaders(data)
+    response = conn.getresponse()
+    payload = response.read()
+    return response.status, payload
+
+
+def _json(result):
+    status, payload = result
+    return status, json.loads(payload)
+
+
+def _wait(server, job_id):
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        status, job = _json(_request(server, 'GET', f'/jobs/{job_id}'))
+        if job['status'] in ('done', 'failed', 'cancelled'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f'job {job_id} did not finish')
+
+
+def test_token_is_required(api):
+    _, server = api
+    assert _request(server, 'GET', '/jobs', token=False)[0] == 401
+    status, _ = _request(server, 'GET', '/jobs')
+    assert status == 200
+
+
+def test_host_must_be_loopback(api):
+    _, server = api
+    port = server.server_address[1]
+    assert _request(server, 'GET', '/jobs', host=f'evil.example:{port}')[0] == 403
+    for host in (f'localhost:{port}', f'[::1]:{port}', '127.0.0.1'):
+        assert _request(server, 'GET', '/jobs', host=host)[0] == 200
+
+
+def test_rejected_body_is_not_read_as_next_request(api):
+    _, server = api
+    conn = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=10)
+    status, _ = _request(server, 'POST', '/jobs', {'folder': '/'}, token=False, connection=conn)
+    assert status == 401
+    status, jobs = _json(_request(server, 'GET', '/jobs', connection=conn))
+    assert status == 200 and jobs == []
+
+
+def test_submit_poll_results_and_stream(api, folder):
+    daemon, server = api
+    daemon.start()
+    status, job = _json(_request(server, 'POST', '/jobs', {'folder': folder}))
+    assert status == 202
+    job = _wait(server, job['id'])
+    assert job['status'] == 'done'
+    assert job['files_with_risks'] == 3
+    assert job['summary']['files'] == 3
+
+    _, results = _json(_request(server, 'GET', f"/jobs/{job['id']}/results"))
+    assert sorted(os.path.basename(path) for path in results['results']) == ['image0.png', 'image1.png',
+                                                                             'image2.png']
+
+    status, payload = _request(server, 'GET', f"/jobs/{job['id']}/stream")
+    lines = [json.loads(line) for line in payload.splitlines() if line.strip()]
+    assert status == 200
+    assert len([line for line in lines if 'file_path' in line]) == 3
+    assert lines[-1]['job']['status'] == 'done'
+
+    # Завершенное задание не отменяется
+    assert _request(server, 'DELETE', f"/jobs/{job['id']}")[0] == 409
+
+
+def test_cancel_queued_job(api, folder):
+    daemon, server = api
+    # Рабочие потоки не запущены, задание остается в очереди
+    _, job = _json(_request(server, 'POST', '/jobs', {'folder': folder}))
+    status, cancelled = _json(_request(server, 'DELETE', f"/jobs/{job['id']}"))
+    assert status == 200 and cancelled['status'] == 'cancelled'
+    assert _request(server, 'DELETE', '/jobs/999')[0] == 404
+
+
+def test_cache_counters(api, folder):
+    daemon, server = api
+    daemon.start()
+    for _ in range(2):
+        _, job = _json(_request(server, 'POST', '/jobs', {'folder': folder}))
+        assert _wait(server, job['id'])['status'] == 'done'
+    _, cache = _json(_request(server, 'GET', '/cache'))
+    assert cache['entries'] == 3
+    assert cache['misses'] == 3
+    assert cache['hits'] == 3
+
+
+def test_unix_socket_is_private(tmp_path):
+    path = str(tmp_path / 'daemon.sock')
+    server = serve(ScanDaemon(), socket_path=path)
+    try:
+        assert stat.S_ISSOCK(os.lstat(path).st_mode)
+        assert stat.S_IMODE(os.lstat(path).st_mode) & 0o077 == 0
+    finally:
+        server.server_close()
+    # Оставшийся сокет заменяется
+    serve(ScanDaemon(), socket_path=path).server_close()
+
+
+def test_unix_socket_path_must_not_be_a_regular_file(tmp_path):
+    path = tmp_path / 'notes.txt'
+    path.write_text('keep me')
+    with pytest.raises(ValueError):
+        serve(ScanDaemon(), socket_path=str(path))
+    assert path.read_text() == 'keep me'
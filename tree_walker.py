@@ -0,0 +1,171 @@
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
+from typing import Iterator, List, Optional
+from .scan_filter import ScanFilter
+from .scan_logging import get_logger
+
+logger = get_logger('tree_walker')
+
+# Маркер окончания обхода в очереди результатов
+_DONE = object()
+
+
+class ParallelTreeWalker:
+    """Параллельный обход дерева каталогов.
+
+    Каждый каталог читается отдельной задачей в пуле потоков, найденные файлы
+    сразу попадают в очередь и отдаются вызывающему коду, не дожидаясь конца
+    обхода. На сетевых ФС (NFS, SMB) задержка readdir перекрывается между
+    потоками.
+    """
+
+    def __init__(self, max_workers: int = 8, max_depth: Optional[int] = None,
+                 follow_symlinks: bool = False, exclude: Optional[List[str]] = None,
+                 queue_size: int = 10000):
+        """
+        Args:
+            max_workers: количество потоков, одновременно читающих каталоги
+            max_depth: максимальная глубина (0 - только корневой каталог), None - без ограничений
+            follow_symlinks: заходить ли в каталоги по символическим ссылкам (ссылки на файлы
+                учитываются всегда, как в os.walk)
+            exclude: glob-шаблоны исключений, сравниваются с именем и с путем относительно корня
+            queue_size: размер очереди найденных файлов (ограничивает память при медленном потребителе)
+        """
+        self.max_workers = max(1, max_workers)
+        self.max_depth = max_depth
+        self.follow_symlinks = follow_symlinks
+        self.exclude = list(exclude or [])
+        self.queue_size = queue_size
+
+    def walk(self, root_path: str, scan_filter: Optional[ScanFilter] = None) -> Iterator[os.DirEntry]:
+        """Возвращает файлы дерева по мере их обнаружения (порядок не определен)
+
+        Фильтр применяется во время обхода: отсеченные каталоги не читаются,
+        отфильтрованные файлы не попадают в очередь.
+        """
+        results = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        state = {'pending': 0}
+        lock = threading.Lock()
+        visited = set()
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                      thread_name_prefix='tree-walker')
+
+        def put(item) -> bool:
+            # Блокирующая запись с проверкой отмены, чтобы потоки не зависли,
+            # если потребитель прекратил итерацию
+            while not stop.is_set():
+                try:
+                    results.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def submit(dir_path: str, depth: int):
+            if stop.is_set():
+                return
+            with lock:
+                state['pending'] += 1
+            try:
+                executor.submit(scan_dir, dir_path, depth)
+            except RuntimeError:
+                # Пул уже остановлен - обход отменен
+                with lock:
+                    state['pending'] -= 1
+
+        def finish_task():
+            with lock:
+                state['pending'] -= 1
+                done = state['pending'] == 0
+            if done:
+                put(_DONE)
+
+        def scan_dir(dir_path: str, depth: int):
+            try:
+                if stop.is_set():
+                    return
+                with os.scandir(dir_path) as entries:
+                    for entry in entries:
+                        if stop.is_set():
+                            return
+                        rel_path = os.path.relpath(entry.path, root_path)
+                        if self._is_excluded(entry.name, rel_path):
+                            continue
+                        try:
+                            if entry.is_dir(follow_symlinks=self.follow_symlinks):
+                                if self.max_depth is not None and depth >= self.max_depth:
+                                    continue
+                                if scan_filter and not scan_filter.should_descend(entry.name, rel_path):
+                                    continue
+                                if self.follow_symlinks and not self._mark_visited(entry, visited, lock):
+                                    continue
+                                submit(entry.path, depth + 1)
+                            elif entry.is_file():
+                                # Ссылка на файл разбирается как сам файл, размер и mtime - его же
+                                if scan_filter and not scan_filter.accepts(entry, rel_path, follow_symlinks=True):
+                                    continue
+                                if not put(entry):
+                                    return
+                        except OSError as e:
+                            logger.warning("Error reading entry %s: %s", entry.path, e)
+            except PermissionError:
+                logger.warning("Permission denied accessing folder: %s", dir_path)
+            except OSError as e:
+                logger.warning("Error walking folder %s: %s", dir_path, e)
+            finally:
+                finish_task()
+
+        if self.follow_symlinks:
+            try:
+                st = os.stat(root_path)
+                visited.add((st.st_dev, st.st_ino))
+            except OSError:
+                pass
+
+        submit(root_path, 0)
+        try:
+            while True:
+                item = results.get()
+                if item is _DONE:
+                    break
+                yield item
+        finally:
+            stop.set()
+            executor.shutdown(wait=True)
+
+    def _is_excluded(self, name: str, rel_path: str) -> bool:
+        """Проверяет имя и относительный путь по шаблонам исключений"""
+        rel_path = rel_path.replace(os.sep, '/')
+        for pattern in self.exclude:
+            if fnmatch(name, pattern) or fnmatch(rel_path, pattern):
+                return True
+        return False
+
+    @staticmethod
+    def _mark_visited(entry: os.DirEntry, visited: set, lock: threading.Lock) -> bool:
+        """Защита от циклов при переходе по ссылкам: каждый каталог обходится один раз"""
+        try:
+            st = entry.stat(follow_symlinks=True)
+        except OSError:
+            return False
+        key = (st.st_dev, st.st_ino)
+        with lock:
+            if key in visited:
+                return False
+            visited.add(key)
+        return True
+
+
+def walk_files(root_path: str, max_workers: int = 8, max_depth: Optional[int] = None,
+               follow_symlinks: bool = False, exclude: Optional[List[str]] = None,
+               scan_filter: Optional[ScanFilter] = None) -> Iterator[str]:
+    """Возвращает пути файлов дерева, используя параллельный обход"""
+    walker = ParallelTreeWalker(max_workers=max_workers, max_depth=max_depth,
+                                follow_symlinks=follow_symlinks, exclude=exclude)
+    for entry in walker.walk(root_path, scan_filter):
+        yield entry.path
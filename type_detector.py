@@ -0,0 +1,185 @@
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+import filetype
+
+# Размер заголовка для определения типа. filetype ищет маркеры OOXML
+# ([Content_Types].xml, word/, xl/) в пределах первых 8 KB.
+HEADER_SIZE = 8192
+
+# Сопоставление расширений и MIME-типов (быстрый путь)
+EXTENSION_MIME_MAP = {
+    '.pdf': 'application/pdf',
+    '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    '.doc': 'application/msword',
+    '.xls': 'application/vnd.ms-excel',
+    '.ppt': 'application/vnd.ms-powerpoint',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.tiff': 'image/tiff',
+    '.tif': 'image/tiff',
+    '.gif': 'image/gif',
+    '.bmp': 'image/bmp',
+    '.heic': 'image/heic',
+    '.heif': 'image/heif',
+    '.zip': 'application/zip',
+    '.tar': 'application/x-tar',
+    '.tgz': 'application/gzip',
+    '.gz': 'application/gzip',
+}
+
+_OLE_MAGIC = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+_ZIP_MAGIC = b'PK\x03\x04'
+
+
+def _is_pdf(header: bytes) -> bool:
+    # Спецификация допускает мусор перед %PDF в пределах первого килобайта
+    return b'%PDF-' in header[:1024]
+
+
+def _is_heif(header: bytes) -> bool:
+    return header[4:8] == b'ftyp' and header[8:12] in (
+        b'heic', b'heix', b'hevc', b'hevx', b'heim', b'heis', b'mif1', b'msf1')
+
+
+def _is_ooxml(part_prefix: bytes):
+    # Имена частей хранятся в локальных заголовках zip открытым текстом
+    return lambda h: h.startswith(_ZIP_MAGIC) and part_prefix in h
+
+
+# Сигнатуры для проверки расширения без вызова filetype
+_SIGNATURES = {
+    'application/pdf': _is_pdf,
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document': _is_ooxml(b'word/'),
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': _is_ooxml(b'xl/'),
+    'application/msword': lambda h: h.startswith(_OLE_MAGIC),
+    'application/vnd.ms-excel': lambda h: h.startswith(_OLE_MAGIC),
+    'application/vnd.ms-powerpoint': lambda h: h.startswith(_OLE_MAGIC),
+    'image/jpeg': lambda h: h.startswith(b'\xff\xd8\xff'),
+    'image/png': lambda h: h.startswith(b'\x89PNG\r\n\x1a\n'),
+    'image/tiff': lambda h: h[:4] in (b'II*\x00', b'MM\x00*'),
+    'image/gif': lambda h: h[:6] in (b'GIF87a', b'GIF89a'),
+    'image/bmp': lambda h: h.startswith(b'BM'),
+    'image/heic': _is_heif,
+    'image/heif': _is_heif,
+    'application/zip': lambda h: h[:4] in (_ZIP_MAGIC, b'PK\x05\x06'),
+    'application/x-tar': lambda h: h[257:262] == b'ustar',
+    'application/gzip': lambda h: h.startswith(b'\x1f\x8b'),
+}
+
+# Группы совместимых типов: расхождение внутри группы не считается подменой.
+# Для составных документов OLE filetype различает doc/xls/ppt ненадежно.
+_COMPATIBLE_GROUPS = [
+    {'application/x-ole-storage', 'application/msword', 'application/vnd.ms-excel',
+     'application/vnd.ms-powerpoint'},
+    {'image/heic', 'image/heif'},
+]
+
+# OOXML, который filetype распознал только как zip
+_GENERIC_CONTAINERS = {
+    'application/zip': {
+        'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    },
+}
+
+
+def mime_for_extension(file_path: str) -> Optional[str]:
+    """MIME-тип по расширению файла"""
+    return EXTENSION_MIME_MAP.get(Path(file_path).suffix.lower())
+
+
+def _compatible(extension_mime: str, content_mime: str) -> bool:
+    if extension_mime == content_mime:
+        return True
+    if extension_mime in _GENERIC_CONTAINERS.get(content_mime, ()):
+        return True
+    return any(extension_mime in group and content_mime in group for group in _COMPATIBLE_GROUPS)
+
+
+class TypeDetector:
+    """Определение типа файла по содержимому с кэшем на время сканирования.
+
+    Сначала проверяется сигнатура, ожидаемая для расширения (быстрый путь);
+    только если она не совпала, заголовок передается в filetype. Прочитанный
+    заголовок возвращается вызывающему коду, чтобы парсер не читал его повторно.
+    В кэше хранится только результат определения, без заголовка.
+    """
+
+    def __init__(self):
+        self._cache = {}
+
+    def clear(self):
+        """Сбрасывает кэш (в начале нового сканирования)"""
+        self._cache.clear()
+
+    def detect(self, file_path: str) -> Dict:
+        """Определяет тип файла
+
+        Returns:
+            Dict: 'mime' - итоговый тип для выбора парсера (None, если разбирать нечего),
+                  'extension_mime', 'content_mime', 'mismatch' (bool), 'size' - размер файла,
+                  'mtime_ns' - время изменения,
+                  'header' - прочитанные байты (None при попадании в кэш)
+        """
+        stat = os.stat(file_path)
+        cache_key = (stat.st_size, stat.st_mtime_ns)
+        cached = self._cache.get(file_path)
+        if cached and cached[0] == cache_key:
+            result = dict(cached[1])
+            result['header'] = None
+            return result
+
+        with open(file_path, 'rb') as f:
+            header = f.read(HEADER_SIZE)
+
+        result = self.detect_header(file_path, header)
+        result['size'] = stat.st_size
+        result['mtime_ns'] = stat.st_mtime_ns
+        self._cache[file_path] = (cache_key, {k: v for k, v in result.items() if k != 'header'})
+        return result
+
+    def detect_header(self, file_path: str, header: bytes) -> Dict:
+        """Определяет тип по уже прочитанному заголовку"""
+        extension_mime = mime_for_extension(file_path)
+        content_mime = None
+        mismatch = False
+
+        if not header:
+            # Пустой файл: разбирать нечего, подменой не считается
+            return {'mime': None, 'extension_mime': extension_mime, 'content_mime': None,
+                    'mismatch': False, 'header': header}
+
+        signature = _SIGNATURES.get(extension_mime)
+        if signature and signature(header):
+            # Быстрый путь: содержимое соответствует расширению
+            content_mime = extension_mime
+        else:
+            content_mime = filetype.guess_mime(header)
+            if extension_mime and signature:
+                mismatch = content_mime is None or not _compatible(extension_mime, content_mime)
+
+        if content_mime and extension_mime and _compatible(extension_mime, content_mime):
+            # Общий контейнер (zip, OLE) - конкретный формат берем по расширению
+            mime = extension_mime
+        elif mismatch and content_mime is None:
+            # Содержимое не похоже на заявленный формат - не отправляем в парсер
+            mime = None
+        else:
+            mime = content_mime or extension_mime
+
+        return {'mime': mime, 'extension_mime': extension_mime, 'content_mime': content_mime,
+                'mismatch': mismatch, 'header': header}
+
+
+def mismatch_metadata(file_path: str, detected: Dict) -> Dict:
+    """Элемент метаданных о несоответствии расширения и содержимого"""
+    return {
+        'key': 'File Type Mismatch',
+        'value': f"extension {Path(file_path).suffix.lower()} ({detected['extension_mime']}), "
+                 f"content {detected['content_mime'] or 'unknown'}",
+        'source': 'TypeDetector'
+    }